@@ -0,0 +1,224 @@
+"""
+개발자 뉴스레터 수집 파이프라인
+
+URL 목록 / RSS 피드 -> 동시 fetch -> HTML 텍스트 추출 -> chunk 분할 -> batch 임베딩 -> 인덱스 저장
+각 단계는 bounded queue 로 연결된 generator 단계라서 문서가 수백 개여도 처리 중인 메모리는 일정하다.
+chunk 본문 / 메타데이터는 디스크 docstore(SQLite)에 바로 추가하고, 메모리에는 벡터 인덱스만 둔다.
+인덱스 파일은 checkpoint 주기(--checkpoint-seconds)마다와 마지막에만 저장한다.
+완료된 URL 은 인덱스 저장 후 progress log(JSONL)에 기록되고, 다시 실행하면 이미 처리한 URL 은 건너뛴다.
+progress log 에 없더라도 manifest 의 원본 hash 가 같은 URL 은 임베딩하지 않고, 내용이 바뀐 URL 은 이전 chunk 를 교체한다.
+
+실행:
+    python ingest.py --urls sources.txt
+    python ingest.py --feed https://blog.pragmaticengineer.com/rss/ --fetch-workers 16
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from typing import Iterable, Iterator, List, Set
+
+import faiss
+import feedparser
+import requests
+from bs4 import BeautifulSoup
+from dotenv import load_dotenv
+from langchain_core.documents import Document
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+from requests.adapters import HTTPAdapter
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from rag_common.embedding_cache import CachedEmbeddings
+from rag_common.index_manifest import chunk_id, source_hash, sync_store
+from rag_common.mmap_store import create_mmap_store, delete_documents, save_mmap_store
+from rag_common.ollama_embeddings import BatchedOllamaEmbeddings
+from rag_common.pipeline import Stage, StreamPipeline
+
+VECTOR_DB_PATH = "./db"
+VECTOR_DB_NAME = "faiss_index"
+PROGRESS_LOG_PATH = os.path.join(VECTOR_DB_PATH, "ingest_progress.jsonl")
+HEADERS = {
+    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/123.0.0.0 Safari/537.36"
+}
+
+
+def load_progress(path: str) -> Set[str]:
+    """이미 인덱싱이 끝난 URL 목록"""
+    if not os.path.exists(path):
+        return set()
+    with open(path, encoding="utf-8") as f:
+        return {json.loads(line)["url"] for line in f if line.strip()}
+
+
+def iter_sources(url_files: List[str], feeds: List[str], done: Set[str]) -> Iterator[str]:
+    """URL 파일과 RSS 피드에서 아직 처리하지 않은 URL 을 하나씩 꺼낸다."""
+    seen = set(done)
+    for path in url_files:
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                url = line.strip()
+                if url and not url.startswith("#") and url not in seen:
+                    seen.add(url)
+                    yield url
+    for feed_url in feeds:
+        for entry in feedparser.parse(feed_url).entries:
+            url = entry.get("link")
+            if url and url not in seen:
+                seen.add(url)
+                yield url
+
+
+class NewsletterIngestor:
+    """단계별 함수 모음. StreamPipeline 으로 연결해서 실행한다."""
+
+    def __init__(self, embeddings, chunk_size: int = 1500, chunk_overlap: int = 100,
+                 batch_size: int = 32, checkpoint_seconds: float = 300.0, fetch_workers: int = 8):
+        self.embeddings = embeddings
+        self.splitter = RecursiveCharacterTextSplitter(chunk_size=chunk_size, chunk_overlap=chunk_overlap)
+        self.batch_size = batch_size
+        # 인덱스 파일은 저장할 때마다 전체를 다시 쓰므로 batch 수가 아닌 시간 간격으로 저장한다.
+        self.checkpoint_seconds = checkpoint_seconds
+        # 임베딩 모델 / splitter 설정이 인덱스를 만들 때와 다르면 저장된 chunk 를 먼저 다시 임베딩한다.
+        self.vectorstore, self.manifest, sync_plan = sync_store(
+            VECTOR_DB_PATH, VECTOR_DB_NAME, embeddings, sources={}, splitter=self.splitter, writable=True)
+        print(f"[manifest] {sync_plan}")
+        self.source_hashes = {}
+        self.unchanged_urls = 0
+
+        self.session = requests.Session()
+        self.session.headers.update(HEADERS)
+        adapter = HTTPAdapter(pool_maxsize=fetch_workers)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+    # 1. fetch (item 모드, 병렬)
+    def fetch(self, url: str) -> Iterator[tuple]:
+        try:
+            response = self.session.get(url, timeout=15)
+            response.raise_for_status()
+        except requests.RequestException as e:
+            print(f"뉴스레터 요청 실패: {url}, 에러: {str(e)}")
+            return
+        yield url, response.text
+
+    # 2. HTML -> 텍스트 (item 모드)
+    @staticmethod
+    def html_to_text(page: tuple) -> Iterator[Document]:
+        url, html = page
+        soup = BeautifulSoup(html, "lxml")
+        for tag in soup(["script", "style", "nav", "header", "footer", "noscript"]):
+            tag.decompose()
+        title = soup.title.get_text(strip=True) if soup.title else ""
+        text = "\n".join(line for line in (s.strip() for s in soup.get_text("\n").splitlines()) if line)
+        if text:
+            yield Document(page_content=text, metadata={"source": url, "title": title})
+
+    # 3. chunk 분할 (item 모드). 문서의 마지막 chunk 에 표시를 해서 URL 완료 여부를 알 수 있게 한다.
+    def split(self, doc: Document) -> Iterator[Document]:
+        url, digest = doc.metadata["source"], source_hash([doc])
+        if self.manifest.sources.get(url, {}).get("hash") == digest:
+            # 이미 같은 내용으로 인덱싱된 URL
+            self.unchanged_urls += 1
+            return
+        chunks = self.splitter.split_documents([doc])
+        self.source_hashes[url] = digest
+        for i, chunk in enumerate(chunks):
+            chunk.id = chunk_id(doc.metadata["source"], i)
+            chunk.metadata["chunk_index"] = i
+            chunk.metadata["is_last_chunk"] = i == len(chunks) - 1
+            yield chunk
+
+    # 4. batch 임베딩 (stream 모드)
+    def embed(self, chunks: Iterable[Document]) -> Iterator[tuple]:
+        batch = []
+        for chunk in chunks:
+            batch.append(chunk)
+            if len(batch) >= self.batch_size:
+                yield batch, self.embeddings.embed_documents([doc.page_content for doc in batch])
+                batch = []
+        if batch:
+            yield batch, self.embeddings.embed_documents([doc.page_content for doc in batch])
+
+    # 5. 인덱스 upsert (stream 모드). checkpoint 마다 인덱스를 저장한 뒤 완료된 URL 을 기록한다.
+    # 같은 ID 의 chunk 는 교체하고, URL 이 끝나면 새 chunk 목록에 없는 이전 chunk 를 삭제한다.
+    def upsert(self, batches: Iterable[tuple]) -> Iterator[str]:
+        completed_urls = []
+        last_checkpoint = time.monotonic()
+        for docs, vectors in batches:
+            if self.vectorstore is None:
+                # 문서가 계속 추가되므로 학습이 필요 없는 전수 검색 인덱스로 시작한다.
+                self.vectorstore = create_mmap_store(VECTOR_DB_PATH, self.embeddings,
+                                                     faiss.IndexFlatL2(len(vectors[0])), VECTOR_DB_NAME)
+            existing = [doc.id for doc in self.vectorstore.get_by_ids([doc.id for doc in docs])]
+            if existing:
+                delete_documents(self.vectorstore, existing)
+            self.vectorstore.add_embeddings(
+                text_embeddings=[(doc.page_content, vector) for doc, vector in zip(docs, vectors)],
+                metadatas=[doc.metadata for doc in docs],
+                ids=[doc.id for doc in docs],
+            )
+            for doc in docs:
+                if doc.metadata["is_last_chunk"]:
+                    url = doc.metadata["source"]
+                    chunk_ids = [chunk_id(url, i) for i in range(doc.metadata["chunk_index"] + 1)]
+                    previous = set(self.manifest.sources.get(url, {}).get("chunk_ids", [])) - set(chunk_ids)
+                    stale = [doc.id for doc in self.vectorstore.get_by_ids(list(previous))]
+                    if stale:
+                        delete_documents(self.vectorstore, stale)
+                    self.manifest.sources[url] = {"hash": self.source_hashes.pop(url, ""), "chunk_ids": chunk_ids}
+                    completed_urls.append(url)
+            if time.monotonic() - last_checkpoint >= self.checkpoint_seconds:
+                yield from self.checkpoint(completed_urls)
+                completed_urls = []
+                last_checkpoint = time.monotonic()
+        yield from self.checkpoint(completed_urls)
+
+    def checkpoint(self, completed_urls: List[str]) -> Iterator[str]:
+        if self.vectorstore is None:
+            return
+        save_mmap_store(self.vectorstore, VECTOR_DB_PATH, VECTOR_DB_NAME)
+        self.manifest.save(VECTOR_DB_PATH, VECTOR_DB_NAME)
+        with open(PROGRESS_LOG_PATH, "a", encoding="utf-8") as f:
+            for url in completed_urls:
+                f.write(json.dumps({"url": url, "at": time.time()}, ensure_ascii=False) + "\n")
+        yield from completed_urls
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--urls", action="append", default=[], help="URL 목록 파일 (한 줄에 하나)")
+    parser.add_argument("--feed", action="append", default=[], help="RSS / Atom 피드 URL")
+    parser.add_argument("--fetch-workers", type=int, default=8)
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--queue-size", type=int, default=64)
+    parser.add_argument("--checkpoint-seconds", type=float, default=300.0, help="인덱스 저장 주기(초)")
+    parser.add_argument("--model", default="dolphin-llama3:8b")
+    args = parser.parse_args()
+    load_dotenv()
+
+    os.makedirs(VECTOR_DB_PATH, exist_ok=True)
+    embeddings = CachedEmbeddings(BatchedOllamaEmbeddings(model=args.model, batch_size=args.batch_size))
+    ingestor = NewsletterIngestor(embeddings, batch_size=args.batch_size, fetch_workers=args.fetch_workers,
+                                  checkpoint_seconds=args.checkpoint_seconds)
+    done = load_progress(PROGRESS_LOG_PATH)
+    print(f"이미 처리된 URL: {len(done)}건")
+
+    pipeline = StreamPipeline(
+        source=iter_sources(args.urls, args.feed, done),
+        stages=[
+            Stage("fetch", ingestor.fetch, workers=args.fetch_workers, queue_size=args.queue_size),
+            Stage("html2text", ingestor.html_to_text, workers=2, queue_size=args.fetch_workers * 2),
+            Stage("split", ingestor.split, queue_size=args.queue_size),
+            Stage("embed", ingestor.embed, stream=True, queue_size=args.batch_size * 4),
+            Stage("upsert", ingestor.upsert, stream=True, queue_size=4),
+        ],
+    )
+    pipeline.run()
+    print(pipeline.report())
+    print(f"내용이 같아서 건너뛴 URL: {ingestor.unchanged_urls}건")
+    print(f"[embedding cache] {embeddings.stats}")
+
+
+if __name__ == "__main__":
+    main()
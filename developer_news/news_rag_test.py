@@ -3,16 +3,23 @@
 import bs4
 from langchain_community.document_loaders import WebBaseLoader
 from langchain_text_splitters import RecursiveCharacterTextSplitter
-from langchain_community.embeddings import OllamaEmbeddings
-from langchain_community.vectorstores import FAISS
 from langchain_core.output_parsers import StrOutputParser
 from langchain_core.runnables import RunnablePassthrough
 from langchain_core.prompts import PromptTemplate
-from langchain_openai import ChatOpenAI, OpenAIEmbeddings
 
 import os
+import sys
 from dotenv import load_dotenv
 
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from rag_common.context_builder import ContextBuilder
+from rag_common.embedding_cache import CachedEmbeddings
+from rag_common.index_manifest import sync_store
+from rag_common.llm_client import default_client, get_chat_model
+from rag_common.mmap_store import store_files
+from rag_common.ollama_embeddings import BatchedOllamaEmbeddings
+from rag_common.semantic_cache import SemanticCache, chain_fingerprint, file_store_version, with_semantic_cache
+
 # API 키 정보 로드
 load_dotenv()
 
@@ -27,30 +34,31 @@ docs = loader.load()
 
 # 2. document text split
 text_splitter = RecursiveCharacterTextSplitter(chunk_size=1500, chunk_overlap=100)
-splitted_docs = text_splitter.split_documents(docs)
 
 # 3. embedding
-embeddings = OllamaEmbeddings(model="dolphin-llama3:8b")
+# 동일한 chunk 는 다시 임베딩하지 않도록 캐시 사용
+# chunk 를 batch 로 묶어서 여러 요청을 동시에 보낸다.
+embeddings = CachedEmbeddings(BatchedOllamaEmbeddings(model="dolphin-llama3:8b"))
 
 # 4. create DB (vector store)
 # 사용법 : https://wikidocs.net/234014
-vectorstore = FAISS.load_local(
+# 인덱스는 mmap 으로 열고, 문서는 SQLite 에서 필요한 것만 읽는다. (pickle 사용 안함)
+# manifest 와 비교해서 임베딩 모델 / splitter 설정 / 글 내용이 바뀐 경우에만 해당 부분을 다시 임베딩한다.
+# 인덱스 종류는 FAISS_INDEX_TYPE 환경변수로 지정 (flat / hnsw / ivf_flat / ivf_pq / auto)
+vectorstore, _, sync_plan = sync_store(
     folder_path="./db",
     index_name=VECTOR_DB_NAME,
     embeddings=embeddings,
-    allow_dangerous_deserialization=True,
+    sources={news_url: docs},
+    splitter=text_splitter,
 )
-
-if not vectorstore:
-    vectorstore = FAISS.from_documents(
-        documents=splitted_docs,
-        embedding=embeddings,
-    )
-    vectorstore.save_local(folder_path="./db", index_name=VECTOR_DB_NAME)
+print(f"[manifest] {sync_plan}")
 
 # 5: 검색기(Retriever) 생성
 # 문서에 포함되어 있는 정보를 검색하고 생성합니다.
 retriever = vectorstore.as_retriever()
+# 검색된 chunk 의 중복 / chunk_overlap 으로 겹치는 부분을 빼고 토큰 예산 안에서 context 를 만든다.
+context_builder = ContextBuilder()
 
 # 단계 6: 프롬프트 생성(Create Prompt)
 # 프롬프트를 생성합니다.
@@ -70,19 +78,32 @@ All responses must be provided in Korean only.
 
 # 단계 7: 언어모델(LLM) 생성
 # 모델(LLM) 을 생성합니다.
-llm = ChatOpenAI(model_name=os.environ['OPENAI_MODEL'], temperature=0)
+llm = get_chat_model(os.environ['OPENAI_MODEL'], caller="developer_news_rag", temperature=0)
 
 # 단계 8: 체인(Chain) 생성
 chain = (
-        {"context": retriever, "question": RunnablePassthrough()}
+        {"context": retriever | context_builder, "question": RunnablePassthrough()}
         | prompt
         | llm
         | StrOutputParser()
 )
 
+# 거의 같은 질문은 검색 / LLM 생성 없이 이전 답변을 재사용 (인덱스 파일 / 프롬프트 / 모델이 바뀌면 캐시 무효화)
+answer_cache = SemanticCache(
+    embeddings,
+    namespace="developer_news",
+    store_version=file_store_version(*store_files("./db", VECTOR_DB_NAME)),
+    fingerprint=chain_fingerprint(prompt, llm),
+)
+chain = with_semantic_cache(chain, answer_cache)
+
 question = "2년차 개발자인 나에게 좋은 시니어 개발자가 될 수 있도록 가장 도움이 되는 내용을 요약해서 나에게 알려줘"
 response = chain.invoke(question)
 print(response)
+print(f"[embedding cache] {embeddings.stats}")
+print(f"[semantic cache] {answer_cache.stats}")
+print(f"[context] {context_builder.stats}")
+print(f"[llm]\n{default_client().report()}")
 
 # 결과
 ## Model : GPT-3.5-turbo-0125
@@ -0,0 +1,319 @@
+"""
+CS 문의 대량 분류 (cs_classifier.py 의 CsResponse chain)
+
+JSONL / CSV 문의 파일을 한 번에 읽지 않고 window 단위로 읽어서 chain.abatch_as_completed 로 동시에 처리하고,
+끝나는 순서대로 결과를 JSONL 로 바로 저장한다.
+- 동시 요청 수 제한 (--concurrency) + 분당 요청 / 토큰 수 제한 (--rpm / --tpm, rag_common.llm_client 의 token bucket)
+  429 / 5xx 는 llm_client 가 Retry-After 를 따라 재시도하고, 재시도 후에도 실패한 문의만 llm 실패로 기록
+- 결과 파일이 checkpoint 역할을 한다. 다시 실행하면 이미 처리한 문의 id 는 건너뛴다. (--retry-failed 로 실패한 문의만 재시도)
+  (재시도한 문의는 결과 파일에 한 줄 더 추가되므로, 같은 id 는 마지막 줄이 최신 결과)
+- --dedupe: LLM 호출 전에 같은 user_id 의 최근 문의와 비교해서(duplicate_detector) 중복 문의는 LLM 없이 바로 기록
+- --first-stage: 키워드 규칙 + 글자 n-gram 모델(question_classifier)의 확신도가 --min-confidence 이상이면 LLM 없이 기록
+  (답변이 필요한 유형은 --answer-types 로 지정하면 항상 LLM 으로 보낸다. --audit-rate 비율만큼은 LLM 도 호출해서 일치율 측정)
+- 처리량(tickets/s), 파싱 실패율, 문의 유형별 건수 출력
+
+입력 형식 (JSONL 은 한 줄에 하나, CSV 는 같은 이름의 컬럼):
+    {"id": "T-1", "user_id": "1234", "user_question": "리워드가 지급되지 않았어요."}
+    id 가 없으면 파일 안의 순번(0부터)을 id 로 사용한다. (--dedupe 는 id 가 없는 문의가 있으면 중단)
+    created_at(epoch 초 또는 ISO 8601)이 있으면 중복 문의 time window 계산에 사용한다. (없으면 현재 시각)
+
+출력 형식:
+    {"id", "user_id", "user_question", "question_type", "emotion", "answer"}
+    (question_type 은 QUESTION_TYPES 중 하나로 맞춘 값. LLM 이 다르게 쓴 경우 원래 값은 "raw_question_type")
+    중복 문의는 {"id", "user_id", "user_question", "question_type": "동일 유저에 대한 중복 문의", "duplicate_of", "similarity"}
+    1차 분류만 한 문의는 {"id", "user_id", "user_question", "question_type", "confidence", "classified_by": "rule" / "model"}
+    실패한 경우 {"id", "user_id", "user_question", "error", "error_type"}  (error_type: parse / llm)
+
+실행:
+    python batch_classify.py inquiries.jsonl --out results.jsonl --concurrency 16 --rpm 500
+    python batch_classify.py inquiries.csv --dedupe --dup-threshold 0.4 --dup-window-hours 72
+    python batch_classify.py inquiries.jsonl --dedupe --first-stage --min-confidence 0.8 --audit-rate 0.05
+"""
+import argparse
+import asyncio
+import csv
+import json
+import os
+import sys
+import time
+import zlib
+from collections import Counter
+from dataclasses import dataclass, field
+from datetime import datetime
+from itertools import islice
+from typing import Dict, Iterator, List, Optional, Sequence, Set, Tuple
+
+from dotenv import load_dotenv
+from langchain_core.exceptions import OutputParserException
+from langchain_core.runnables import Runnable
+
+from cs_classifier import QUESTION_TYPES, build_chain, normalize_question_type
+from duplicate_detector import DuplicateDetector
+from question_classifier import DEFAULT_MODEL_PATH, Prediction, QuestionTypeClassifier
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from rag_common.embedding_cache import ROOT_DIR
+from rag_common.llm_client import ModelLimits, default_client, get_chat_model
+
+DUPLICATE_DB_PATH = os.environ.get("CS_DUPLICATE_DB_PATH", os.path.join(ROOT_DIR, ".cache", "cs_inquiries.sqlite3"))
+
+
+@dataclass
+class BatchStats:
+    total: int = 0
+    skipped: int = 0  # checkpoint 에 이미 있는 문의
+    parse_failures: int = 0
+    llm_failures: int = 0
+    duplicates: int = 0  # LLM 호출 없이 중복 문의로 처리
+    first_stage: int = 0  # LLM 호출 없이 1차 분류기로 처리
+    audited: int = 0  # 1차 분류 결과를 LLM 으로 다시 확인한 문의
+    audit_agreements: int = 0
+    question_types: Counter = field(default_factory=Counter)
+    started: float = field(default_factory=time.perf_counter)
+
+    @property
+    def parse_failure_rate(self) -> float:
+        return self.parse_failures / self.total if self.total else 0.0
+
+    @property
+    def llm_calls_avoided(self) -> float:
+        return (self.duplicates + self.first_stage) / self.total if self.total else 0.0
+
+    def __str__(self):
+        elapsed = time.perf_counter() - self.started
+        rate = self.total / elapsed if elapsed else 0.0
+        line = (f"tickets={self.total} skipped={self.skipped} {rate:.1f} tickets/s "
+                f"parse_failures={self.parse_failures} ({self.parse_failure_rate:.1%}) "
+                f"llm_failures={self.llm_failures} duplicates={self.duplicates} first_stage={self.first_stage} "
+                f"llm_avoided={self.llm_calls_avoided:.1%} elapsed={elapsed:.1f}s")
+        if self.audited:
+            line += f" audit_agreement={self.audit_agreements / self.audited:.1%} ({self.audited})"
+        return line
+
+
+def _timestamp(value) -> Optional[float]:
+    if value in (None, ""):
+        return None
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return datetime.fromisoformat(str(value)).timestamp()
+
+
+def _fallback_id(path: str, number: int, require_id: bool) -> str:
+    if require_id:
+        raise ValueError(f"{path}: {number}번째 문의에 id 가 없습니다. (--dedupe 는 파일 간에 겹치지 않는 id 가 필요)")
+    return str(number)
+
+
+def read_inquiries(path: str, require_id: bool = False) -> Iterator[Dict]:
+    """
+    JSONL / CSV 파일에서 문의를 하나씩 읽는다.
+    Args:
+        require_id (bool): id 가 없는 문의가 있으면 순번을 쓰지 않고 ValueError
+            (중복 문의 저장소는 여러 파일의 문의를 id 로 구분하므로, 파일마다 겹치는 순번을 쓰면 다른 문의를 덮어쓴다)
+    """
+    if path.lower().endswith(".csv"):
+        with open(path, encoding="utf-8-sig", newline="") as f:
+            for number, row in enumerate(csv.DictReader(f)):
+                yield {"id": row.get("id") or _fallback_id(path, number, require_id), "user_id": row["user_id"],
+                       "user_question": row["user_question"], "created_at": _timestamp(row.get("created_at"))}
+    else:
+        with open(path, encoding="utf-8") as f:
+            for number, line in enumerate(f):
+                if line.strip():
+                    record = json.loads(line)
+                    inquiry_id = record.get("id")
+                    if inquiry_id in (None, ""):
+                        inquiry_id = _fallback_id(path, number, require_id)
+                    yield {"id": str(inquiry_id), "user_id": str(record["user_id"]),
+                           "user_question": record["user_question"],
+                           "created_at": _timestamp(record.get("created_at"))}
+
+
+def load_checkpoint(path: str, retry_failed: bool = False) -> Set[str]:
+    """결과 파일에서 이미 처리한 문의 id 를 읽는다. (마지막 줄이 쓰다 만 줄이면 무시)"""
+    done = set()
+    if not os.path.exists(path):
+        return done
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            if not (retry_failed and "error" in record):
+                done.add(record["id"])
+    return done
+
+
+def _output_record(inquiry: Dict) -> Dict:
+    return {key: value for key, value in inquiry.items() if key != "created_at" or value is not None}
+
+
+def _write_duplicate(out, inquiry: Dict, detector: DuplicateDetector, stats: BatchStats) -> bool:
+    """중복 문의면 결과를 바로 쓰고 True 를 반환한다. (입력 순서대로 호출되어야 이전 문의와 비교할 수 있다)"""
+    match = detector.check_and_add(inquiry["user_id"], inquiry["id"], inquiry["user_question"], inquiry["created_at"])
+    if match is None:
+        return False
+    record = _output_record(inquiry)
+    record.update(question_type=QUESTION_TYPES[1], duplicate_of=match.inquiry_id, similarity=round(match.similarity, 3))
+    out.write(json.dumps(record, ensure_ascii=False) + "\n")
+    stats.duplicates += 1
+    stats.total += 1
+    stats.question_types[QUESTION_TYPES[1]] += 1
+    return True
+
+
+def _audited(inquiry_id: str, audit_rate: float) -> bool:
+    """id 기준으로 고르므로 다시 실행해도 같은 문의가 선택된다."""
+    return zlib.crc32(inquiry_id.encode("utf-8")) % 10000 < audit_rate * 10000
+
+
+def _write_first_stage(out, batch: List[Dict], classifier: QuestionTypeClassifier, min_confidence: float,
+                       answer_types: Sequence[str], audit_rate: float,
+                       stats: BatchStats) -> Tuple[List[Dict], Dict[str, Prediction]]:
+    """
+    확신도가 높은 문의는 결과를 바로 쓴다.
+    Returns:
+        Tuple[List[Dict], Dict[str, Prediction]]: (LLM 으로 보낼 문의, 일치율 확인용으로 같이 보내는 문의 id -> 1차 분류 결과)
+    """
+    remaining, audits = [], {}
+    for inquiry, prediction in zip(batch, classifier.predict_many([inquiry["user_question"] for inquiry in batch])):
+        if prediction is None or prediction.confidence < min_confidence or prediction.question_type in answer_types:
+            remaining.append(inquiry)
+        elif _audited(inquiry["id"], audit_rate):
+            remaining.append(inquiry)
+            audits[inquiry["id"]] = prediction
+        else:
+            record = _output_record(inquiry)
+            record.update(question_type=prediction.question_type, confidence=round(prediction.confidence, 3),
+                          classified_by=prediction.source)
+            out.write(json.dumps(record, ensure_ascii=False) + "\n")
+            stats.first_stage += 1
+            stats.total += 1
+            stats.question_types[prediction.question_type] += 1
+    return remaining, audits
+
+
+def _ends_without_newline(path: str) -> bool:
+    with open(path, "rb") as f:
+        f.seek(0, os.SEEK_END)
+        if f.tell() == 0:
+            return False
+        f.seek(-1, os.SEEK_END)
+        return f.read(1) != b"\n"
+
+
+async def classify_file(chain: Runnable, input_path: str, output_path: str, concurrency: int = 8,
+                        window: int = 256, retry_failed: bool = False, report_every: float = 10.0,
+                        detector: Optional[DuplicateDetector] = None,
+                        first_stage: Optional[QuestionTypeClassifier] = None, min_confidence: float = 0.8,
+                        answer_types: Sequence[str] = (), audit_rate: float = 0.0) -> BatchStats:
+    """
+    Args:
+        chain (Runnable): {"user_id", "user_question"} -> CsResponse
+        concurrency (int): 동시에 실행할 chain 수
+        window (int): 한 번에 읽어서 abatch 로 넘길 문의 수 (메모리에 올라가는 문의 수)
+        retry_failed (bool): 결과 파일에 실패로 기록된 문의를 다시 처리
+        detector (Optional[DuplicateDetector]): 있으면 중복 문의는 LLM 을 호출하지 않고 바로 기록
+        first_stage (Optional[QuestionTypeClassifier]): 있으면 확신도가 min_confidence 이상인 문의는 LLM 없이 기록
+        answer_types (Sequence[str]): 답변(answer)이 필요해서 1차 분류 결과와 상관없이 LLM 으로 보낼 문의 유형
+        audit_rate (float): 1차 분류로 끝난 문의 중 LLM 도 호출해서 일치율을 확인할 비율
+    """
+    done = load_checkpoint(output_path, retry_failed)
+    stats = BatchStats()
+    inquiries = (inquiry for inquiry in read_inquiries(input_path, require_id=detector is not None) if inquiry["id"] not in done)
+    stats.skipped = len(done)
+    last_report = time.perf_counter()
+
+    with open(output_path, "a", encoding="utf-8") as out:
+        if _ends_without_newline(output_path):
+            out.write("\n")  # 이전 실행이 줄 중간에서 끊긴 경우
+        while batch := list(islice(inquiries, window)):
+            if detector is not None:
+                batch = [inquiry for inquiry in batch if not _write_duplicate(out, inquiry, detector, stats)]
+            audits = {}
+            if first_stage is not None and batch:
+                batch, audits = _write_first_stage(out, batch, first_stage, min_confidence, answer_types, audit_rate,
+                                                   stats)
+            inputs = [{"user_id": inquiry["user_id"], "user_question": inquiry["user_question"]} for inquiry in batch]
+            async for index, result in chain.abatch_as_completed(
+                    inputs, config={"max_concurrency": concurrency}, return_exceptions=True):
+                record = _output_record(batch[index])
+                if isinstance(result, OutputParserException):
+                    stats.parse_failures += 1
+                    record.update(error=str(result)[:500], error_type="parse")
+                elif isinstance(result, Exception):
+                    stats.llm_failures += 1
+                    record.update(error=f"{type(result).__name__}: {result}"[:500], error_type="llm")
+                else:
+                    question_type = normalize_question_type(result.question_type)
+                    stats.question_types[question_type] += 1
+                    record.update(result.dict(), question_type=question_type)
+                    if question_type != result.question_type:
+                        record["raw_question_type"] = result.question_type  # LLM 이 실제로 쓴 유형
+                    expected = audits.get(record["id"])
+                    if expected is not None:
+                        stats.audited += 1
+                        stats.audit_agreements += question_type == expected.question_type
+                        record.update(first_stage_type=expected.question_type,
+                                      confidence=round(expected.confidence, 3))
+                out.write(json.dumps(record, ensure_ascii=False) + "\n")
+                stats.total += 1
+            out.flush()
+            if report_every and time.perf_counter() - last_report >= report_every:
+                print(f"[batch] {stats}")
+                last_report = time.perf_counter()
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("input", help="문의 파일 (.jsonl / .csv)")
+    parser.add_argument("--out", help="결과 JSONL (기본값: <input>.results.jsonl)")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--rpm", type=float, default=500, help="분당 최대 요청 수")
+    parser.add_argument("--tpm", type=float, default=200_000, help="분당 최대 토큰 수")
+    parser.add_argument("--window", type=int, default=256)
+    parser.add_argument("--retry-failed", action="store_true", help="실패로 기록된 문의 재시도")
+    parser.add_argument("--dedupe", action="store_true", help="같은 user_id 의 중복 문의는 LLM 없이 처리")
+    parser.add_argument("--dup-threshold", type=float, default=0.4, help="중복 문의로 볼 유사도 (0 ~ 1)")
+    parser.add_argument("--dup-window-hours", type=float, default=7 * 24, help="중복 문의 비교 기간 (시간)")
+    parser.add_argument("--first-stage", action="store_true", help="키워드 규칙 + n-gram 모델로 먼저 분류")
+    parser.add_argument("--first-stage-model", default=DEFAULT_MODEL_PATH)
+    parser.add_argument("--min-confidence", type=float, default=0.8, help="1차 분류 결과를 그대로 쓸 확신도")
+    parser.add_argument("--answer-types", nargs="*", default=[], choices=QUESTION_TYPES,
+                        help="답변이 필요해서 항상 LLM 으로 보낼 문의 유형")
+    parser.add_argument("--audit-rate", type=float, default=0.0, help="1차 분류 문의 중 LLM 으로 일치율을 확인할 비율")
+    args = parser.parse_args()
+
+    load_dotenv()
+    model = os.environ['OPEN_AI_MODEL']
+    default_client().set_limits(model, ModelLimits(rpm=args.rpm, tpm=args.tpm, max_concurrency=args.concurrency))
+    llm = get_chat_model(model, caller="cs_batch", api_key=os.environ['OPEN_AI_API_KEY'])
+    output_path = args.out or os.path.splitext(args.input)[0] + ".results.jsonl"
+
+    detector = None
+    if args.dedupe:
+        detector = DuplicateDetector(threshold=args.dup_threshold, window_seconds=args.dup_window_hours * 3600,
+                                     path=DUPLICATE_DB_PATH)
+
+    first_stage = QuestionTypeClassifier.load(args.first_stage_model) if args.first_stage else None
+
+    stats = asyncio.run(classify_file(build_chain(llm), args.input, output_path, args.concurrency, args.window,
+                                      args.retry_failed, detector=detector, first_stage=first_stage,
+                                      min_confidence=args.min_confidence, answer_types=args.answer_types,
+                                      audit_rate=args.audit_rate))
+    print(f"[batch] {stats}")
+    if detector is not None:
+        print(f"[dedupe] {detector.stats}")
+        detector.close()
+    for question_type, count in stats.question_types.most_common():
+        print(f"  {question_type}: {count}")
+    print(f"[llm]\n{default_client().report()}")
+    print(f"결과 저장: {output_path}")
+
+
+if __name__ == "__main__":
+    main()
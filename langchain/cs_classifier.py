@@ -0,0 +1,71 @@
+"""
+CS 문의 분류 chain (CsResponse)
+
+langchain_test.py 와 batch_classify.py 에서 같이 사용한다.
+
+사용법:
+    chain = build_chain(ChatOpenAI(model=CHAT_GPT_MODEL, openai_api_key=API_KEY))
+    result = chain.invoke({"user_id": "1234", "user_question": "리워드가 지급되지 않았어요."})
+    print(result.question_type, result.answer)
+"""
+from langchain.output_parsers import PydanticOutputParser
+from langchain_core.language_models import BaseLanguageModel
+from langchain_core.prompts import PromptTemplate
+from langchain_core.runnables import Runnable
+from pydantic.v1 import BaseModel, Field
+
+QUESTION_TYPES = ["리워드 지급 이슈", "동일 유저에 대한 중복 문의", "그 외 문의"]
+
+
+class CsResponse(BaseModel):
+    question_type: str = Field(description="문의 성격을 분류해주세요.")
+    emotion: str = Field(description="고객에게 공감하며 위로를 전달하는 말")
+    answer: str = Field(description="고객의 문의에 대한 실질적인 답변")
+
+    @classmethod
+    def model_json_schema(cls):
+        return cls.schema()
+
+
+parser = PydanticOutputParser(pydantic_object=CsResponse)
+
+prompt = PromptTemplate(
+    template="""
+    너는 NBT라는 애드 테크 기업의 CS 총괄 관리자야. 고객의 문의를 문의 성격에 따라서 분류해주고 적절한 답변을 해줘야 해.
+    답변은 무조건 한국말로 해줘.
+    문의 성격은 총 3가지로 나뉘어.
+    1. 리워드 지급 이슈
+    2. 동일 유저에 대한 중복 문의 (user_id 가 동일하고, 문의 내용이 비슷한 요구사항일 경우)
+    3. 그 외 문의
+
+    너는 1, 2 유형에 대해서 해결책을 제시해줘야 해.
+    3번 유형에 대해서는 분류 후 CX팀에게 전달해줘야 해.
+
+    <유저 문의 내용>
+    유저 ID : {user_id}
+    유저 문의 내용 : {user_question}
+
+    <답변 내용>
+    {format_instructions}
+    """,
+    input_variables=["user_id", "user_question"],
+    partial_variables={"format_instructions": parser.get_format_instructions()}
+)
+
+
+def normalize_question_type(label: str) -> str:
+    """LLM 이 "3", "3. 그 외 문의", "리워드 지급 이슈입니다" 처럼 다르게 쓴 문의 유형을 QUESTION_TYPES 중 하나로 맞춘다."""
+    label = label.strip()
+    for number, question_type in enumerate(QUESTION_TYPES, 1):
+        if label.startswith(str(number)) or question_type in label:
+            return question_type
+    if "리워드" in label:
+        return QUESTION_TYPES[0]
+    if "중복" in label:
+        return QUESTION_TYPES[1]
+    return QUESTION_TYPES[2]
+
+
+def build_chain(llm: BaseLanguageModel) -> Runnable:
+    """{"user_id", "user_question"} -> CsResponse chain. 파싱 실패 시 OutputParserException 발생"""
+    return prompt | llm | parser
@@ -0,0 +1,190 @@
+"""
+같은 user_id 의 중복 문의 탐지
+
+CS prompt 의 "2. 동일 유저에 대한 중복 문의" 는 LLM 이 그 유저의 이전 문의를 볼 수 없어서 제대로 분류할 수 없다.
+이전 문의를 프롬프트에 모두 넣는 대신, user_id 별로 최근 문의의 MinHash signature 를 저장해 두고
+새 문의가 들어오면 LLM 호출 전에 로컬에서 비교한다. (유저당 최근 문의 수십 건을 numpy 로 한 번에 비교, 1ms 미만)
+- 유사도: 공백을 뺀 글자 n-gram 집합의 Jaccard 유사도를 MinHash 로 근사
+- time window(기본 7일) 안의 문의만 비교, 유저당 최대 max_per_user 건 유지
+- path 를 주면 SQLite 에 저장해서 다음 실행에서도 이어서 사용 (같은 문의 id 는 자기 자신과 비교하지 않으므로, 문의 id 는 파일·실행이 달라도 겹치지 않아야 함)
+
+사용법:
+    detector = DuplicateDetector(threshold=0.4, window_seconds=7 * 24 * 3600)
+    match = detector.check("1234", "리워드 안줬어요. 주세요.")
+    if match:
+        print(match.inquiry_id, match.similarity)
+    detector.add("1234", "T-2", "리워드 안줬어요. 주세요.")
+"""
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from collections import defaultdict, deque
+from dataclasses import dataclass
+from typing import Deque, Dict, Optional, Tuple
+
+import numpy as np
+
+_MERSENNE_PRIME = (1 << 61) - 1
+
+
+@dataclass
+class DuplicateMatch:
+    inquiry_id: str  # 비슷한 이전 문의 id
+    similarity: float  # Jaccard 유사도 추정치
+    created_at: float
+
+
+@dataclass
+class DetectorStats:
+    checks: int = 0
+    duplicates: int = 0
+    check_seconds: float = 0.0
+
+    def __str__(self):
+        mean_us = self.check_seconds / self.checks * 1e6 if self.checks else 0.0
+        return f"checks={self.checks} duplicates={self.duplicates} mean_check={mean_us:.0f}us"
+
+
+class MinHasher:
+    """글자 n-gram 집합의 MinHash signature"""
+
+    def __init__(self, num_perm: int = 64, ngram: int = 2, seed: int = 1):
+        rng = np.random.default_rng(seed)
+        # (a * x + b) mod p. a * x 는 uint64 에서 overflow 되는 것을 그대로 사용한다. (datasketch 와 같은 방식)
+        self.a = rng.integers(1, _MERSENNE_PRIME, size=num_perm, dtype=np.uint64)
+        self.b = rng.integers(0, _MERSENNE_PRIME, size=num_perm, dtype=np.uint64)
+        self.ngram = ngram
+
+    def shingles(self, text: str) -> set:
+        text = "".join(text.lower().split())
+        if len(text) <= self.ngram:
+            return {text}
+        return {text[i:i + self.ngram] for i in range(len(text) - self.ngram + 1)}
+
+    def signature(self, text: str) -> np.ndarray:
+        hashes = np.fromiter((zlib.crc32(shingle.encode("utf-8")) for shingle in self.shingles(text)),
+                             dtype=np.uint64)
+        return ((hashes[:, None] * self.a + self.b) % _MERSENNE_PRIME).min(axis=0)
+
+
+class DuplicateDetector:
+    """user_id 별 최근 문의 MinHash 인덱스"""
+
+    def __init__(self, threshold: float = 0.4, window_seconds: float = 7 * 24 * 60 * 60, max_per_user: int = 50,
+                 num_perm: int = 64, ngram: int = 2, path: Optional[str] = None):
+        """
+        Args:
+            threshold (float): 이 값 이상의 유사도면 중복 문의 (같은 요청을 다르게 쓴 문의가 보통 0.4 ~ 0.7)
+            window_seconds (float): 새 문의와 이 시간 이내에 들어온 문의만 비교
+            max_per_user (int): 유저당 저장할 최근 문의 수
+            num_perm (int): MinHash signature 길이 (길수록 정확하지만 느림)
+            ngram (int): 글자 n-gram 크기 (짧은 한국어 문의는 2가 적당)
+            path (Optional[str]): SQLite 저장 경로. None 이면 메모리에만 저장
+        """
+        self.threshold = threshold
+        self.window_seconds = window_seconds
+        self.max_per_user = max_per_user
+        self.hasher = MinHasher(num_perm, ngram)
+        self.stats = DetectorStats()
+        self._users: Dict[str, Deque[Tuple[str, float, np.ndarray]]] = defaultdict(
+            lambda: deque(maxlen=max_per_user))
+        self._lock = threading.Lock()
+        self._conn = None
+        self._pending = 0
+        if path:
+            self._open(path, num_perm, ngram)
+
+    def _open(self, path: str, num_perm: int, ngram: int):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS inquiries (
+                inquiry_id TEXT PRIMARY KEY,
+                user_id TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                signature BLOB NOT NULL
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_inquiries_created ON inquiries (created_at)")
+        self._conn.commit()
+        # 가장 최근 문의 기준으로 window 안의 문의만 메모리에 올린다.
+        (latest,) = self._conn.execute("SELECT MAX(created_at) FROM inquiries").fetchone()
+        if latest is None:
+            return
+        rows = self._conn.execute(
+            "SELECT inquiry_id, user_id, created_at, signature FROM inquiries WHERE created_at >= ? "
+            "ORDER BY created_at", (latest - self.window_seconds,))
+        for inquiry_id, user_id, created_at, signature in rows:
+            values = np.frombuffer(signature, dtype=np.uint64)
+            if len(values) == num_perm:  # num_perm 이 바뀌었으면 비교할 수 없으므로 버린다.
+                self._users[user_id].append((inquiry_id, created_at, values))
+
+    def check(self, user_id: str, text: str, created_at: Optional[float] = None,
+              inquiry_id: Optional[str] = None) -> Optional[DuplicateMatch]:
+        """같은 유저의 window 안 문의 중 가장 비슷한 문의가 threshold 이상이면 반환한다."""
+        started = time.perf_counter()
+        created_at = time.time() if created_at is None else created_at
+        match = None
+        with self._lock:
+            recent = [entry for entry in self._users.get(user_id, ())
+                      if entry[0] != inquiry_id and abs(created_at - entry[1]) <= self.window_seconds]
+            if recent:
+                signature = self.hasher.signature(text)
+                similarities = (np.stack([entry[2] for entry in recent]) == signature).mean(axis=1)
+                best = int(similarities.argmax())
+                if similarities[best] >= self.threshold:
+                    match = DuplicateMatch(recent[best][0], float(similarities[best]), recent[best][1])
+            self.stats.checks += 1
+            self.stats.duplicates += match is not None
+            self.stats.check_seconds += time.perf_counter() - started
+        return match
+
+    def add(self, user_id: str, inquiry_id: str, text: str, created_at: Optional[float] = None):
+        created_at = time.time() if created_at is None else created_at
+        signature = self.hasher.signature(text)
+        with self._lock:
+            entries = self._users[user_id]
+            for i, entry in enumerate(entries):
+                if entry[0] == inquiry_id:
+                    del entries[i]
+                    break
+            entries.append((inquiry_id, created_at, signature))
+            if self._conn is not None:
+                self._conn.execute("INSERT OR REPLACE INTO inquiries VALUES (?, ?, ?, ?)",
+                                   (inquiry_id, user_id, created_at, signature.tobytes()))
+                self._pending += 1
+                if self._pending >= 100:
+                    self._conn.commit()
+                    self._pending = 0
+
+    def check_and_add(self, user_id: str, inquiry_id: str, text: str,
+                      created_at: Optional[float] = None) -> Optional[DuplicateMatch]:
+        match = self.check(user_id, text, created_at, inquiry_id)
+        self.add(user_id, inquiry_id, text, created_at)
+        return match
+
+    def prune(self, now: Optional[float] = None):
+        """window 밖으로 나간 문의를 메모리와 SQLite 에서 삭제한다."""
+        cutoff = (time.time() if now is None else now) - self.window_seconds
+        with self._lock:
+            for user_id in list(self._users):
+                entries = self._users[user_id]
+                while entries and entries[0][1] < cutoff:
+                    entries.popleft()
+                if not entries:
+                    del self._users[user_id]
+            if self._conn is not None:
+                self._conn.execute("DELETE FROM inquiries WHERE created_at < ?", (cutoff,))
+                self._conn.commit()
+                self._pending = 0
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.commit()
+                self._conn.close()
+                self._conn = None
@@ -0,0 +1,226 @@
+"""
+PDF 폴더 전체를 인덱스 1개로 만드는 수집 명령
+
+PDF 파싱 / chunk 분할은 CPU 작업이라 process pool 에서 페이지 범위 단위로 나눠서 처리하고,
+분할이 끝난 chunk 는 바로 batch 임베딩으로 넘긴다. (파싱과 임베딩이 동시에 진행된다)
+모든 chunk 를 임베딩한 뒤 전체 크기에 맞는 ANN 인덱스를 한 번에 만들어서 mmap_store 형식으로 저장한다.
+파싱에 실패한 파일은 건너뛰고 마지막에 목록을 출력한다.
+임베딩 캐시를 사용하므로 다시 실행하면 내용이 바뀐 페이지만 실제로 임베딩한다.
+
+실행:
+    python ingest_pdfs.py ../pdf
+    python ingest_pdfs.py ../pdf --workers 8 --model dolphin-llama3:8b --name pdf
+    python ingest_pdfs.py ../pdf --splitter korean    # 문장 경계 + 토큰 예산 splitter (chunk 크기 단위가 토큰)
+
+만든 인덱스 사용:
+    qa_system = PDFQASystem(model_name="dolphin-llama3:8b")
+    qa_system.load_vectorstore("pdf")
+"""
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import pymupdf
+from langchain_core.documents import Document
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from rag_common.ann_index import build_faiss_vectorstore
+from rag_common.embedding_cache import ROOT_DIR, CachedEmbeddings
+from rag_common.index_manifest import IndexManifest, chunk_id, embedding_signature, source_hash, splitter_signature
+from rag_common.korean_splitter import KoreanSentenceSplitter
+from rag_common.mmap_store import save_mmap_store
+from rag_common.ollama_embeddings import BatchedOllamaEmbeddings
+
+PDF_INDEX_DIR = os.environ.get("PDF_INDEX_DIR", os.path.join(ROOT_DIR, ".cache", "pdf_index"))
+PAGES_PER_TASK = 16
+# splitter 종류 -> (클래스, 기본 chunk_size, 기본 chunk_overlap). korean 은 토큰 단위
+SPLITTERS = {
+    "recursive": (RecursiveCharacterTextSplitter, 500, 50),
+    "korean": (KoreanSentenceSplitter, 256, 32),
+}
+
+_splitter = None
+
+
+def make_splitter(kind: str, chunk_size: Optional[int] = None, chunk_overlap: Optional[int] = None):
+    splitter_class, default_size, default_overlap = SPLITTERS[kind]
+    return splitter_class(chunk_size=chunk_size or default_size,
+                          chunk_overlap=default_overlap if chunk_overlap is None else chunk_overlap)
+
+
+def _init_worker(kind: str, chunk_size: int, chunk_overlap: int):
+    global _splitter
+    _splitter = make_splitter(kind, chunk_size, chunk_overlap)
+
+
+def parse_pages(path: str, source: str, start: int, end: int) -> List[Dict]:
+    """
+    (process pool 에서 실행) PDF 의 [start, end) 페이지 텍스트를 추출해서 chunk 로 나눈다.
+    Returns:
+        List[Dict]: 페이지별 {"key", "page", "hash", "chunks": [Document, ...]}
+    """
+    results = []
+    with pymupdf.open(path) as pdf:
+        for page_number in range(start, min(end, pdf.page_count)):
+            text = pdf[page_number].get_text()
+            key = f"{source}#page={page_number}"
+            page_doc = Document(page_content=text, metadata={"source": source, "page": page_number})
+            chunks = _splitter.split_documents([page_doc]) if text.strip() else []
+            for i, chunk in enumerate(chunks):
+                chunk.id = chunk_id(key, i)
+            results.append({"key": key, "page": page_number, "hash": source_hash([page_doc]), "chunks": chunks})
+    return results
+
+
+def find_pdfs(root: str) -> List[str]:
+    paths = []
+    for dirpath, _, filenames in os.walk(root):
+        paths += [os.path.join(dirpath, name) for name in filenames if name.lower().endswith(".pdf")]
+    return sorted(paths)
+
+
+class PdfDirectoryIngestor:
+    """폴더의 PDF 를 병렬로 파싱하고, chunk 를 batch 임베딩해서 인덱스 1개로 합친다."""
+
+    def __init__(self, embeddings, workers: int = os.cpu_count() or 4, splitter: str = "recursive",
+                 chunk_size: Optional[int] = None, chunk_overlap: Optional[int] = None, embed_batch: int = 128):
+        self.embeddings = embeddings
+        self.workers = workers
+        self.splitter_kind = splitter
+        self.splitter = make_splitter(splitter, chunk_size, chunk_overlap)
+        self.embed_batch = embed_batch
+        self.failed: Dict[str, str] = {}
+        self.stats = {"files": 0, "pages": 0, "empty_pages": 0, "chunks": 0, "parse_sec": 0.0, "embed_sec": 0.0}
+
+    def _tasks(self, root: str) -> Iterator[Tuple[str, str, int, int]]:
+        for path in find_pdfs(root):
+            source = os.path.relpath(path, root)
+            try:
+                with pymupdf.open(path) as pdf:
+                    page_count = pdf.page_count
+            except Exception as e:
+                self.failed[source] = f"{type(e).__name__}: {e}"
+                continue
+            self.stats["files"] += 1
+            for start in range(0, page_count, PAGES_PER_TASK):
+                yield path, source, start, start + PAGES_PER_TASK
+
+    def iter_pages(self, root: str) -> Iterator[Dict]:
+        """파싱이 끝난 페이지를 끝난 순서대로 꺼낸다. 동시에 제출하는 작업 수는 worker 수의 2배로 제한한다."""
+        started = time.perf_counter()
+        tasks = self._tasks(root)
+        with ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker,
+                                 initargs=(self.splitter_kind, self.splitter._chunk_size,
+                                           self.splitter._chunk_overlap)) as executor:
+            pending = {}
+            while True:
+                for path, source, start, end in tasks:
+                    pending[executor.submit(parse_pages, path, source, start, end)] = source
+                    if len(pending) >= self.workers * 2:
+                        break
+                if not pending:
+                    break
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    source = pending.pop(future)
+                    try:
+                        pages = future.result()
+                    except Exception as e:
+                        self.failed[source] = f"{type(e).__name__}: {e}"
+                        continue
+                    if source in self.failed:
+                        continue
+                    yield from pages
+        self.stats["parse_sec"] = time.perf_counter() - started
+
+    def run(self, root: str, folder_path: str, index_name: str):
+        started = time.perf_counter()
+        page_entries: Dict[str, Dict] = {}
+        documents: List[Document] = []
+        vectors: List[List[float]] = []
+        batch: List[Document] = []
+
+        def flush():
+            embed_started = time.perf_counter()
+            vectors.extend(self.embeddings.embed_documents([doc.page_content for doc in batch]))
+            self.stats["embed_sec"] += time.perf_counter() - embed_started
+            documents.extend(batch)
+            batch.clear()
+
+        for page in self.iter_pages(root):
+            self.stats["pages"] += 1
+            if not page["chunks"]:
+                self.stats["empty_pages"] += 1
+            page_entries[page["key"]] = {"hash": page["hash"], "chunk_ids": [doc.id for doc in page["chunks"]]}
+            batch.extend(page["chunks"])
+            if len(batch) >= self.embed_batch:
+                flush()
+            if self.stats["pages"] % 200 == 0:
+                print(f"[ingest] {self.stats['pages']} pages "
+                      f"({self.stats['pages'] / (time.perf_counter() - started):.1f} pages/s)")
+        if batch:
+            flush()
+
+        # 한 파일의 일부 페이지 범위만 실패한 경우 그 파일은 통째로 인덱스에서 뺀다.
+        keep = [i for i, doc in enumerate(documents) if doc.metadata["source"] not in self.failed]
+        documents = [documents[i] for i in keep]
+        page_entries = {key: entry for key, entry in page_entries.items()
+                        if key.rsplit("#page=", 1)[0] not in self.failed}
+        if not documents:
+            raise SystemExit("인덱싱할 텍스트가 없습니다.")
+
+        self.stats["chunks"] = len(documents)
+        vectorstore = build_faiss_vectorstore(documents, self.embeddings, vectors=[vectors[i] for i in keep])
+        os.makedirs(folder_path, exist_ok=True)
+        save_mmap_store(vectorstore, folder_path, index_name)
+        IndexManifest(
+            embedding=embedding_signature(self.embeddings),
+            splitter=splitter_signature(self.splitter),
+            sources=page_entries,
+        ).save(folder_path, index_name)
+        elapsed = time.perf_counter() - started
+        return vectorstore, elapsed
+
+    def report(self, elapsed: float) -> str:
+        stats = self.stats
+        lines = [
+            f"files={stats['files']} pages={stats['pages']} (empty {stats['empty_pages']}) chunks={stats['chunks']}",
+            f"total {elapsed:.1f}s, {stats['pages'] / elapsed:.1f} pages/s "
+            f"(parse {stats['parse_sec']:.1f}s, embed {stats['embed_sec']:.1f}s, workers={self.workers})",
+        ]
+        for source, error in self.failed.items():
+            lines.append(f"  실패: {source} -> {error}")
+        return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("root", help="PDF 폴더")
+    parser.add_argument("--out", default=PDF_INDEX_DIR, help="인덱스 저장 폴더")
+    parser.add_argument("--name", default=None, help="인덱스 이름 (기본값: 폴더 이름)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 4)
+    parser.add_argument("--model", default="dolphin-llama3:8b")
+    parser.add_argument("--splitter", choices=SPLITTERS, default="recursive")
+    parser.add_argument("--chunk-size", type=int, default=None, help="기본값: recursive 500(글자) / korean 256(토큰)")
+    parser.add_argument("--chunk-overlap", type=int, default=None)
+    parser.add_argument("--batch-size", type=int, default=32)
+    args = parser.parse_args()
+
+    index_name = args.name or os.path.basename(os.path.abspath(args.root))
+    embeddings = CachedEmbeddings(BatchedOllamaEmbeddings(model=args.model, batch_size=args.batch_size))
+    ingestor = PdfDirectoryIngestor(embeddings, workers=args.workers, splitter=args.splitter,
+                                    chunk_size=args.chunk_size,
+                                    chunk_overlap=args.chunk_overlap,
+                                    embed_batch=args.batch_size * embeddings.underlying.max_in_flight)
+    _, elapsed = ingestor.run(args.root, args.out, index_name)
+    print(ingestor.report(elapsed))
+    print(f"[embedding cache] {embeddings.stats}")
+    print(f"인덱스 저장 완료: {os.path.join(args.out, index_name)}")
+
+
+if __name__ == "__main__":
+    main()
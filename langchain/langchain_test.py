@@ -1,88 +1,50 @@
 # https://python.langchain.com/v0.1/docs/modules/model_io/output_parsers/quick_start/
 
 import os
+import sys
 from dotenv import load_dotenv
-from langchain_openai import ChatOpenAI
-from langchain_core.prompts import ChatPromptTemplate, PromptTemplate
-from pydantic.v1 import BaseModel, Field, validator
-from langchain.output_parsers import PydanticOutputParser
+
+from cs_classifier import QUESTION_TYPES, build_chain
+from duplicate_detector import DuplicateDetector
+from question_classifier import QuestionTypeClassifier
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from rag_common.llm_client import default_client, get_chat_model
 
 load_dotenv() # load .env file
 
 API_KEY = os.environ['OPEN_AI_API_KEY']
 CHAT_GPT_MODEL = os.environ['OPEN_AI_MODEL']
 
-class CsResponse(BaseModel):
-    question_type: str = Field(description="문의 성격을 분류해주세요.")
-    emotion: str = Field(description="고객에게 공감하며 위로를 전달하는 말")
-    answer: str = Field(description="고객의 문의에 대한 실질적인 답변")
-
-    @classmethod
-    def model_json_schema(cls):
-        return cls.schema()
-
-parser = PydanticOutputParser(pydantic_object=CsResponse)
-
-prompt = PromptTemplate(
-    template="""
-    너는 NBT라는 애드 테크 기업의 CS 총괄 관리자야. 고객의 문의를 문의 성격에 따라서 분류해주고 적절한 답변을 해줘야 해.
-    답변은 무조건 한국말로 해줘.
-    문의 성격은 총 3가지로 나뉘어.
-    1. 리워드 지급 이슈
-    2. 동일 유저에 대한 중복 문의 (user_id 가 동일하고, 문의 내용이 비슷한 요구사항일 경우)
-    3. 그 외 문의
-
-    너는 1, 2 유형에 대해서 해결책을 제시해줘야 해.
-    3번 유형에 대해서는 분류 후 CX팀에게 전달해줘야 해.
-
-    <유저 문의 내용>
-    유저 ID : {user_id}
-    유저 문의 내용 : {user_question}
-
-    <답변 내용>
-    {format_instructions}
-    """,
-    input_variables=["user_id", "user_question"],
-    partial_variables={"format_instructions": parser.get_format_instructions()}
-)
-
-llm = ChatOpenAI(model=CHAT_GPT_MODEL, openai_api_key=API_KEY)
-
-chain = prompt | llm
-output = chain.invoke({"user_id": "1234", "user_question": "안녕하세요. 캐시슬라이드 설치했는데 리워드가 지급되지 않았어요. 확인해주세요."})
-result = parser.invoke(output)
-print("파싱된 결과:")
-print(f"문의 유형: {result.question_type}")
-print(f"공감 메시지: {result.emotion}")
-print(f"답변 내용: {result.answer}\n")
-
-output2 = chain.invoke({"user_id": "1234", "user_question": "캐시슬라이드 설치했는데 리워드 안줬어요. 주세요."})
-result2 = parser.invoke(output2)
-print("파싱된 결과:")
-print(f"문의 유형: {result2.question_type}")
-print(f"공감 메시지: {result2.emotion}")
-print(f"답변 내용: {result2.answer}\n")
-
-output3 = chain.invoke({"user_id": "TEN3TK$", "user_question": "캐시슬라이드 매체에 광고를 진행하고 싶어요. 어떻게 해야 할까요?"})
-result3 = parser.invoke(output3)
-print("파싱된 결과:")
-print(f"문의 유형: {result3.question_type}")
-print(f"공감 메시지: {result3.emotion}")
-print(f"답변 내용: {result3.answer}\n")
-
-output4 = chain.invoke({"user_id": "agNT$K", "user_question": "오퍼월 광고에 참여했는데 리워드 지급을 못받았어요."})
-result4 = parser.invoke(output4)
-print("파싱된 결과:")
-print(f"문의 유형: {result4.question_type}")
-print(f"공감 메시지: {result4.emotion}")
-print(f"답변 내용: {result4.answer}\n")
-
-output5 = chain.invoke({"user_id": "i4tarRKT", "user_question": "무신사 광고 참여. 리워드 지급 바람"})
-result5 = parser.invoke(output5)
-print("파싱된 결과:")
-print(f"문의 유형: {result5.question_type}")
-print(f"공감 메시지: {result5.emotion}")
-print(f"답변 내용: {result5.answer}\n")
+llm = get_chat_model(CHAT_GPT_MODEL, caller="cs_classifier", api_key=API_KEY)
+
+# 대량 문의는 batch_classify.py 사용
+chain = build_chain(llm)
+inquiries = [
+    {"user_id": "1234", "user_question": "안녕하세요. 캐시슬라이드 설치했는데 리워드가 지급되지 않았어요. 확인해주세요."},
+    {"user_id": "1234", "user_question": "캐시슬라이드 설치했는데 리워드 안줬어요. 주세요."},
+    {"user_id": "TEN3TK$", "user_question": "캐시슬라이드 매체에 광고를 진행하고 싶어요. 어떻게 해야 할까요?"},
+    {"user_id": "agNT$K", "user_question": "오퍼월 광고에 참여했는데 리워드 지급을 못받았어요."},
+    {"user_id": "i4tarRKT", "user_question": "무신사 광고 참여. 리워드 지급 바람"},
+]
+# 같은 user_id 의 중복 문의는 LLM 이 이전 문의를 볼 수 없으므로 LLM 호출 전에 로컬에서 판단한다.
+detector = DuplicateDetector()
+# 문의 유형만 필요하면 1차 분류기로 충분하다. (여기서는 답변도 출력하므로 LLM 도 호출해서 비교)
+first_stage = QuestionTypeClassifier.load()
+for number, inquiry in enumerate(inquiries):
+    match = detector.check_and_add(inquiry["user_id"], str(number), inquiry["user_question"])
+    if match is not None:
+        print(f"문의 유형: {QUESTION_TYPES[1]} (#{match.inquiry_id} 문의와 유사도 {match.similarity:.2f})\n")
+        continue
+    prediction = first_stage.predict(inquiry["user_question"])
+    if prediction is not None:
+        print(f"1차 분류: {prediction.question_type} ({prediction.source}, 확신도 {prediction.confidence:.2f})")
+    result = chain.invoke(inquiry)
+    print("파싱된 결과:")
+    print(f"문의 유형: {result.question_type}")
+    print(f"공감 메시지: {result.emotion}")
+    print(f"답변 내용: {result.answer}\n")
+print(f"[llm]\n{default_client().report()}")
 
 # GPT-3.5 모델 사용
 # 파싱된 결과:
@@ -2,15 +2,22 @@
 
 from langchain_text_splitters import RecursiveCharacterTextSplitter
 from langchain_community.document_loaders import PyMuPDFLoader
-from langchain_community.vectorstores import FAISS
 from langchain_core.output_parsers import StrOutputParser
 from langchain_core.runnables import RunnablePassthrough
 from langchain_core.prompts import PromptTemplate
-from langchain_openai import ChatOpenAI, OpenAIEmbeddings
+from langchain_openai import OpenAIEmbeddings
 
 import os
+import sys
 from dotenv import load_dotenv
 
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from rag_common.ann_index import build_faiss_vectorstore
+from rag_common.context_builder import ContextBuilder
+from rag_common.embedding_cache import CachedEmbeddings
+from rag_common.llm_client import default_client, get_chat_model
+from rag_common.semantic_cache import SemanticCache, chain_fingerprint, file_store_version, with_semantic_cache
+
 # API 키 정보 로드
 load_dotenv()
 
@@ -26,10 +33,12 @@ text_splitter = RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=10
 splitted_docs = text_splitter.split_documents(docs)
 
 # 3. embedding
-embeddings = OpenAIEmbeddings()
+# 동일한 chunk 는 다시 임베딩하지 않도록 캐시 사용
+embeddings = CachedEmbeddings(OpenAIEmbeddings())
 
 # 4. create DB (vector store)
-vectorstore = FAISS.from_documents(
+# 인덱스 종류는 FAISS_INDEX_TYPE 환경변수로 지정 (flat / hnsw / ivf_flat / ivf_pq / auto)
+vectorstore = build_faiss_vectorstore(
     documents=splitted_docs,
     embedding=embeddings,
 )
@@ -41,6 +50,8 @@ vectorstore = FAISS.from_documents(
 # 5: 검색기(Retriever) 생성
 # 문서에 포함되어 있는 정보를 검색하고 생성합니다.
 retriever = vectorstore.as_retriever()
+# 검색된 chunk 의 중복 / chunk_overlap 으로 겹치는 부분을 빼고 토큰 예산 안에서 context 를 만든다.
+context_builder = ContextBuilder()
 
 # 검색기에 의해 질문에 대한 답변의 근거를 잘 찾는지 확인
 # --> 전화는 3번(10초) 내에 받아야 한다는 내용을 찾아내는 것까지 확인함
@@ -68,16 +79,25 @@ All responses must be in Korean.
 
 # 단계 7: 언어모델(LLM) 생성
 # 모델(LLM) 을 생성합니다.
-llm = ChatOpenAI(model_name=os.environ['OPENAI_MODEL'], temperature=0)
+llm = get_chat_model(os.environ['OPENAI_MODEL'], caller="langchain_with_rag", temperature=0)
 
 # 단계 8: 체인(Chain) 생성
 chain = (
-    {"context": retriever, "question": RunnablePassthrough()}
+    {"context": retriever | context_builder, "question": RunnablePassthrough()}
     | prompt
     | llm
     | StrOutputParser()
 )
 
+# 거의 같은 질문은 검색 / LLM 생성 없이 이전 답변을 재사용 (PDF 파일 / 프롬프트 / 모델이 바뀌면 캐시 무효화)
+answer_cache = SemanticCache(
+    embeddings,
+    namespace="daejeon_regulations",
+    store_version=file_store_version(PDF_FILE_PATH),
+    fingerprint=chain_fingerprint(prompt, llm),
+)
+chain = with_semantic_cache(chain, answer_cache)
+
 
 #### 가상의 사용자가 질문 ####
 # 체인 실행(Run Chain)
@@ -85,6 +105,10 @@ chain = (
 question = "공익 신고를 하기 위한 전화번호가 뭐야"
 response = chain.invoke(question)
 print(response)
+print(f"[embedding cache] {embeddings.stats}")
+print(f"[semantic cache] {answer_cache.stats}")
+print(f"[context] {context_builder.stats}")
+print(f"[llm]\n{default_client().report()}")
 # Model : gpt-3.5-turbo-0125
 # Q1) 전화는 몇 초 내로 받아야 해?
 # A1) 전화를 받을 때는 벨이 울리면 3번(10초) 이내에 받아야 합니다.
@@ -1,56 +1,163 @@
 from langchain_community.document_loaders import PyMuPDFLoader
 from langchain.text_splitter import RecursiveCharacterTextSplitter
-from langchain_community.embeddings import OllamaEmbeddings
-from langchain_community.vectorstores import FAISS
 from langchain_community.llms import Ollama
 from langchain.chains import RetrievalQA
 from langchain.prompts import PromptTemplate
-from langchain_core.runnables import RunnablePassthrough
+from langchain_core.runnables import RunnableLambda, RunnablePassthrough
 from langchain_core.output_parsers import StrOutputParser
+from collections import OrderedDict
+from dataclasses import dataclass
+import hashlib
 import os
+import re
+import sys
+import threading
+import time
+
+import requests
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from rag_common.context_builder import ContextBuilder
+from rag_common.embedding_cache import ROOT_DIR, CachedEmbeddings
+from rag_common.index_manifest import (IndexManifest, embedding_signature, file_hash, splitter_signature,
+                                       sync_store)
+from rag_common.mmap_store import exists, load_mmap_store
+from rag_common.ollama_embeddings import BatchedOllamaEmbeddings
+
+# PDF 별 인덱스 저장 위치
+PDF_INDEX_DIR = os.environ.get("PDF_INDEX_DIR", os.path.join(ROOT_DIR, ".cache", "pdf_index"))
+OLLAMA_KEEP_ALIVE = "30m"
+
+
+@dataclass
+class AnswerTiming:
+    """질문 1건의 처리 시간"""
+    retrieval_ms: float = 0.0
+    first_token_ms: float = 0.0
+    total_ms: float = 0.0
+    tokens: int = 0
+    retrieval_cached: bool = False
+
+    @property
+    def tokens_per_sec(self) -> float:
+        generation_sec = (self.total_ms - self.first_token_ms) / 1000
+        return self.tokens / generation_sec if generation_sec > 0 else 0.0
+
+    def __str__(self):
+        return (f"retrieval={self.retrieval_ms:.0f}ms{' (cache)' if self.retrieval_cached else ''} "
+                f"first_token={self.first_token_ms:.0f}ms total={self.total_ms:.0f}ms "
+                f"tokens={self.tokens} ({self.tokens_per_sec:.1f} tokens/s)")
+
 
 class PDFQASystem:
     def __init__(self, model_name="llama3.2"):
         self.model_name = model_name
-        self.embeddings = OllamaEmbeddings(model=model_name)
-        self.llm = Ollama(model=model_name)
+        # chunk 를 batch 로 묶어서 여러 요청을 동시에 보낸다.
+        self.embeddings = CachedEmbeddings(BatchedOllamaEmbeddings(model=model_name))
+        # 질문 사이에 모델이 내려가지 않도록 keep_alive 를 길게 준다.
+        self.llm = Ollama(model=model_name, keep_alive=OLLAMA_KEEP_ALIVE)
         self.vector_store = None
-        
-    def load_pdf(self, pdf_path: str):
-        """PDF 파일을 로드하고 청크로 분할"""
-        # PDF 로드
-        loader = PyMuPDFLoader(pdf_path)
-        documents = loader.load()
-        
-        # 텍스트 분할
-        text_splitter = RecursiveCharacterTextSplitter(
+        self.retriever = None
+        self.qa_chain = None
+        # 같은 질문(공백 / 대소문자 무시)을 다시 하면 검색을 생략한다. (질문 -> context, LRU)
+        self.retrieval_cache = OrderedDict()
+        self.retrieval_cache_size = 64
+        self.last_timing = AnswerTiming()
+        self.text_splitter = RecursiveCharacterTextSplitter(
             chunk_size=500,
             chunk_overlap=50
         )
-        chunks = text_splitter.split_documents(documents)
-        
-        # FAISS Vectorstore 생성
-        self.vector_store = FAISS.from_documents(
-            documents=chunks,
-            embedding=self.embeddings
-        )
-        
-        print(f"PDF 로드 완료: {len(chunks)}개의 청크로 분할됨")
-        
-        # FAISS 인덱스 저장 (선택사항)
-        # self.vector_store.save_local("faiss_index")
+        # 검색된 chunk 의 중복 / chunk_overlap 으로 겹치는 부분을 빼고 토큰 예산 안에서 context 를 만든다.
+        self.context_builder = ContextBuilder()
         
-    def load_vectorstore(self, index_path: str = "faiss_index"):
-        """저장된 FAISS 인덱스 로드 (선택사항)"""
-        if os.path.exists(index_path):
-            self.vector_store = FAISS.load_local(
-                index_path,
-                self.embeddings
-            )
+    @staticmethod
+    def index_name(pdf_path: str) -> str:
+        """PDF 경로별 인덱스 이름 (같은 이름의 다른 PDF 와 섞이지 않도록 경로 hash 를 붙인다)"""
+        stem = os.path.splitext(os.path.basename(pdf_path))[0]
+        return f"{stem}-{hashlib.sha1(os.path.abspath(pdf_path).encode('utf-8')).hexdigest()[:8]}"
+
+    def load_pdf(self, pdf_path: str, index_dir: str = PDF_INDEX_DIR):
+        """
+        PDF 파일을 로드하고 청크로 분할
+        PDF 별 인덱스를 저장해두고, PDF 내용(hash)이 같으면 파싱 / 임베딩 없이 저장된 인덱스를 mmap 으로 연다.
+        PDF 가 바뀌었으면 페이지 단위로 비교해서 바뀐 페이지만 다시 분할 / 임베딩한다.
+        """
+        started = time.perf_counter()
+        index_name = self.index_name(pdf_path)
+        pdf_hash = file_hash(pdf_path)
+        manifest = IndexManifest.load(index_dir, index_name) if exists(index_dir, index_name) else None
+        if (manifest is not None and manifest.document_hash == pdf_hash
+                and manifest.splitter == splitter_signature(self.text_splitter)
+                and manifest.embedding == embedding_signature(self.embeddings)):
+            self.vector_store = load_mmap_store(index_dir, self.embeddings, index_name)
+            self.reset_chain()
+            print(f"저장된 인덱스 로드 완료: {self.vector_store.index.ntotal}개의 청크 "
+                  f"({(time.perf_counter() - started) * 1000:.0f}ms)")
+            return
+
+        # PDF 로드 (페이지 단위 Document)
+        loader = PyMuPDFLoader(pdf_path)
+        pages = loader.load()
+        sources = {f"{os.path.basename(pdf_path)}#page={page.metadata.get('page', i)}": [page]
+                   for i, page in enumerate(pages)}
+
+        # 바뀐 페이지만 분할 / 임베딩 (인덱스 종류는 FAISS_INDEX_TYPE 환경변수로 지정)
+        os.makedirs(index_dir, exist_ok=True)
+        self.vector_store, manifest, plan = sync_store(
+            index_dir, index_name, self.embeddings, sources, splitter=self.text_splitter, prune=True)
+        manifest.document_hash = pdf_hash
+        manifest.save(index_dir, index_name)
+        self.reset_chain()
+
+        print(f"PDF 로드 완료: {self.vector_store.index.ntotal}개의 청크 "
+              f"(바뀐 페이지 {len(plan.changed) + len(plan.added)}개, 삭제된 페이지 {len(plan.removed)}개, "
+              f"{time.perf_counter() - started:.1f}s)")
+        print(f"[embedding cache] {self.embeddings.stats}")
+
+    def load_vectorstore(self, index_name: str, index_dir: str = PDF_INDEX_DIR):
+        """저장된 인덱스를 PDF 없이 로드 (index_name 은 index_name(pdf_path) 로 만든 이름)"""
+        if exists(index_dir, index_name):
+            self.vector_store = load_mmap_store(index_dir, self.embeddings, index_name)
+            self.reset_chain()
             print("기존 FAISS 인덱스를 로드했습니다.")
+
+    def reset_chain(self):
+        """인덱스가 바뀌면 체인과 검색 캐시를 다시 만든다."""
+        self.qa_chain = None
+        self.retrieval_cache.clear()
+
+    def warm_up(self):
+        """
+        빈 prompt 로 요청해서 모델을 메모리에 미리 올린다. (첫 질문에서 모델 로딩을 기다리지 않도록)
+        PDF 로드와 동시에 background thread 에서 실행한다.
+        """
+        try:
+            requests.post(f"{self.llm.base_url}/api/generate",
+                          json={"model": self.model_name, "keep_alive": OLLAMA_KEEP_ALIVE}, timeout=300)
+        except requests.RequestException as e:
+            print(f"모델 warm-up 실패: {str(e)}")
+
+    def retrieve(self, question: str) -> str:
+        """검색 + context 조립. 최근 질문의 결과는 캐시에서 꺼낸다."""
+        started = time.perf_counter()
+        key = re.sub(r"\s+", " ", question).strip().lower()
+        context = self.retrieval_cache.get(key)
+        self.last_timing.retrieval_cached = context is not None
+        if context is None:
+            context = self.context_builder(self.retriever.invoke(question))
+            self.retrieval_cache[key] = context
+            if len(self.retrieval_cache) > self.retrieval_cache_size:
+                self.retrieval_cache.popitem(last=False)
+        else:
+            self.retrieval_cache.move_to_end(key)
+        self.last_timing.retrieval_ms = (time.perf_counter() - started) * 1000
+        return context
         
     def setup_qa_chain(self):
-        """QA 체인 설정"""
+        """QA 체인 설정 (한 번 만든 체인은 인덱스가 바뀔 때까지 재사용)"""
+        if self.qa_chain is not None:
+            return self.qa_chain
+
         prompt_template = """
         You are a assistant at the Daejeon Tourism Organization that provides information about company regulations.
         Your role is to find and answer the user’s questions based on the context.
@@ -73,34 +180,51 @@ class PDFQASystem:
         """
 
         prompt = PromptTemplate.from_template(prompt_template)
-        chain = (
-            {"context": self.vector_store.as_retriever(), "question": RunnablePassthrough()}
+        self.retriever = self.vector_store.as_retriever()
+        self.qa_chain = (
+            {"context": RunnableLambda(self.retrieve), "question": RunnablePassthrough()}
             | prompt
             | self.llm
             | StrOutputParser()
         )
-        return chain
+        return self.qa_chain
         
     def answer_question(self, question: str):
-        """질문에 답변"""
+        """질문에 답변 (생성되는 토큰을 바로 터미널에 출력)"""
         if not self.vector_store:
             return "PDF를 먼저 로드해주세요."
             
         qa_chain = self.setup_qa_chain()
-        response = qa_chain.invoke(question)
+        self.last_timing = timing = AnswerTiming()
         
         print("\n=== 질문 ===")
         print(question)
         print("\n=== 답변 ===")
-        print(response)
+        started = time.perf_counter()
+        parts = []
+        # Ollama 는 토큰 단위로 stream 하므로 chunk 수를 생성 토큰 수로 본다.
+        for chunk in qa_chain.stream(question):
+            if not parts:
+                timing.first_token_ms = (time.perf_counter() - started) * 1000
+            parts.append(chunk)
+            print(chunk, end="", flush=True)
+        print()
+        timing.total_ms = (time.perf_counter() - started) * 1000
+        timing.tokens = len(parts)
+        print(f"[timing] {timing}")
+        print(f"[context] {self.context_builder.stats}")
+        return "".join(parts)
 
 def main():
     # QA 시스템 초기화
     qa_system = PDFQASystem(model_name="dolphin-llama3:8b")  # 또는 다른 Ollama 모델 사용 가능
+    # PDF 를 로드하는 동안 모델을 미리 올려둔다.
+    threading.Thread(target=qa_system.warm_up, daemon=True).start()
     
     # PDF 로드
     pdf_path = "../pdf/daejeon.pdf"  # PDF 파일 경로를 지정해주세요
     qa_system.load_pdf(pdf_path)
+    qa_system.setup_qa_chain()
     
     # 대화형 질문-답변 루프
     print("\nPDF 문서에 대해 질문해주세요. (종료하려면 'quit' 입력)")
@@ -0,0 +1,173 @@
+"""
+CS 문의 유형(question_type) 1차 분류기
+
+"무신사 광고 참여. 리워드 지급 바람" 같은 뻔한 문의까지 LLM 생성으로 question_type 을 채우지 않도록,
+로컬에서 먼저 분류하고 확신도가 낮은 문의만 LLM(CsResponse chain)으로 보낸다.
+1. 키워드 규칙: 리워드 미지급 / 광고 집행·제휴 문의처럼 표현이 정해진 문의
+2. 글자 n-gram(1~3) TF-IDF + LogisticRegression: 이전 분류 결과(batch_classify.py 결과 JSONL 등)로 학습
+- "동일 유저에 대한 중복 문의" 는 문의 내용만으로 알 수 없으므로 여기서는 분류하지 않는다. (duplicate_detector 사용)
+
+실행:
+    python question_classifier.py train results.jsonl              # 모델 학습 후 저장
+    python question_classifier.py evaluate results.jsonl           # 확신도 threshold 별 LLM 결과와 일치율 / LLM 호출 감소율
+    python batch_classify.py inquiries.jsonl --first-stage --min-confidence 0.8
+"""
+import argparse
+import json
+import os
+import re
+import sys
+from dataclasses import dataclass
+from typing import List, Optional, Sequence, Tuple
+
+import joblib
+from sklearn.feature_extraction.text import TfidfVectorizer
+from sklearn.linear_model import LogisticRegression
+from sklearn.model_selection import train_test_split
+from sklearn.pipeline import Pipeline, make_pipeline
+
+from cs_classifier import QUESTION_TYPES, normalize_question_type
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from rag_common.embedding_cache import ROOT_DIR
+
+DEFAULT_MODEL_PATH = os.environ.get("CS_QUESTION_MODEL_PATH",
+                                    os.path.join(ROOT_DIR, ".cache", "cs_question_type.joblib"))
+RULE_CONFIDENCE = 0.95
+
+# "캐시" 는 서비스 이름(캐시슬라이드)에도 들어가므로 리워드 표현으로 쓰지 않는다.
+_REWARD = r"(리워드|적립금?|포인트|보상)"
+# "안" 은 단어 첫 글자일 때만 부정으로 본다. ("안내", "방안" 제외)
+_NOT_PAID = r"((?<![가-힣])안\s*(들어|줬|주|왔|됐|되|나)|못\s*받|미지급|누락|지급\s*(바람|요청|안|좀|해))"
+# (규칙, 문의 유형) 순서대로 먼저 맞는 규칙을 사용한다.
+KEYWORD_RULES: List[Tuple[re.Pattern, str]] = [
+    (re.compile(_REWARD + r".{0,20}" + _NOT_PAID), QUESTION_TYPES[0]),
+    (re.compile(r"(참여|설치|가입|완료)했?는데.{0,20}" + _REWARD), QUESTION_TYPES[0]),
+    (re.compile(r"광고\s*(를|을)?\s*(진행|집행|게재|등록|하고\s*싶)|제휴|입점|채용|회원\s*탈퇴"), QUESTION_TYPES[2]),
+]
+
+
+@dataclass
+class Prediction:
+    question_type: str
+    confidence: float
+    source: str  # "rule" / "model"
+
+
+def load_labeled(path: str) -> Tuple[List[str], List[str]]:
+    """
+    분류 결과 JSONL 에서 (문의 내용, 문의 유형) 을 읽는다. 실패 / 중복 문의는 제외
+    1차 분류기가 직접 분류한 문의(classified_by)도 제외한다. (자기 예측으로 다시 학습하지 않도록)
+    """
+    texts, labels = [], []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            if ("error" in record or "question_type" not in record or record.get("duplicate_of")
+                    or record.get("classified_by")):
+                continue
+            label = normalize_question_type(record["question_type"])
+            if label != QUESTION_TYPES[1]:
+                texts.append(record["user_question"])
+                labels.append(label)
+    return texts, labels
+
+
+class QuestionTypeClassifier:
+    """키워드 규칙 + 글자 n-gram 선형 모델"""
+
+    def __init__(self, model: Optional[Pipeline] = None):
+        self.model = model
+
+    @staticmethod
+    def match_rules(text: str) -> Optional[str]:
+        for pattern, question_type in KEYWORD_RULES:
+            if pattern.search(text):
+                return question_type
+        return None
+
+    def fit(self, texts: Sequence[str], labels: Sequence[str]) -> "QuestionTypeClassifier":
+        self.model = make_pipeline(
+            TfidfVectorizer(analyzer="char_wb", ngram_range=(1, 3), min_df=2, sublinear_tf=True),
+            LogisticRegression(max_iter=1000, class_weight="balanced"),
+        )
+        self.model.fit(texts, labels)
+        return self
+
+    def predict(self, text: str) -> Optional[Prediction]:
+        """규칙에 맞으면 규칙 결과, 아니면 모델 결과. 모델이 없고 규칙에도 안 맞으면 None"""
+        return self.predict_many([text])[0]
+
+    def predict_many(self, texts: Sequence[str]) -> List[Optional[Prediction]]:
+        predictions: List[Optional[Prediction]] = []
+        model_targets = []
+        for i, text in enumerate(texts):
+            question_type = self.match_rules(text)
+            predictions.append(Prediction(question_type, RULE_CONFIDENCE, "rule") if question_type else None)
+            if question_type is None and self.model is not None:
+                model_targets.append(i)
+        if model_targets:
+            probabilities = self.model.predict_proba([texts[i] for i in model_targets])
+            classes = self.model.classes_
+            for i, row in zip(model_targets, probabilities):
+                best = int(row.argmax())
+                predictions[i] = Prediction(str(classes[best]), float(row[best]), "model")
+        return predictions
+
+    def save(self, path: str = DEFAULT_MODEL_PATH):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        joblib.dump(self.model, path)
+
+    @classmethod
+    def load(cls, path: str = DEFAULT_MODEL_PATH) -> "QuestionTypeClassifier":
+        """저장된 모델이 없으면 키워드 규칙만 사용한다."""
+        if not os.path.exists(path):
+            print(f"문의 유형 모델이 없어서 키워드 규칙만 사용합니다: {path}")
+            return cls()
+        return cls(joblib.load(path))
+
+
+def evaluate(texts: List[str], labels: List[str], thresholds: Sequence[float], test_size: float = 0.2):
+    """학습 / 평가 데이터로 나눠서 threshold 별로 1차 분류 비율(= LLM 호출 감소율)과 LLM 결과와의 일치율을 출력한다."""
+    train_texts, test_texts, train_labels, test_labels = train_test_split(
+        texts, labels, test_size=test_size, random_state=0, stratify=labels)
+    classifier = QuestionTypeClassifier().fit(train_texts, train_labels)
+    predictions = classifier.predict_many(test_texts)
+    rule_hits = sum(1 for prediction in predictions if prediction.source == "rule")
+    rule_agree = sum(1 for prediction, label in zip(predictions, test_labels)
+                     if prediction.source == "rule" and prediction.question_type == label)
+    print(f"train={len(train_texts)} test={len(test_texts)} "
+          f"rule_coverage={rule_hits / len(test_texts):.1%} rule_agreement={rule_agree / max(rule_hits, 1):.1%}")
+    print(f"{'threshold':>10}{'llm_avoided':>13}{'agreement':>11}{'overall':>9}")
+    for threshold in thresholds:
+        confident = [(prediction, label) for prediction, label in zip(predictions, test_labels)
+                     if prediction.confidence >= threshold]
+        agree = sum(1 for prediction, label in confident if prediction.question_type == label)
+        # overall: 확신도가 낮은 문의는 LLM 결과를 그대로 쓴다고 보고 계산
+        overall = (agree + len(test_texts) - len(confident)) / len(test_texts)
+        print(f"{threshold:>10.2f}{len(confident) / len(test_texts):>13.1%}"
+              f"{agree / len(confident) if confident else 0.0:>11.1%}{overall:>9.1%}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("command", choices=["train", "evaluate"])
+    parser.add_argument("labeled", help="분류 결과 JSONL (user_question, question_type)")
+    parser.add_argument("--model", default=DEFAULT_MODEL_PATH, help="모델 저장 경로")
+    parser.add_argument("--thresholds", default="0.5,0.6,0.7,0.8,0.9,0.95")
+    args = parser.parse_args()
+
+    texts, labels = load_labeled(args.labeled)
+    print(f"labeled={len(texts)} " + " ".join(f"{t}={labels.count(t)}" for t in QUESTION_TYPES if t in labels))
+    if args.command == "train":
+        QuestionTypeClassifier().fit(texts, labels).save(args.model)
+        print(f"모델 저장: {args.model}")
+    else:
+        evaluate(texts, labels, [float(value) for value in args.thresholds.split(",")])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,239 @@
+"""
+LangGraph 실행 오버헤드 마이크로 벤치마크
+
+state_test.py / conditional_edges_test.py / news_agent/graph.py 는 import 시점에 input() 과 외부 서비스를 호출해서
+프레임워크 자체 비용만 따로 잴 수 없다. 같은 모양의 그래프를 아무 일도 하지 않는 노드로 만들어서
+- compile 시간 (StateGraph 구성 포함)
+- invoke 1회 / step(노드 실행) 1회 오버헤드 (노드 함수를 직접 순서대로 호출한 시간과 비교,
+  linear 그래프 노드 수별 결과로 invoke 고정 비용과 step 당 비용을 나눠서 출력)
+- state 크기(articles 건수)에 따른 state 복사 / 병합 비용
+- checkpointer(MemorySaver) 사용 시 추가 비용
+을 측정한다. LLM / 검색 시간에 비해 오케스트레이션 계층이 latency 예산을 얼마나 쓰는지 확인하는 용도.
+
+실행:
+    python bench_graph.py
+    python bench_graph.py --repeat 2000 --sizes 3,100,1000,10000
+"""
+import argparse
+import itertools
+import statistics
+import time
+from datetime import datetime
+from typing import Callable, Dict, List, Literal, Optional, Tuple, TypedDict
+
+from langgraph.checkpoint.memory import MemorySaver
+from langgraph.graph import END, START, StateGraph
+
+
+# state_test.py
+class CounterState(TypedDict):
+    counter: int
+
+
+# conditional_edges_test.py
+class WeatherState(TypedDict):
+    query: Optional[str]
+    location: Optional[str]
+    forecast: Optional[str]
+
+
+# news_agent/schema.py
+class Article(TypedDict):
+    title: str
+    url: str
+    published_at: datetime
+
+
+class NewsAgentState(TypedDict):
+    input: str
+    articles: List[Article]
+    output: str
+
+
+def increment(state: CounterState):
+    return {"counter": state["counter"] + 1}
+
+
+def build_linear(num_nodes: int) -> StateGraph:
+    """state_test.py 모양: START -> increment_0 -> ... -> increment_{n-1} -> END"""
+    graph = StateGraph(CounterState)
+    previous = START
+    for i in range(num_nodes):
+        graph.add_node(f"increment_{i}", increment)
+        graph.add_edge(previous, f"increment_{i}")
+        previous = f"increment_{i}"
+    graph.add_edge(previous, END)
+    return graph
+
+
+def build_conditional() -> StateGraph:
+    """conditional_edges_test.py 모양 (input() 대신 고정 질문)"""
+    def get_user_input_query(state: WeatherState):
+        return {"query": "weather in Tokyo"}
+
+    def parse_query(state: WeatherState):
+        words = state["query"].split()
+        return {"location": words[words.index("in") + 1] if "in" in words else None}
+
+    def get_forecast(state: WeatherState):
+        return {"forecast": "Cloudy, 20°C"}
+
+    def clarify_location(state: WeatherState):
+        return state
+
+    def generate_response(state: WeatherState):
+        return {"forecast": f"The weather in {state['location']} is: {state['forecast']}"}
+
+    def check_location(state: WeatherState) -> Literal["valid", "invalid", "ambiguous"]:
+        if not state["location"]:
+            return "invalid"
+        return "ambiguous" if len(state["location"]) < 3 else "valid"
+
+    graph = StateGraph(WeatherState)
+    graph.add_node("get_user_input_query", get_user_input_query)
+    graph.add_node("parse_query", parse_query)
+    graph.add_node("get_forecast", get_forecast)
+    graph.add_node("clarify_location", clarify_location)
+    graph.add_node("generate_response", generate_response)
+    graph.add_edge(START, "get_user_input_query")
+    graph.add_edge("get_user_input_query", "parse_query")
+    graph.add_conditional_edges("parse_query", check_location,
+                                {"ambiguous": "clarify_location", "valid": "get_forecast", "invalid": END})
+    graph.add_edge("clarify_location", "get_user_input_query")
+    graph.add_edge("get_forecast", "generate_response")
+    graph.add_edge("generate_response", END)
+    return graph
+
+
+def make_articles(count: int) -> List[Article]:
+    return [{"title": f"기사 제목 {i}", "url": f"https://news.example.com/{i}", "published_at": datetime(2024, 1, 1)}
+            for i in range(count)]
+
+
+def build_news_agent(num_articles: int, retries: int = 0) -> StateGraph:
+    """
+    news_agent/graph.py 모양. SearchNews 는 처음 retries 번은 기사를 2건만 돌려줘서
+    check_article_exist 가 UserInput 으로 되돌아가게 한다.
+    """
+    articles = make_articles(num_articles)
+    attempts = {"count": 0}
+
+    def get_user_input(state: NewsAgentState):
+        return {"input": "삼성전자"}
+
+    def search_news_articles(state: NewsAgentState):
+        attempts["count"] += 1
+        return {"articles": articles[:2] if attempts["count"] <= retries else articles}
+
+    def check_article_exist(state: NewsAgentState) -> Literal["not_existed", "existed"]:
+        if len(state["articles"]) >= 3:
+            attempts["count"] = 0
+            return "existed"
+        return "not_existed"
+
+    def remove_duplicated_articles(state: NewsAgentState):
+        seen, result = set(), []
+        for article in state["articles"]:
+            if article["url"] not in seen:
+                seen.add(article["url"])
+                result.append(article)
+        return {"articles": result}
+
+    def summary_news_articles(state: NewsAgentState):
+        return {"output": f"{len(state['articles'])}건 요약"}
+
+    graph = StateGraph(state_schema=NewsAgentState)
+    graph.add_node("UserInput", get_user_input)
+    graph.add_node("SearchNews", search_news_articles)
+    graph.add_node("RemoveDuplicatedNews", remove_duplicated_articles)
+    graph.add_node("SummaryNews", summary_news_articles)
+    graph.add_edge(START, "UserInput")
+    graph.add_edge("UserInput", "SearchNews")
+    graph.add_conditional_edges("SearchNews", check_article_exist,
+                                {"existed": "RemoveDuplicatedNews", "not_existed": "UserInput"})
+    graph.add_edge("RemoveDuplicatedNews", "SummaryNews")
+    graph.add_edge("SummaryNews", END)
+    return graph
+
+
+def direct_call(graph: StateGraph, initial: Dict, max_steps: int = 1000) -> int:
+    """그래프 없이 노드 함수를 edge 순서대로 직접 호출한다. (기준 시간) Returns: 실행한 노드 수"""
+    nodes = {name: spec.runnable.func for name, spec in graph.nodes.items()}
+    edges = {source: target for source, target in graph.edges}
+    branches = {source: next(iter(branch.values())) for source, branch in graph.branches.items()}
+    state = dict(initial)
+    current, steps = edges[START], 0
+    while current != END and steps < max_steps:
+        state.update(nodes[current](state) or {})
+        steps += 1
+        if current in branches:
+            branch = branches[current]
+            current = branch.ends[branch.path.func(state)]
+        else:
+            current = edges[current]
+    return steps
+
+
+def timeit(fn: Callable, repeat: int, warmup: int = 20) -> List[float]:
+    for _ in range(warmup):
+        fn()
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - started)
+    return samples
+
+
+def bench(name: str, builder: Callable[[], StateGraph], initial: Dict, repeat: int,
+          checkpointer: bool = False) -> Tuple[int, float]:
+    """Returns: (step 수, invoke 중앙값 us)"""
+    compile_samples = timeit(lambda: builder().compile(), max(repeat // 20, 5), warmup=2)
+    graph = builder()
+    app = graph.compile(checkpointer=MemorySaver()) if checkpointer else graph.compile()
+    thread_ids = itertools.count()
+    # checkpointer 는 thread 마다 이력이 쌓이므로 invoke 마다 새 thread 를 사용한다.
+    config = lambda: {"configurable": {"thread_id": str(next(thread_ids))}, "recursion_limit": 1000}
+    steps = direct_call(graph, initial)
+
+    invoke = timeit(lambda: app.invoke(initial, config()), repeat)
+    direct = timeit(lambda: direct_call(graph, initial), repeat)
+    invoke_us = statistics.median(invoke) * 1e6
+    direct_us = statistics.median(direct) * 1e6
+    overhead_per_step = (invoke_us - direct_us) / steps if steps else 0.0
+    print(f"{name:<34}{steps:>6}{statistics.median(compile_samples) * 1e3:>11.2f}{invoke_us:>12.0f}"
+          f"{sorted(invoke)[int(len(invoke) * 0.9)] * 1e6:>10.0f}{direct_us:>10.1f}{overhead_per_step:>12.1f}")
+    return steps, invoke_us
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--repeat", type=int, default=500)
+    parser.add_argument("--sizes", default="3,30,300,3000", help="state 의 articles 건수 (3건 이상)")
+    args = parser.parse_args()
+    # 3건 미만이면 news_agent 그래프가 UserInput 으로 계속 되돌아간다.
+    sizes = [max(int(size), 3) for size in args.sizes.split(",")]
+
+    print(f"{'graph':<34}{'steps':>6}{'compile_ms':>11}{'invoke_us':>12}{'p90_us':>10}{'direct_us':>10}"
+          f"{'us/step':>12}")
+    counter = {"counter": 0}
+    linear = [bench(f"linear {num_nodes} nodes", lambda: build_linear(num_nodes), counter, args.repeat)
+              for num_nodes in (1, 5, 20)]
+    bench("conditional (weather)", build_conditional, {}, args.repeat)
+    news_initial = {"input": "", "articles": [], "output": ""}
+    for retries in (0, 1, 5):
+        bench(f"news_agent retry x{retries}", lambda: build_news_agent(10, retries), news_initial, args.repeat)
+    (first_steps, first_us), (last_steps, last_us) = linear[0], linear[-1]
+    per_step = (last_us - first_us) / (last_steps - first_steps)
+    print(f"-> invoke 고정 비용 ~{first_us - per_step * first_steps:.0f}us + step 당 ~{per_step:.0f}us")
+
+    print("\nstate 크기 (news_agent 모양, articles 건수)")
+    for size in sizes:
+        repeat = max(args.repeat // max(size // 100, 1), 20)
+        bench(f"news_agent articles={size}", lambda: build_news_agent(size), news_initial, repeat)
+        bench(f"news_agent articles={size} +memory", lambda: build_news_agent(size), news_initial, repeat,
+              checkpointer=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,20 +1,27 @@
 # 공부 자료 : https://wikidocs.net/261587
+import os
+import sys
+
 from dotenv import load_dotenv
-from langchain.chat_models import ChatOpenAI
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from rag_common.llm_client import default_client, get_chat_model
 
 # .env 파일에서 환경 변수 로드
 load_dotenv()
 
-# GPT-4o-mini 설정
-gpt4o_mini = ChatOpenAI(
-    model_name="gpt-4o-mini",  # GPT-4o-mini에 해당하는 모델명
+# GPT-4o-mini 설정 (공용 LLM 클라이언트: 모델별 rate limit / 재시도 / 사용량 집계)
+gpt4o_mini = get_chat_model(
+    "gpt-4o-mini",  # GPT-4o-mini에 해당하는 모델명
+    caller="langgraph_test",
     temperature=0.7,
     max_tokens=150,
 )
 
 # GPT-4o 설정
-gpt4o = ChatOpenAI(
-    model_name="gpt-4o",  # GPT-4o에 해당하는 모델명
+gpt4o = get_chat_model(
+    "gpt-4o",  # GPT-4o에 해당하는 모델명
+    caller="langgraph_test",
     temperature=0.7,
     max_tokens=300,
 )
@@ -28,6 +35,7 @@ print(response_mini.content)
 # GPT-4o 사용
 response_full = gpt4o.invoke([HumanMessage(content="Explain the concept of machine learning.")])
 print(response_full.content)
+print(default_client().report())
 
 ## Q1) Hello, how are you?
 # Hello! I'm just a program, so I don't have feelings, but I'm here and ready to help you. How can I assist you today?
@@ -0,0 +1,51 @@
+"""
+랭킹 페이지 HTML 파서 벤치마크
+
+HTML 파일로 파서별 파싱 속도와 추출 건수를 비교한다.
+fixtures/synthetic_*.html 은 실제 네이버 페이지가 아니라 랭킹 페이지 구조(.list_content > a)만 흉내낸 합성 HTML 이다.
+(제목은 임의 단어 조합) 파서 간 속도 비교용이며, 실제 마크업에서 결과가 같은지는 직접 저장한 페이지로 확인한다.
+
+실행:
+    python bench_parser.py [--repeat 50]
+    python bench_parser.py saved_popular_day.html        # 브라우저 등으로 저장한 실제 랭킹 페이지
+"""
+import argparse
+import glob
+import os
+import time
+
+from crawler import available_parsers, parse_ranking_html
+
+FIXTURE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+
+def bench(html: str, parser: str, repeat: int) -> float:
+    """1회 파싱 평균 시간(ms)"""
+    parse_ranking_html(html, parser=parser)  # warm-up
+    start = time.perf_counter()
+    for _ in range(repeat):
+        parse_ranking_html(html, parser=parser)
+    return (time.perf_counter() - start) / repeat * 1000
+
+
+def main():
+    arg_parser = argparse.ArgumentParser()
+    arg_parser.add_argument("paths", nargs="*", help="HTML 파일 (없으면 fixtures/ 의 합성 HTML)")
+    arg_parser.add_argument("--repeat", type=int, default=50)
+    args = arg_parser.parse_args()
+
+    parsers = available_parsers()
+    print(f"{'fixture':<28}{'parser':<12}{'items':>7}{'ms/page':>10}{'speedup':>9}")
+    for path in args.paths or sorted(glob.glob(os.path.join(FIXTURE_DIR, "*.html"))):
+        with open(path, encoding="utf-8") as f:
+            html = f.read()
+        baseline = bench(html, "bs4", args.repeat) if "bs4" in parsers else None
+        for parser in parsers:
+            elapsed = baseline if parser == "bs4" else bench(html, parser, args.repeat)
+            items = len(parse_ranking_html(html, parser=parser))
+            speedup = f"{baseline / elapsed:.1f}x" if baseline else "-"
+            print(f"{os.path.basename(path):<28}{parser:<12}{items:>7}{elapsed:>10.2f}{speedup:>9}")
+
+
+if __name__ == "__main__":
+    main()
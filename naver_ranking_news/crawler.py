@@ -0,0 +1,284 @@
+"""
+네이버 랭킹 뉴스 크롤러
+
+- 섹션별 랭킹 페이지 + 언론사별 랭킹 페이지를 하나의 Session 으로 동시에 가져온다.
+- ETag / Last-Modified 를 저장해두고 conditional request 로 변경되지 않은 페이지는 건너뛴다.
+- HTML 파싱은 selectolax / lxml 이 있으면 그것을 쓰고, 없으면 BeautifulSoup 으로 처리한다.
+- 파싱된 뉴스는 페이지가 끝나는 순서대로 generator 로 흘려보내서 바로 인덱싱할 수 있게 한다.
+"""
+import json
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass
+from typing import Callable, Dict, Iterable, Iterator, List, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+
+RANKING_URL = "https://news.naver.com/main/ranking/popularDay.naver?mid=etc&sid1={sid1}"
+OFFICE_RANKING_URL = "https://news.naver.com/main/ranking/office.naver?officeId={office_id}"
+
+# 랭킹 섹션 (sid1)
+RANKING_SECTIONS = {
+    "100": "정치",
+    "101": "경제",
+    "102": "사회",
+    "103": "생활/문화",
+    "104": "세계",
+    "105": "IT/과학",
+    "111": "전체",
+}
+
+# 언론사별 랭킹 (officeId)
+RANKING_OFFICES = {
+    "001": "연합뉴스",
+    "015": "한국경제",
+    "020": "동아일보",
+    "023": "조선일보",
+    "025": "중앙일보",
+    "028": "한겨레",
+    "032": "경향신문",
+    "055": "SBS",
+    "056": "KBS",
+    "214": "MBC",
+}
+
+HEADERS = {
+    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/123.0.0.0 Safari/537.36"
+}
+
+
+@dataclass
+class NewsItem:
+    """랭킹 뉴스 1건"""
+    title: str
+    url: str
+    source: str  # 어떤 랭킹 페이지에서 가져왔는지 (예: section:105, office:001)
+
+    @property
+    def combined_text(self) -> str:
+        return f"제목: {self.title} URL: {self.url}"
+
+
+# ---------- 파서 ----------
+
+def _parse_with_selectolax(html: str) -> List[Dict[str, str]]:
+    from selectolax.parser import HTMLParser
+
+    results = []
+    for content in HTMLParser(html).css(".list_content"):
+        a_tag = content.css_first("a")
+        if a_tag is not None and a_tag.attributes.get("href"):
+            results.append({"title": a_tag.text(strip=True), "url": a_tag.attributes["href"]})
+    return results
+
+
+def _parse_with_lxml(html: str) -> List[Dict[str, str]]:
+    import lxml.html
+
+    results = []
+    tree = lxml.html.fromstring(html)
+    for content in tree.xpath("//*[contains(concat(' ', normalize-space(@class), ' '), ' list_content ')]"):
+        a_tags = content.xpath(".//a[@href]")
+        if a_tags:
+            a_tag = a_tags[0]
+            results.append({"title": a_tag.text_content().strip(), "url": a_tag.get("href")})
+    return results
+
+
+def _parse_with_bs4(html: str) -> List[Dict[str, str]]:
+    from bs4 import BeautifulSoup
+
+    results = []
+    soup = BeautifulSoup(html, "html.parser")
+    for content in soup.select(".list_content"):
+        a_tag = content.find("a")
+        if a_tag and a_tag.get("href"):
+            results.append({"title": a_tag.get_text(strip=True), "url": a_tag["href"]})
+    return results
+
+
+PARSERS: Dict[str, Callable[[str], List[Dict[str, str]]]] = {
+    "selectolax": _parse_with_selectolax,
+    "lxml": _parse_with_lxml,
+    "bs4": _parse_with_bs4,
+}
+
+
+def available_parsers() -> List[str]:
+    """설치되어 있는 파서 목록 (빠른 순서)"""
+    names = []
+    for name, module in (("selectolax", "selectolax.parser"), ("lxml", "lxml.html"), ("bs4", "bs4")):
+        try:
+            __import__(module)
+            names.append(name)
+        except ImportError:
+            continue
+    return names
+
+
+def parse_ranking_html(html: str, parser: str = "auto") -> List[Dict[str, str]]:
+    """
+    랭킹 페이지 HTML 에서 뉴스 제목과 링크를 추출합니다.
+
+    Args:
+        html (str): 랭킹 페이지 HTML
+        parser (str): selectolax / lxml / bs4 / auto (설치된 것 중 가장 빠른 파서)
+
+    Returns:
+        List[Dict[str, str]]: title, url 목록
+    """
+    if parser == "auto":
+        candidates = available_parsers()
+        if not candidates:
+            raise RuntimeError("사용 가능한 HTML 파서가 없습니다. lxml 또는 beautifulsoup4 를 설치해주세요.")
+        parser = candidates[0]
+    return PARSERS[parser](html)
+
+
+# ---------- conditional request 상태 ----------
+
+class FetchStateStore:
+    """URL 별 ETag / Last-Modified 를 JSON 파일로 저장"""
+
+    def __init__(self, path: Optional[str], load: bool = True):
+        """
+        Args:
+            path (Optional[str]): 저장 경로
+            load (bool): False 면 저장된 상태를 무시하고 처음부터 받는다. (저장은 그대로 path 에 한다)
+        """
+        self.path = path
+        self._lock = threading.Lock()
+        self._state: Dict[str, Dict[str, str]] = {}
+        if load and path and os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                self._state = json.load(f)
+
+    def conditional_headers(self, url: str) -> Dict[str, str]:
+        with self._lock:
+            state = self._state.get(url, {})
+        headers = {}
+        if state.get("etag"):
+            headers["If-None-Match"] = state["etag"]
+        if state.get("last_modified"):
+            headers["If-Modified-Since"] = state["last_modified"]
+        return headers
+
+    def update(self, url: str, response: requests.Response):
+        state = {
+            "etag": response.headers.get("ETag"),
+            "last_modified": response.headers.get("Last-Modified"),
+        }
+        if not any(state.values()):
+            return
+        with self._lock:
+            self._state[url] = state
+
+    def save(self):
+        if not self.path:
+            return
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        with self._lock:
+            with open(self.path, "w", encoding="utf-8") as f:
+                json.dump(self._state, f, ensure_ascii=False, indent=2)
+
+
+# ---------- 크롤러 ----------
+
+class NaverRankingCrawler:
+    """섹션/언론사 랭킹 페이지를 동시에 가져오는 크롤러"""
+
+    def __init__(
+            self,
+            sections: Optional[Iterable[str]] = None,
+            offices: Optional[Iterable[str]] = None,
+            max_workers: int = 8,
+            timeout: float = 10.0,
+            state_path: Optional[str] = None,
+            parser: str = "auto",
+            use_saved_state: bool = True,
+    ):
+        """
+        Args:
+            sections (Optional[Iterable[str]]): 가져올 sid1 목록. 없으면 전체 섹션
+            offices (Optional[Iterable[str]]): 가져올 officeId 목록. 없으면 기본 언론사 목록
+            max_workers (int): 동시에 요청할 페이지 수
+            timeout (float): 요청 timeout (초)
+            state_path (Optional[str]): ETag / Last-Modified 저장 경로. 없으면 conditional request 미사용
+            parser (str): HTML 파서 (parse_ranking_html 참고)
+            use_saved_state (bool): False 면 저장된 ETag / Last-Modified 를 무시한다.
+                (인덱스가 없어졌는데 상태만 남아있으면 모든 페이지가 304 가 되어 아무것도 인덱싱하지 못한다)
+        """
+        self.sections = list(sections) if sections is not None else list(RANKING_SECTIONS)
+        self.offices = list(offices) if offices is not None else list(RANKING_OFFICES)
+        self.max_workers = max_workers
+        self.timeout = timeout
+        self.parser = parser
+        self.state = FetchStateStore(state_path, load=use_saved_state)
+        self.stats = {"fetched": 0, "not_modified": 0, "failed": 0, "parse_failed": 0, "items": 0}
+
+        self.session = requests.Session()
+        self.session.headers.update(HEADERS)
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max_workers)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+    def targets(self) -> List[Dict[str, str]]:
+        targets = [{"source": f"section:{sid1}", "url": RANKING_URL.format(sid1=sid1)} for sid1 in self.sections]
+        targets += [{"source": f"office:{office_id}", "url": OFFICE_RANKING_URL.format(office_id=office_id)}
+                    for office_id in self.offices]
+        return targets
+
+    def _fetch(self, target: Dict[str, str]) -> Optional[requests.Response]:
+        url = target["url"]
+        response = self.session.get(url, headers=self.state.conditional_headers(url), timeout=self.timeout)
+        if response.status_code == 304:
+            return None
+        response.raise_for_status()
+        return response
+
+    def crawl(self) -> Iterator[NewsItem]:
+        """
+        모든 랭킹 페이지를 동시에 가져와서, 끝나는 순서대로 뉴스를 흘려보냅니다.
+        여러 랭킹에 동시에 걸린 뉴스는 한 번만 반환합니다.
+        """
+        seen_urls = set()
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            futures = {executor.submit(self._fetch, target): target for target in self.targets()}
+            for future in as_completed(futures):
+                target = futures[future]
+                try:
+                    response = future.result()
+                except requests.RequestException as e:
+                    print(f"랭킹 페이지 요청 실패: {target['url']}, 에러: {str(e)}")
+                    self.stats["failed"] += 1
+                    continue
+
+                if response is None:
+                    self.stats["not_modified"] += 1
+                    continue
+                self.stats["fetched"] += 1
+                try:
+                    items = parse_ranking_html(response.text, parser=self.parser)
+                except Exception as e:
+                    # 한 페이지의 마크업이 달라도 나머지 페이지는 계속 처리한다.
+                    print(f"랭킹 페이지 파싱 실패: {target['url']}, 에러: {str(e)}")
+                    self.stats["parse_failed"] += 1
+                    continue
+                # 파싱에 성공한 페이지만 ETag 를 기록한다. (실패한 페이지는 다음 실행에서 다시 받는다)
+                self.state.update(target["url"], response)
+
+                for item in items:
+                    if item["url"] in seen_urls:
+                        continue
+                    seen_urls.add(item["url"])
+                    self.stats["items"] += 1
+                    yield NewsItem(title=item["title"], url=item["url"], source=target["source"])
+
+    def save_state(self):
+        """
+        ETag / Last-Modified 저장.
+        인덱스 저장까지 끝난 뒤에 호출해야 다음 실행에서 변경 없는 페이지를 안전하게 건너뛸 수 있다.
+        """
+        self.state.save()
@@ -1,73 +1,127 @@
+import hashlib
 import os
+import sys
+from typing import Iterable, Iterator, List
 
-import requests
-from bs4 import BeautifulSoup
 from dotenv import load_dotenv
-from langchain_community.vectorstores import FAISS
 from langchain_core.documents import Document
 from langchain_core.output_parsers import StrOutputParser
 from langchain_core.prompts import PromptTemplate
 from langchain_core.runnables import RunnablePassthrough
-from langchain_openai import ChatOpenAI, OpenAIEmbeddings
+from langchain_openai import OpenAIEmbeddings
+
+from crawler import NaverRankingCrawler, NewsItem
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from rag_common.ann_index import build_faiss_vectorstore, needs_rebuild
+from rag_common.context_builder import ContextBuilder
+from rag_common.embedding_cache import CachedEmbeddings
+from rag_common.hybrid_retriever import HybridRetriever
+from rag_common.index_manifest import IndexManifest, source_hash, sync_store
+from rag_common.llm_client import default_client, get_chat_model
+from rag_common.mmap_store import save_mmap_store, store_files
+from rag_common.semantic_cache import (SemanticCache, chain_fingerprint, file_store_version, same_keywords,
+                                       with_semantic_cache)
 
 load_dotenv()
 
+VECTOR_DB_PATH = "./db"
 VECTOR_DB_NAME = "faiss_index"
+FETCH_STATE_PATH = os.path.join(VECTOR_DB_PATH, "fetch_state.json")
+INDEX_BATCH_SIZE = 64
 OPEN_AI_API_KEY = os.getenv("OPEN_AI_API_KEY")
 OPEN_AI_MODEL = os.getenv("OPEN_AI_MODEL")
 
 
-def get_naver_new_ranking():
-    headers = {
-        "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/123.0.0.0 Safari/537.36"
-    }
-    news_url = "https://news.naver.com/main/ranking/popularDay.naver?mid=etc&sid1=111"
-    # 요청
-    response = requests.get(news_url, headers=headers)
-    # HTML 파싱
-    soup = BeautifulSoup(response.text, 'html.parser')
-    # .list_content 클래스 요소 모두 찾기
-    content_list = soup.select('.list_content')
-    # 결과 출력 (예: 텍스트만)
-    # 뉴스 제목과 링크 추출
-    news_data = []
-    for content in content_list:
-        a_tag = content.find('a')
-        if a_tag:
-            title = a_tag.get_text(strip=True)
-            url = a_tag['href']
-            full_text = f"제목: {title} URL: {url}"
-            news_data.append({
-                'title': title,
-                'url': url,
-                'combined_text': full_text
-            })
-    return news_data
-
-
-# 1. 네이버 랭킹 뉴스를 제목 및 링크를 추출해서 리스트로 반환함
-news_data = get_naver_new_ranking()
-
-# 2. 임베딩 요청
-docs = [Document(page_content=item['combined_text'], metadata={"title": item['title'], "url": item['url']}) for item in
-        news_data]
-
-embeddings = OpenAIEmbeddings()
-vectorstore = FAISS.load_local(
-    folder_path="./db",
+def _batched(items: Iterable[NewsItem], batch_size: int) -> Iterator[List[NewsItem]]:
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def index_news_items(items: Iterable[NewsItem], vectorstore, embeddings, manifest: IndexManifest,
+                     batch_size: int = INDEX_BATCH_SIZE):
+    """
+    크롤러에서 흘러나오는 뉴스를 batch 단위로 바로 임베딩하고, 크롤링이 끝나면 인덱스에 한 번에 추가한다.
+    IVF 계열 인덱스는 만들 때의 벡터로만 학습하므로 첫 batch 가 아닌 전체 벡터로 만들고,
+    기존 인덱스가 지금 문서 수에 비해 너무 적은 벡터로 학습됐으면 기존 문서까지 포함해서 다시 만든다.
+    이미 인덱스에 있는 뉴스(manifest 에 기록된 URL)는 건너뛰고, 추가한 뉴스는 manifest 에 기록한다.
+    :return: (vectorstore, 새로 추가된 뉴스 건수)
+    """
+    docs, vectors = [], []
+    for batch in _batched(items, batch_size):
+        batch_docs = [Document(id=hashlib.sha1(item.url.encode("utf-8")).hexdigest(),
+                               page_content=item.combined_text,
+                               metadata={"title": item.title, "url": item.url, "source": item.source})
+                      for item in batch]
+        batch_docs = [doc for doc in batch_docs if doc.metadata["url"] not in manifest.sources]
+        if not batch_docs:
+            continue
+        vectors += embeddings.embed_documents([doc.page_content for doc in batch_docs])
+        docs += batch_docs
+        for doc in batch_docs:
+            manifest.sources[doc.metadata["url"]] = {"hash": source_hash([doc]), "chunk_ids": [doc.id]}
+    if not docs:
+        return vectorstore, 0
+
+    added = len(docs)
+    if vectorstore is not None and needs_rebuild(vectorstore.index, vectorstore.index.ntotal + added):
+        # 기존 뉴스는 임베딩 캐시에서 벡터를 가져온다.
+        existing = [Document(id=doc_id, page_content=doc.page_content, metadata=doc.metadata)
+                    for doc_id, doc in ((doc_id, vectorstore.docstore.search(doc_id))
+                                        for doc_id in vectorstore.index_to_docstore_id.values())]
+        vectors = embeddings.embed_documents([doc.page_content for doc in existing]) + vectors
+        docs = existing + docs
+        vectorstore = None
+
+    if vectorstore is None:
+        # 인덱스 종류는 FAISS_INDEX_TYPE 환경변수로 지정 (flat / hnsw / ivf_flat / ivf_pq / auto)
+        vectorstore = build_faiss_vectorstore(documents=docs, embedding=embeddings, vectors=vectors)
+    else:
+        vectorstore.add_embeddings(
+            text_embeddings=zip([doc.page_content for doc in docs], vectors),
+            metadatas=[doc.metadata for doc in docs],
+            ids=[doc.id for doc in docs],
+        )
+    return vectorstore, added
+
+
+# 1. 기존 인덱스 로드 (없으면 새로 생성)
+# 동일한 뉴스 제목은 다시 임베딩하지 않도록 캐시 사용
+embeddings = CachedEmbeddings(OpenAIEmbeddings())
+# 임베딩 모델이 인덱스를 만들 때와 달라졌으면 저장된 뉴스를 모두 다시 임베딩한다. (manifest 비교)
+# 새 뉴스를 추가해야 하므로 mmap(읽기 전용)이 아닌 수정 가능한 모드로 연다.
+vectorstore, manifest, sync_plan = sync_store(
+    folder_path=VECTOR_DB_PATH,
     index_name=VECTOR_DB_NAME,
     embeddings=embeddings,
-    allow_dangerous_deserialization=True,
+    sources={},
+    writable=True,
 )
-
-if not vectorstore:
-    vectorstore = FAISS.from_documents(
-        documents=docs,
-        embedding=embeddings,
-    )
-    vectorstore.save_local(folder_path="./db", index_name=VECTOR_DB_NAME)
-
-retriever = vectorstore.as_retriever()
+print(f"[manifest] {sync_plan}")
+
+# 2. 네이버 랭킹 뉴스(섹션별 + 언론사별)를 동시에 가져오면서 바로 인덱싱
+# 인덱스가 없으면 저장된 ETag 를 무시한다. (남아있으면 모든 페이지가 304 가 되어 인덱스를 만들 수 없음)
+crawler = NaverRankingCrawler(state_path=FETCH_STATE_PATH, use_saved_state=vectorstore is not None)
+vectorstore, added_count = index_news_items(crawler.crawl(), vectorstore, embeddings, manifest)
+print(f"[crawler] {crawler.stats}, 새로 인덱싱된 뉴스: {added_count}건")
+
+if vectorstore is None:
+    raise SystemExit("인덱싱된 뉴스가 없습니다.")
+if added_count:
+    save_mmap_store(vectorstore, folder_path=VECTOR_DB_PATH, index_name=VECTOR_DB_NAME)
+    manifest.save(VECTOR_DB_PATH, VECTOR_DB_NAME)
+crawler.save_state()
+
+# 인물 이름 같은 키워드 검색은 BM25 로 먼저 찾고, 확실하지 않을 때만 벡터 검색과 합친다.
+retriever = HybridRetriever.from_vectorstore(vectorstore)
+# 검색된 뉴스에서 중복을 빼고 "[번호] 제목\n본문" 형태로 토큰 예산 안에서 context 를 만든다.
+context_builder = ContextBuilder()
 
 prompt = PromptTemplate.from_template(
     """너는 최신 인기 뉴스를 알려주는 뉴스 요약 챗봇이야.
@@ -91,16 +145,32 @@ prompt = PromptTemplate.from_template(
 
 # 단계 7: 언어모델(LLM) 생성
 # 모델(LLM) 을 생성합니다.
-llm = ChatOpenAI(model=OPEN_AI_MODEL, api_key=OPEN_AI_API_KEY)
+llm = get_chat_model(OPEN_AI_MODEL, caller="naver_ranking_news", api_key=OPEN_AI_API_KEY)
 
 # 단계 8: 체인(Chain) 생성
 chain = (
-        {"context": retriever, "question": RunnablePassthrough()}
+        {"context": retriever | context_builder, "question": RunnablePassthrough()}
         | prompt
         | llm
         | StrOutputParser()
 )
 
+# 거의 같은 질문은 검색 / LLM 생성 없이 이전 답변을 재사용 (인덱스 파일 / 프롬프트 / 모델이 바뀌면 캐시 무효화)
+answer_cache = SemanticCache(
+    embeddings,
+    namespace="naver_ranking_news",
+    store_version=file_store_version(*store_files(VECTOR_DB_PATH, VECTOR_DB_NAME)),
+    fingerprint=chain_fingerprint(prompt, llm),
+    # 같은 질문 틀에 이름만 바꾼 질문("A 뉴스 찾아줘" / "B 뉴스 찾아줘")도 유사도가 높으므로 검색어가 같을 때만 재사용
+    guard=same_keywords,
+)
+# 인물 이름처럼 BM25 로 바로 찾는 질문은 유사 질문 조회에도 임베딩하지 않는다. (같은 문장의 질문만 재사용)
+chain = with_semantic_cache(chain, answer_cache, skip_embedding=retriever.lexical_confident)
+
 question = "김재준 들어간 뉴스 찾아줘"
 response = chain.invoke(question)
 print(response)
+print(f"[embedding cache] {embeddings.stats}")
+print(f"[semantic cache] {answer_cache.stats}")
+print(f"[context] {context_builder.stats}")
+print(f"[llm]\n{default_client().report()}")
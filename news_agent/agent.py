@@ -1,47 +1,81 @@
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+
 from langgraph.graph import StateGraph, START, END
 
-from nodes.news_summary import NewsSummarizer
+from nodes.news_summary import DeadlineExceeded, NewsSummarizer
 from nodes.search_news import NewsSearcher
 from schema import NewsAgentState
 
+# 요청 1건의 전체 제한 시간(초). 응답 시간 p99 를 이 값 이하로 맞춘다.
+DEFAULT_TIMEOUT = float(os.environ.get("NEWS_AGENT_TIMEOUT", "20"))
+# 남은 시간이 이보다 적으면 새 기사 추출 / 요약을 시작하지 않는다. (기사 1건 처리에 드는 대략적인 시간)
+MIN_SUMMARY_SECONDS = float(os.environ.get("NEWS_AGENT_MIN_SUMMARY_SECONDS", "3"))
+SUMMARY_WORKERS = int(os.environ.get("NEWS_AGENT_SUMMARY_WORKERS", "4"))
+
 
 class NewsAgent:
-    def __init__(self, tavily_api_key="", openai_api_key="", llm_model="gpt-3.5-turbo-0125"):
+    def __init__(self, tavily_api_key="", openai_api_key="", llm_model="gpt-3.5-turbo-0125",
+                 timeout_seconds=DEFAULT_TIMEOUT, min_summary_seconds=MIN_SUMMARY_SECONDS,
+                 summary_workers=SUMMARY_WORKERS):
         self.tavily_api_key = tavily_api_key
         self.openai_api_key = openai_api_key
         self.llm_model = llm_model
+        self.timeout_seconds = timeout_seconds
+        self.min_summary_seconds = min_summary_seconds
+        self.summary_workers = summary_workers
         self.agent = None
         self.user_query = None
         self._graph = StateGraph(state_schema=NewsAgentState)
         self._build_agent()
 
-    def execute(self, user_query):
+    def execute(self, user_query, timeout=None):
         """
         유저가 던진 질문에 답변을 해주는 News agent
         기본적으로 사용자가 입력한 키워드 기반으로 뉴스들의 내용을 요약하여 정리해준다.
         :param user_query: 사용자 질문
-        :return: 요약된 내용
+        :param timeout: 전체 제한 시간(초). None 이면 timeout_seconds
+        :return: 요약된 내용. 제한 시간 때문에 일부 기사만 요약한 경우 partial 이 True
         """
         self.user_query = user_query
+        deadline = time.monotonic() + (self.timeout_seconds if timeout is None else timeout)
         try:
             return self.agent.invoke({
                 "input": user_query,
                 "articles": [],
-                "output": []
+                "output": [],
+                "deadline": deadline,
+                "partial": False
             })
         except Exception as e:
             return {
                 "input": user_query,
                 "articles": [],
-                "output": [f"Error is occurred {str(e)}"]
+                "output": [f"Error is occurred {str(e)}"],
+                "deadline": deadline,
+                "partial": False
             }
 
+    @staticmethod
+    def _remaining(state: NewsAgentState) -> float:
+        """마감까지 남은 시간(초)"""
+        return state["deadline"] - time.monotonic()
+
     def _search_news_articles(self, state: NewsAgentState):
         print('_search_news_articles')
+        if self._remaining(state) <= 0:
+            return {"articles": [], "partial": True}
         question = state["input"]
         searcher = NewsSearcher(tavily_api_key=self.tavily_api_key, openai_api_key=self.openai_api_key,
                                 model=self.llm_model)
-        articles = searcher.get_news_results(question)
+        try:
+            articles = searcher.get_news_results(question, deadline=state["deadline"])
+        except Exception:
+            # 마감 시각 때문에 끊긴 경우만 빈 결과로 처리하고, 그 외 오류는 그대로 올린다.
+            if self._remaining(state) > 0:
+                raise
+            return {"articles": [], "partial": True}
         # TODO : 전체 기사가 아닌 특정 몇몇 건에 대해서만 요약하도록 건수 제한 처리 추가 필요
         return {"articles": articles}
 
@@ -57,25 +91,61 @@ class NewsAgent:
 
         return {"articles": result}
 
+    def _summarize_one(self, summarizer: NewsSummarizer, article, deadline: float):
+        """
+        기사 1건 본문 추출 + 요약
+        :return: (요약 결과 또는 None, 마감 시각 / 요약 실패 때문에 결과를 버렸는지 여부)
+        """
+        if deadline - time.monotonic() < self.min_summary_seconds:
+            return None, True
+        news_url = article.get('url')
+        news_article = summarizer.extract_news_content(news_url, timeout=deadline - time.monotonic())
+        if news_article is None or news_article == "":
+            return None, time.monotonic() >= deadline
+
+        try:
+            summarized_content = summarizer.summarize_article(news_article, deadline=deadline)
+        except DeadlineExceeded:
+            return None, True
+        if summarized_content is None:
+            # 요약하지 못한 기사는 결과에 넣지 않고 버린 기사로 표시한다.
+            return None, True
+        return {
+            "title": article.get('title'),
+            "url": news_url,
+            "summarized_content": summarized_content
+        }, False
+
     def _summary_news_articles(self, state: NewsAgentState):
+        """
+        기사들을 병렬로 요약한다. 남은 시간이 min_summary_seconds 보다 적으면 새 기사를 시작하지 않고,
+        마감 시각까지 끝난 요약만 (기사 순서대로) 반환하며 partial 을 표시한다.
+        """
         print('_summary_news_articles')
         summarizer = NewsSummarizer(api_key=self.openai_api_key, llm_model=self.llm_model)
-        results = []
+        deadline = state["deadline"]
+        executor = ThreadPoolExecutor(max_workers=self.summary_workers)
+        futures = [executor.submit(self._summarize_one, summarizer, article, deadline)
+                   for article in state["articles"]]
+        done, not_done = wait(futures, timeout=max(self._remaining(state), 0))
+        # 마감 시각을 넘긴 작업은 기다리지 않는다. (진행 중인 LLM 호출도 deadline 으로 곧 끝난다)
+        executor.shutdown(wait=False, cancel_futures=True)
 
-        for article in state["articles"]:
-            news_url = article.get('url')
-            news_article = summarizer.extract_news_content(news_url)
-            if news_article is None or news_article == "":
+        results = []
+        partial = bool(not_done)
+        for future in futures:
+            if future not in done:
                 continue
+            try:
+                result, dropped = future.result()
+            except Exception as e:
+                print(f"기사 요약 중 오류 발생: {str(e)}")
+                continue
+            partial = partial or dropped
+            if result is not None:
+                results.append(result)
 
-            summarized_content = summarizer.summarize_article(news_article)
-            results.append({
-                "title": article.get('title'),
-                "url": news_url,
-                "summarized_content": summarized_content
-            })
-
-        return {"output": results}
+        return {"output": results, "partial": state["partial"] or partial}
 
     def _check_article_exist(self, state: NewsAgentState):
         """
@@ -92,6 +162,8 @@ class NewsAgent:
 
     def _generate_response(self, state: NewsAgentState):
         articles = state["articles"]
+        if state["partial"] and len(state["output"]) <= 0:
+            return {"output": ["제한 시간 안에 뉴스를 요약하지 못했습니다. 잠시 후 다시 시도해주세요"]}
         if len(articles) <= 0:
             return {"output": ["결과를 찾을 수 없습니다. 다시 입력해주세요"]}
         return state
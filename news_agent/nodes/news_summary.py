@@ -1,13 +1,16 @@
 import os
+import sys
 from abc import ABC, abstractmethod
 from dataclasses import dataclass
 from typing import Optional
 
 from dotenv import load_dotenv
 from langchain.prompts import ChatPromptTemplate
-from langchain_openai import ChatOpenAI
 from newspaper import Article
 
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+from rag_common.llm_client import DeadlineExceeded, get_chat_model
+
 
 @dataclass
 class NewsArticle:
@@ -22,12 +25,13 @@ class NewsContentExtractor(ABC):
     """뉴스 기사 본문 추출을 위한 추상 클래스"""
 
     @abstractmethod
-    def extract(self, url: str) -> Optional[NewsArticle]:
+    def extract(self, url: str, timeout: Optional[float] = None) -> Optional[NewsArticle]:
         """
         뉴스 기사 본문을 추출합니다.
         
         Args:
             url (str): 뉴스 기사 URL
+            timeout (Optional[float]): 다운로드 제한 시간(초). None 이면 추출기 기본값
             
         Returns:
             Optional[NewsArticle]: 추출된 기사 정보. 실패 시 None 반환
@@ -38,9 +42,9 @@ class NewsContentExtractor(ABC):
 class Newspaper3kExtractor(NewsContentExtractor):
     """newspaper3k를 사용한 뉴스 기사 본문 추출기"""
 
-    def extract(self, url: str) -> Optional[NewsArticle]:
+    def extract(self, url: str, timeout: Optional[float] = None) -> Optional[NewsArticle]:
         try:
-            article = Article(url)
+            article = Article(url) if timeout is None else Article(url, request_timeout=max(timeout, 0.1))
             article.download()
             article.parse()
 
@@ -76,7 +80,7 @@ class NewsSummarizer:
             content_extractor (Optional[NewsContentExtractor]): 뉴스 본문 추출기
         """
         self.llm_model = llm_model
-        self.llm = ChatOpenAI(model_name=llm_model, temperature=0.5, openai_api_key=api_key)
+        self.llm = get_chat_model(llm_model, caller="news_summary", temperature=0.5, api_key=api_key)
         self.content_extractor = content_extractor or Newspaper3kExtractor()
 
         # 요약을 위한 프롬프트 템플릿
@@ -100,27 +104,32 @@ class NewsSummarizer:
             ("human", "다음 뉴스 기사를 요약해주세요:\n\n제목: {title}\n\n내용:\n{content}")
         ])
 
-    def extract_news_content(self, news_url: str) -> Optional[NewsArticle]:
+    def extract_news_content(self, news_url: str, timeout: Optional[float] = None) -> Optional[NewsArticle]:
         """
         뉴스 기사 본문을 추출합니다.
         
         Args:
             news_url (str): 뉴스 기사 URL
+            timeout (Optional[float]): 다운로드 제한 시간(초)
             
         Returns:
             Optional[NewsArticle]: 추출된 기사 정보
         """
-        return self.content_extractor.extract(news_url)
+        return self.content_extractor.extract(news_url, timeout=timeout)
 
-    def summarize_article(self, article: NewsArticle) -> Optional[str]:
+    def summarize_article(self, article: NewsArticle, deadline: Optional[float] = None) -> Optional[str]:
         """
         뉴스 기사를 요약합니다.
         
         Args:
             article (NewsArticle): 요약할 뉴스 기사
+            deadline (Optional[float]): time.monotonic() 기준 마감 시각
             
         Returns:
-            Optional[str]: 요약된 기사 내용
+            Optional[str]: 요약된 기사 내용 (요약에 실패하면 None)
+
+        Raises:
+            DeadlineExceeded: 마감 시각 안에 요약을 시작 / 재시도할 수 없는 경우
         """
         if not article.content:
             print("기사 본문이 비어있어 요약할 수 없습니다.")
@@ -133,9 +142,12 @@ class NewsSummarizer:
             )
 
             # GPT를 사용하여 요약 생성
-            response = self.llm.invoke(prompt)
+            response = self.llm.invoke(prompt, deadline=deadline)
             return response.content
 
+        except DeadlineExceeded:
+            # 호출하는 쪽에서 시간 초과로 버린 기사로 처리해야 하므로 그대로 올린다.
+            raise
         except Exception as e:
             print(f"기사 요약 중 오류 발생: {str(e)}")
             return None
@@ -1,13 +1,17 @@
 import os
+import sys
+import time
 from typing import List, Optional
 
 from dotenv import load_dotenv
 from langchain_core.prompts import PromptTemplate
-from langchain_openai import ChatOpenAI
 from tavily import TavilyClient
 from datetime import datetime
 from schema import Article
 
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+from rag_common.llm_client import get_chat_model
+
 load_dotenv()
 
 class NewsSearcher:
@@ -26,23 +30,32 @@ class NewsSearcher:
         그 외에는 YES라고 대답해주세요.
         """
         self.prompt = PromptTemplate.from_template(prompt_template)
-        self.llm = ChatOpenAI(api_key=openai_api_key, model=model, temperature=0)
+        self.llm = get_chat_model(model, caller="news_search", api_key=openai_api_key, temperature=0)
         self.chain = self.prompt | self.llm
 
-    def _is_valid_answer(self, answer: str) -> bool:
-        result = self.chain.invoke({"answer": answer})
+    def _is_valid_answer(self, answer: str, deadline: Optional[float] = None) -> bool:
+        chain = self.chain if deadline is None else self.prompt | self.llm.bind(deadline=deadline)
+        result = chain.invoke({"answer": answer})
         return result.content.strip() == "YES"
 
-    def get_news_results(self, question: str) -> List[Article]:
+    def get_news_results(self, question: str, deadline: Optional[float] = None) -> List[Article]:
+        """
+        deadline(time.monotonic() 기준)을 주면 Tavily 요청과 답변 검증 LLM 호출을 남은 시간 안으로 제한한다.
+        시간 안에 끝나지 않으면 requests / openai timeout 또는 DeadlineExceeded 가 발생한다.
+        """
+        options = {}
+        if deadline is not None:
+            options["timeout"] = max(deadline - time.monotonic(), 0.1)
         response = self.client.search(
             query=question,
             search_depth="advanced",
             include_answer="basic",
             exclude_domains=["youtube"],
+            **options,
         )
 
         answer = response.get("answer", "")
-        if not self._is_valid_answer(answer):
+        if not self._is_valid_answer(answer, deadline):
             return []
 
         results = []
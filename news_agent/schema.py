@@ -12,3 +12,5 @@ class NewsAgentState(TypedDict):
     input: str
     articles: list[Article]
     output: str
+    deadline: float  # time.monotonic() 기준 응답 마감 시각
+    partial: bool  # 마감 시각 때문에 일부 결과만 담긴 경우 True
@@ -1,6 +1,6 @@
 import streamlit as st
 
-from agent import NewsAgent
+from agent import DEFAULT_TIMEOUT, NewsAgent
 
 ROLE_ASSISTANT = "assistant"
 ROLE_USER = "user"
@@ -10,6 +10,8 @@ with st.sidebar:
     llm_model = st.text_input("LLM Model", key="llm_model")
     openai_api_key = st.text_input("OpenAI API Key", key="chatbot_api_key", type="password")
     tavily_api_key = st.text_input("Tavily API Key", key="news_article_fetching_api_key", type="password")
+    timeout_seconds = st.number_input("응답 제한 시간(초)", min_value=1.0, value=DEFAULT_TIMEOUT, step=1.0,
+                                      key="timeout_seconds")
     "[OpenAI API Key 발급하러 가기](https://platform.openai.com/account/api-keys)"
     "[Tavily API Key 발급하러 가기](https://app.tavily.com/home)"
 
@@ -32,7 +34,8 @@ if user_input_query := st.chat_input():
         st.info("Tavily API Key를 세팅해주세요!")
         st.stop()
 
-    client = NewsAgent(tavily_api_key=tavily_api_key, openai_api_key=openai_api_key, llm_model=llm_model)
+    client = NewsAgent(tavily_api_key=tavily_api_key, openai_api_key=openai_api_key, llm_model=llm_model,
+                       timeout_seconds=timeout_seconds)
 
     # 유저 채팅
     st.session_state.messages.append({"role": ROLE_USER, "content": user_input_query})
@@ -42,12 +45,14 @@ if user_input_query := st.chat_input():
     response = client.execute(user_input_query)
 
     msg_list = []
-    if len(response.get('output')) == 1:
+    if len(response.get('output')) == 1 and isinstance(response.get('output')[0], str):
         msg = response.get('output')[0]
     else:
         for summarized_article in response.get('output'):
             msg_list.append(
                 f"\n\n제목: {summarized_article.get('title')}\n\nurl: {summarized_article.get('url')}\n\nsummary)\n{summarized_article.get('summarized_content')}\n\n")
         msg = "\n=================================================\n".join(msg_list)
+        if response.get('partial'):
+            msg += "\n\n(제한 시간 안에 요약한 기사만 표시합니다)"
     st.session_state.messages.append({"role": ROLE_ASSISTANT, "content": msg})
     st.chat_message(ROLE_ASSISTANT).write(msg)
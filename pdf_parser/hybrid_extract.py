@@ -0,0 +1,176 @@
+"""
+페이지별 text layer / OCR 하이브리드 PDF 텍스트 추출
+
+대부분의 PDF 페이지는 text layer 가 있어서 PyMuPDF 로 바로 텍스트를 꺼낼 수 있다.
+문서 전체를 OCR 하지 않고,
+1. 모든 페이지에서 PyMuPDF text layer 를 먼저 추출하고 (빠름)
+2. 스캔 페이지 / 텍스트가 너무 적은 페이지만 이미지로 렌더링해서 Tesseract OCR 을 process pool 에서 병렬로 실행한 뒤
+3. 페이지 순서대로 합친다.
+
+Tesseract 는 CLI 로 호출한다. (TESSERACT_CMD 환경변수로 경로 지정, 한국어는 kor 언어 데이터 필요)
+OCR 결과는 page cache 에 저장해서, 같은 페이지는 다시 OCR 하지 않는다. (--no-cache 로 끄기)
+
+실행:
+    python hybrid_extract.py ../pdf/daejeon.pdf --out daejeon.txt
+    python hybrid_extract.py ../pdf/cashslide.pdf --compare      # 전체 OCR 과 처리 시간 비교
+"""
+import argparse
+import os
+import subprocess
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import List, Optional
+
+import pymupdf
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from rag_common.page_cache import PageCache, page_hash
+
+TESSERACT_CMD = os.environ.get("TESSERACT_CMD", "tesseract")
+
+
+@dataclass
+class PageText:
+    page: int
+    text: str
+    method: str  # "text" / "ocr" / "cache" / "failed"
+    seconds: float = 0.0
+
+
+def needs_ocr(page: "pymupdf.Page", text: str, min_chars: int = 50, min_image_coverage: float = 0.5) -> bool:
+    """
+    text layer 만으로 부족한 페이지인지 판단한다.
+    - 텍스트가 min_chars 글자 미만이거나
+    - 페이지 면적의 min_image_coverage 이상을 이미지가 덮고 있고 텍스트가 적은 경우 (스캔 + 일부 텍스트)
+    """
+    chars = len("".join(text.split()))
+    if chars < min_chars:
+        return True
+    page_area = abs(page.rect) or 1.0
+    image_area = sum(abs(pymupdf.Rect(info["bbox"]) & page.rect) for info in page.get_image_info())
+    return image_area / page_area >= min_image_coverage and chars < min_chars * 4
+
+
+@lru_cache(maxsize=None)
+def tesseract_version() -> str:
+    try:
+        result = subprocess.run([TESSERACT_CMD, "--version"], stdin=subprocess.DEVNULL, capture_output=True,
+                                check=False, timeout=10)
+        return (result.stdout or result.stderr).decode("utf-8", "replace").splitlines()[0].strip()
+    except (OSError, IndexError, subprocess.TimeoutExpired):
+        return "unknown"
+
+
+def ocr_page(path: str, page_number: int, dpi: int = 300, lang: str = "kor+eng") -> PageText:
+    """(process pool 에서 실행) 페이지를 이미지로 렌더링해서 Tesseract 로 OCR 한다."""
+    started = time.perf_counter()
+    with pymupdf.open(path) as pdf:
+        png = pdf[page_number].get_pixmap(dpi=dpi).tobytes("png")
+    result = subprocess.run([TESSERACT_CMD, "stdin", "stdout", "-l", lang],
+                            input=png, capture_output=True, check=False)
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.decode("utf-8", "replace").strip())
+    return PageText(page_number, result.stdout.decode("utf-8"), "ocr", time.perf_counter() - started)
+
+
+def extract_pdf(path: str, executor: Optional[ProcessPoolExecutor] = None, workers: int = os.cpu_count() or 4,
+                min_chars: int = 50, dpi: int = 300, lang: str = "kor+eng", force_ocr: bool = False,
+                cache: Optional[PageCache] = None) -> List[PageText]:
+    """
+    PDF 의 모든 페이지 텍스트를 페이지 순서대로 반환한다.
+
+    Args:
+        path (str): PDF 경로
+        executor (Optional[ProcessPoolExecutor]): 여러 PDF 를 처리할 때 재사용할 process pool
+        workers (int): executor 가 없을 때 만들 process 수
+        min_chars (int): text layer 글자 수가 이보다 적으면 OCR
+        dpi (int): OCR 렌더링 해상도
+        lang (str): Tesseract 언어
+        force_ocr (bool): 모든 페이지를 OCR (비교용)
+        cache (Optional[PageCache]): OCR 결과 캐시. (페이지 hash, "tesseract", 버전 + 언어 + dpi) 로 저장
+    """
+    pages: List[Optional[PageText]] = []
+    ocr_targets = []
+    ocr_hashes = {}
+    cache_version = f"{tesseract_version()}:{lang}:{dpi}"
+    object_digests = {}  # 페이지 hash 계산 시 공유하는 폰트 / 이미지 등 객체 digest
+    with pymupdf.open(path) as pdf:
+        for page in pdf:
+            started = time.perf_counter()
+            text = page.get_text()
+            if not (force_ocr or needs_ocr(page, text, min_chars)):
+                pages.append(PageText(page.number, text, "text", time.perf_counter() - started))
+                continue
+            cached = None
+            if cache is not None:
+                ocr_hashes[page.number] = page_hash(page, object_digests)
+                cached = cache.get(ocr_hashes[page.number], "tesseract", cache_version)
+            if cached is not None:
+                pages.append(PageText(page.number, cached.text, "cache", time.perf_counter() - started))
+            else:
+                pages.append(None)
+                ocr_targets.append(page.number)
+
+    if ocr_targets:
+        own_executor = executor is None
+        executor = executor or ProcessPoolExecutor(max_workers=min(workers, len(ocr_targets)))
+        try:
+            futures = {page_number: executor.submit(ocr_page, path, page_number, dpi, lang)
+                       for page_number in ocr_targets}
+            for page_number, future in futures.items():
+                try:
+                    pages[page_number] = future.result()
+                    if cache is not None:
+                        cache.put(ocr_hashes[page_number], "tesseract", cache_version, pages[page_number].text,
+                                  page_number=page_number)
+                except Exception as e:
+                    print(f"OCR 실패: {path} p.{page_number + 1}, 에러: {str(e)}")
+                    pages[page_number] = PageText(page_number, "", "failed")
+        finally:
+            if own_executor:
+                executor.shutdown()
+    return pages
+
+
+def summarize(pages: List[PageText], elapsed: float) -> str:
+    counts = {method: sum(1 for page in pages if page.method == method)
+              for method in ("text", "ocr", "cache", "failed")}
+    return (f"pages={len(pages)} text={counts['text']} ocr={counts['ocr']} cache={counts['cache']} "
+            f"failed={counts['failed']} "
+            f"{elapsed:.2f}s ({len(pages) / elapsed:.1f} pages/s)")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("pdf")
+    parser.add_argument("--out", help="추출한 텍스트 저장 경로 (페이지 사이에 form feed)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 4)
+    parser.add_argument("--min-chars", type=int, default=50)
+    parser.add_argument("--dpi", type=int, default=300)
+    parser.add_argument("--lang", default="kor+eng")
+    parser.add_argument("--compare", action="store_true", help="전체 페이지 OCR 과 처리 시간 비교 (캐시 사용 안함)")
+    parser.add_argument("--no-cache", action="store_true", help="page cache 사용 안함")
+    args = parser.parse_args()
+
+    cache = None if args.no_cache else PageCache()
+    started = time.perf_counter()
+    pages = extract_pdf(args.pdf, workers=args.workers, min_chars=args.min_chars, dpi=args.dpi, lang=args.lang,
+                        cache=cache)
+    print(f"[hybrid] {summarize(pages, time.perf_counter() - started)}")
+    if cache is not None:
+        print(f"[page cache] {cache.stats}")
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            f.write("\f".join(page.text for page in pages))
+
+    if args.compare:
+        started = time.perf_counter()
+        ocr_pages = extract_pdf(args.pdf, workers=args.workers, dpi=args.dpi, lang=args.lang, force_ocr=True)
+        print(f"[ocr all] {summarize(ocr_pages, time.perf_counter() - started)}")
+
+
+if __name__ == "__main__":
+    main()
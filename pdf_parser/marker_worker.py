@@ -0,0 +1,302 @@
+"""
+marker-pdf 변환 worker (모델을 한 번만 로드해서 계속 떠 있는 프로세스)
+
+marker_pdf.py 처럼 실행할 때마다 create_model_dict() 를 호출하면 layout / OCR / table 모델을 매번 다시 로드한다.
+(수 초 + 수 GB) 여기서는 모델을 한 번만 로드한 뒤 큐에 들어오는 PDF 를 차례로 변환한다.
+- 입력: inbox 폴더 감시 (PDF 파일을 넣으면 변환 후 done/ 또는 failed/ 로 이동) 또는 로컬 소켓 (submit 명령)
+- 페이지를 batch_pages 단위로 나눠서 변환하고, markdown 과 이미지는 batch 마다 바로 파일로 쓴다. (이미지를 메모리에 모아두지 않음)
+- 파일별 / 전체 페이지 처리량(pages/s)을 출력한다.
+- 페이지별 결과는 page cache 에 저장해서, 같은 페이지(다른 페이지만 바뀐 PDF 포함)는 다시 변환하지 않는다.
+
+실행:
+    python marker_worker.py serve --inbox ./inbox --out ./output      # worker 실행 (CPU 만 있으면 TORCH_DEVICE=cpu)
+    python marker_worker.py submit ../pdf/daejeon.pdf                 # 실행 중인 worker 에 변환 요청
+    python marker_worker.py status                                    # 처리 현황
+"""
+import argparse
+import json
+import os
+import queue
+import re
+import shutil
+import socket
+import socketserver
+import sys
+import threading
+import time
+from importlib.metadata import PackageNotFoundError, version
+from typing import Dict, List, Optional
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from rag_common.index_manifest import file_hash
+from rag_common.page_cache import PageCache, page_hashes
+
+DEFAULT_PORT = int(os.environ.get("MARKER_WORKER_PORT", "8765"))
+# paginate_output=True 일 때 marker 가 페이지 앞에 붙이는 구분자: "\n\n{페이지 번호}------...\n\n"
+_PAGE_SEPARATOR = re.compile(r"\n*\{(\d+)\}-{48}\n*")
+# marker 가 추출한 이미지 이름: _page_{페이지 번호}_{블록 종류}_{번호}.jpeg
+_IMAGE_PAGE = re.compile(r"_page_(\d+)_")
+
+
+def _marker_version() -> str:
+    try:
+        return version("marker-pdf")
+    except PackageNotFoundError:
+        return "unknown"
+
+
+def split_pages(text: str) -> Dict[int, str]:
+    """paginate_output 결과를 페이지별 markdown 으로 나눈다. 구분자가 없으면 빈 dict"""
+    parts = _PAGE_SEPARATOR.split(text)
+    return {int(parts[i]): parts[i + 1].strip() for i in range(1, len(parts) - 1, 2)}
+
+
+class MarkerWorker:
+    """PdfConverter 모델을 한 번만 로드하고 큐의 PDF 를 순서대로 변환한다."""
+
+    def __init__(self, output_dir: str, batch_pages: int = 8, config: Optional[Dict] = None,
+                 cache: Optional[PageCache] = None):
+        """
+        Args:
+            output_dir (str): 변환 결과 폴더. PDF 마다 {output_dir}/{파일 이름}/ 에 .md 와 이미지를 쓴다.
+            batch_pages (int): 한 번에 변환할 페이지 수 (메모리 사용량과 처리량의 trade-off)
+            config (Optional[Dict]): PdfConverter config (예: {"force_ocr": True})
+            cache (Optional[PageCache]): 페이지 결과 캐시. 없으면 기본 경로의 캐시를 사용
+        """
+        self.output_dir = output_dir
+        self.batch_pages = batch_pages
+        self.config = config or {}
+        self.cache = cache or PageCache()
+        # 파서 버전에 변환 옵션도 포함해서, 옵션이 다르면 다른 결과로 취급한다.
+        self.parser_version = f"{_marker_version()}:{json.dumps(self.config, sort_keys=True)}"
+        self.jobs: "queue.Queue[tuple]" = queue.Queue()
+        self.stats = {"files": 0, "failed": 0, "pages": 0, "cached_pages": 0, "seconds": 0.0, "queued": 0}
+        self._models = None
+        self._lock = threading.Lock()
+
+    def load_models(self):
+        from marker.models import create_model_dict
+        from marker.settings import settings
+
+        started = time.perf_counter()
+        self._models = create_model_dict()
+        print(f"[marker] 모델 로드 완료 ({time.perf_counter() - started:.1f}s, device={settings.TORCH_DEVICE_MODEL})")
+
+    def submit(self, pdf_path: str, on_done=None) -> int:
+        """변환 요청을 큐에 넣는다. on_done(pdf_path, ok) 은 변환이 끝나면 호출된다."""
+        with self._lock:
+            self.stats["queued"] += 1
+        self.jobs.put((os.path.abspath(pdf_path), on_done))
+        return self.jobs.qsize()
+
+    def convert(self, pdf_path: str) -> int:
+        """
+        PDF 1개를 batch_pages 페이지씩 변환해서 {output_dir}/{stem}/{stem}.md 와 이미지 파일로 저장한다.
+        page cache 에 있는 페이지는 변환하지 않고 캐시의 markdown / 이미지를 사용한다.
+        Returns:
+            int: 실제로 변환한 페이지 수 (캐시 사용 페이지 제외)
+        """
+        stem = os.path.splitext(os.path.basename(pdf_path))[0]
+        target_dir = os.path.join(self.output_dir, stem)
+        os.makedirs(target_dir, exist_ok=True)
+        hashes = page_hashes(pdf_path)
+        doc_hash = file_hash(pdf_path)
+
+        page_texts: Dict[int, str] = {}
+        missing = []
+        for page_number, digest in enumerate(hashes):
+            cached = self.cache.get(digest, "marker", self.parser_version)
+            if cached is None:
+                missing.append(page_number)
+                continue
+            page_texts[page_number] = cached.text
+            for name, path in cached.images.items():
+                shutil.copyfile(path, os.path.join(target_dir, name))
+        with self._lock:
+            self.stats["cached_pages"] += len(hashes) - len(missing)
+
+        # 새 페이지 / 바뀐 페이지만 변환
+        for start in range(0, len(missing), self.batch_pages):
+            pages = missing[start:start + self.batch_pages]
+            page_texts.update(self._convert_pages(pdf_path, pages, hashes, doc_hash, target_dir))
+
+        markdown_path = os.path.join(target_dir, f"{stem}.md")
+        with open(f"{markdown_path}.tmp", "w", encoding="utf-8") as markdown:
+            markdown.write("\n\n".join(page_texts[page_number] for page_number in sorted(page_texts)))
+        os.replace(f"{markdown_path}.tmp", markdown_path)
+        return len(missing)
+
+    def _convert_pages(self, pdf_path: str, pages: List[int], hashes: List[str], doc_hash: str,
+                       target_dir: str) -> Dict[int, str]:
+        """pages 를 한 번에 변환해서 이미지는 바로 파일로 쓰고, 페이지별 결과를 캐시에 저장한다."""
+        from marker.converters.pdf import PdfConverter
+        from marker.output import text_from_rendered
+
+        converter = PdfConverter(artifact_dict=self._models,
+                                 config={**self.config, "page_range": pages, "paginate_output": True})
+        text, _, images = text_from_rendered(converter(pdf_path))
+        page_texts = split_pages(text)
+        if set(page_texts) != set(pages):
+            # 페이지 구분자를 찾지 못하면 캐시하지 않고 batch 전체를 첫 페이지 결과로 사용
+            page_texts = {pages[0]: _PAGE_SEPARATOR.sub("\n\n", text).strip()}
+
+        page_images: Dict[int, Dict[str, bytes]] = {}
+        for name, image in images.items():
+            path = os.path.join(target_dir, name)
+            image.save(path)
+            image.close()
+            match = _IMAGE_PAGE.match(name)
+            if match:
+                with open(path, "rb") as f:
+                    page_images.setdefault(int(match.group(1)), {})[name] = f.read()
+        del images
+
+        if len(page_texts) == len(pages):
+            for page_number, page_text in page_texts.items():
+                self.cache.put(hashes[page_number], "marker", self.parser_version, text=page_text,
+                               images=page_images.get(page_number), doc_hash=doc_hash,
+                               page_number=page_number)
+        return page_texts
+
+    def run(self, stop: threading.Event):
+        """큐에서 PDF 를 꺼내서 변환한다. stop 이 set 될 때까지 계속 실행."""
+        if self._models is None:
+            self.load_models()
+        while not stop.is_set():
+            try:
+                pdf_path, on_done = self.jobs.get(timeout=0.5)
+            except queue.Empty:
+                continue
+            started = time.perf_counter()
+            cached_before = self.stats["cached_pages"]
+            ok = False
+            try:
+                pages = self.convert(pdf_path)
+                elapsed = time.perf_counter() - started
+                with self._lock:
+                    self.stats["files"] += 1
+                    self.stats["pages"] += pages
+                    self.stats["seconds"] += elapsed
+                print(f"[marker] {os.path.basename(pdf_path)}: {pages} pages 변환 "
+                      f"(캐시 {self.stats['cached_pages'] - cached_before} pages), {elapsed:.1f}s "
+                      f"({pages / elapsed:.2f} pages/s) | 전체 {self.throughput():.2f} pages/s")
+                ok = True
+            except Exception as e:
+                with self._lock:
+                    self.stats["failed"] += 1
+                print(f"[marker] 변환 실패: {pdf_path}, 에러: {str(e)}")
+            finally:
+                self.jobs.task_done()
+            if on_done is not None:
+                on_done(pdf_path, ok)
+
+    def throughput(self) -> float:
+        return self.stats["pages"] / self.stats["seconds"] if self.stats["seconds"] else 0.0
+
+    def status(self) -> Dict:
+        with self._lock:
+            return {**self.stats, "pending": self.jobs.qsize(), "pages_per_sec": round(self.throughput(), 3)}
+
+
+def watch_inbox(worker: MarkerWorker, inbox: str, stop: threading.Event, interval: float = 2.0):
+    """inbox 폴더에 들어온 PDF 를 큐에 넣는다. 변환이 끝나면 done/ 또는 failed/ 로 옮긴다."""
+    for name in ("done", "failed"):
+        os.makedirs(os.path.join(inbox, name), exist_ok=True)
+    in_progress = set()
+
+    def on_done(pdf_path: str, ok: bool):
+        shutil.move(pdf_path, os.path.join(inbox, "done" if ok else "failed", os.path.basename(pdf_path)))
+        in_progress.discard(pdf_path)
+
+    while not stop.is_set():
+        for name in sorted(os.listdir(inbox)):
+            path = os.path.abspath(os.path.join(inbox, name))
+            if name.lower().endswith(".pdf") and path not in in_progress and os.path.isfile(path):
+                # 복사 중인 파일은 크기가 바뀌지 않을 때까지 기다린다.
+                size = os.path.getsize(path)
+                time.sleep(0.2)
+                if size != os.path.getsize(path):
+                    continue
+                in_progress.add(path)
+                worker.submit(path, on_done)
+        stop.wait(interval)
+
+
+def serve_socket(worker: MarkerWorker, port: int) -> socketserver.ThreadingTCPServer:
+    """
+    로컬 소켓으로 요청을 받는다. 한 줄에 명령 1개:
+        submit <pdf 경로>  -> {"queued": 대기 중인 작업 수}
+        status            -> 처리 현황
+    """
+
+    class Handler(socketserver.StreamRequestHandler):
+        def handle(self):
+            for line in self.rfile:
+                command, _, argument = line.decode("utf-8").strip().partition(" ")
+                if command == "submit" and os.path.isfile(argument):
+                    response = {"queued": worker.submit(argument)}
+                elif command == "status":
+                    response = worker.status()
+                else:
+                    response = {"error": f"알 수 없는 요청: {line.decode('utf-8').strip()}"}
+                self.wfile.write((json.dumps(response, ensure_ascii=False) + "\n").encode("utf-8"))
+
+    server = socketserver.ThreadingTCPServer(("127.0.0.1", port), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def send_command(command: str, port: int = DEFAULT_PORT) -> Dict:
+    with socket.create_connection(("127.0.0.1", port), timeout=10) as conn:
+        conn.sendall((command + "\n").encode("utf-8"))
+        return json.loads(conn.makefile("r", encoding="utf-8").readline())
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    serve = subparsers.add_parser("serve")
+    serve.add_argument("--inbox", help="감시할 폴더 (PDF 를 넣으면 변환)")
+    serve.add_argument("--out", default="./output")
+    serve.add_argument("--batch-pages", type=int, default=8)
+    serve.add_argument("--port", type=int, default=DEFAULT_PORT)
+    serve.add_argument("--force-ocr", action="store_true")
+    serve.add_argument("pdfs", nargs="*", help="시작하면서 바로 변환할 PDF")
+    submit = subparsers.add_parser("submit")
+    submit.add_argument("pdfs", nargs="+")
+    submit.add_argument("--port", type=int, default=DEFAULT_PORT)
+    status = subparsers.add_parser("status")
+    status.add_argument("--port", type=int, default=DEFAULT_PORT)
+    args = parser.parse_args()
+
+    if args.command == "submit":
+        for pdf in args.pdfs:
+            print(pdf, send_command(f"submit {os.path.abspath(pdf)}", args.port))
+        return
+    if args.command == "status":
+        print(send_command("status", args.port))
+        return
+
+    worker = MarkerWorker(args.out, batch_pages=args.batch_pages,
+                          config={"force_ocr": True} if args.force_ocr else None)
+    for pdf in args.pdfs:
+        worker.submit(pdf)
+    stop = threading.Event()
+    server = serve_socket(worker, args.port)
+    if args.inbox:
+        os.makedirs(args.inbox, exist_ok=True)
+        threading.Thread(target=watch_inbox, args=(worker, args.inbox, stop), daemon=True).start()
+    print(f"[marker] 127.0.0.1:{args.port} 에서 요청 대기 중" + (f", {args.inbox} 감시 중" if args.inbox else ""))
+    try:
+        worker.run(stop)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        stop.set()
+        server.shutdown()
+        print(f"[marker] 종료: {worker.status()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,260 @@
+"""
+FAISS ANN 인덱스 생성
+
+LangChain 의 FAISS.from_documents 는 항상 IndexFlatL2(전수 검색)를 만든다.
+코퍼스가 커지면 검색 비용이 선형으로 늘고, float32 벡터 전체를 메모리에 들고 있어야 하므로
+IVF-Flat / IVF-PQ / HNSW 인덱스를 만들고 학습/파라미터 선택까지 해서 FAISS vectorstore 로 감싼다.
+만들어진 vectorstore 는 기존과 동일하게 save_local / load_local / as_retriever() 로 사용한다.
+
+index_type
+- flat     : 전수 검색 (기존과 동일)
+- hnsw     : 그래프 기반. 학습 불필요, 메모리는 flat 보다 조금 더 사용
+- ivf_flat : 클러스터링(IVF) + 원본 벡터. nprobe 로 속도/recall 조절
+- ivf_pq   : IVF + product quantization. 벡터를 압축해서 메모리를 크게 줄임
+- auto     : 문서 수에 따라 선택 (FAISS_INDEX_TYPE 환경변수로도 지정 가능)
+"""
+import math
+import os
+import uuid
+from typing import Dict, List, Optional, Sequence
+
+import faiss
+import numpy as np
+from langchain_community.docstore.in_memory import InMemoryDocstore
+from langchain_community.vectorstores import FAISS
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+
+INDEX_TYPES = ("flat", "hnsw", "ivf_flat", "ivf_pq")
+DEFAULT_INDEX_TYPE = os.environ.get("FAISS_INDEX_TYPE", "auto")
+MIN_POINTS_PER_CENTROID = 39  # faiss 가 k-means 학습 시 요구하는 centroid 당 최소 학습 데이터 수
+
+
+def choose_index_type(num_vectors: int) -> str:
+    """문서 수 기준 기본 인덱스 선택"""
+    if num_vectors < 10_000:
+        return "flat"
+    if num_vectors < 1_000_000:
+        return "hnsw"
+    return "ivf_pq"
+
+
+def choose_nlist(num_vectors: int) -> int:
+    """IVF 클러스터 수. 대략 4 * sqrt(N) 을 2의 거듭제곱으로 맞추고, 학습 데이터가 부족하지 않게 제한한다."""
+    nlist = 2 ** round(math.log2(max(4 * math.sqrt(num_vectors), 1)))
+    return max(1, min(nlist, num_vectors // MIN_POINTS_PER_CENTROID))
+
+
+def choose_pq_m(dim: int) -> int:
+    """PQ sub-quantizer 수. dim 을 나누어 떨어지게 하면서 sub-vector 차원이 8 내외가 되도록 고른다."""
+    for sub_dim in (8, 4, 16, 2, 32, 1):
+        if dim % sub_dim == 0 and dim // sub_dim <= 96:
+            return dim // sub_dim
+    return 1
+
+
+def factory_string(index_type: str, num_vectors: int, dim: int,
+                   nlist: Optional[int] = None, pq_m: Optional[int] = None,
+                   pq_nbits: int = 8, hnsw_m: int = 32) -> str:
+    """faiss.index_factory 에 넘길 문자열 생성"""
+    if index_type == "flat":
+        return "Flat"
+    if index_type == "hnsw":
+        return f"HNSW{hnsw_m}"
+    nlist = nlist or choose_nlist(num_vectors)
+    if index_type == "ivf_flat":
+        return f"IVF{nlist},Flat"
+    if index_type == "ivf_pq":
+        return f"IVF{nlist},PQ{pq_m or choose_pq_m(dim)}x{pq_nbits}"
+    raise ValueError(f"지원하지 않는 index_type 입니다: {index_type} (지원: {', '.join(INDEX_TYPES)})")
+
+
+def create_index(
+        vectors: np.ndarray,
+        index_type: str = "auto",
+        nlist: Optional[int] = None,
+        pq_m: Optional[int] = None,
+        pq_nbits: int = 8,
+        hnsw_m: int = 32,
+        ef_construction: int = 80,
+        train_size: Optional[int] = None,
+        seed: int = 0,
+) -> faiss.Index:
+    """
+    벡터로 인덱스를 만들고 학습시킵니다. (벡터 추가는 하지 않음)
+
+    Args:
+        vectors (np.ndarray): (N, dim) float32 벡터. IVF 학습 데이터로 사용
+        index_type (str): flat / hnsw / ivf_flat / ivf_pq / auto
+        nlist (Optional[int]): IVF 클러스터 수. 없으면 N 기준으로 선택
+        pq_m (Optional[int]): PQ sub-quantizer 수. 없으면 dim 기준으로 선택
+        pq_nbits (int): sub-quantizer 당 bit 수
+        hnsw_m (int): HNSW 이웃 수
+        ef_construction (int): HNSW 생성 시 탐색 폭
+        train_size (Optional[int]): 학습에 사용할 최대 벡터 수. 없으면 nlist * 256
+
+    Returns:
+        faiss.Index: 학습이 끝난 빈 인덱스
+    """
+    num_vectors, dim = vectors.shape
+    if index_type == "auto":
+        index_type = choose_index_type(num_vectors)
+    if index_type == "ivf_pq":
+        # PQ codebook 학습에는 centroid(2^nbits) 당 MIN_POINTS_PER_CENTROID 개 이상의 벡터가 필요하다.
+        pq_nbits = min(pq_nbits, max(1, int(math.log2(max(num_vectors // MIN_POINTS_PER_CENTROID, 2)))))
+
+    index = faiss.index_factory(dim, factory_string(index_type, num_vectors, dim, nlist, pq_m, pq_nbits, hnsw_m))
+    if index_type == "hnsw":
+        index.hnsw.efConstruction = ef_construction
+
+    if not index.is_trained:
+        train_size = train_size or faiss.extract_index_ivf(index).nlist * 256
+        if num_vectors > train_size:
+            rng = np.random.default_rng(seed)
+            train_vectors = vectors[rng.choice(num_vectors, train_size, replace=False)]
+        else:
+            train_vectors = vectors
+        index.train(train_vectors)
+    return index
+
+
+def needs_rebuild(index: faiss.Index, num_vectors: int) -> bool:
+    """
+    IVF 인덱스는 처음 만들 때의 벡터로만 학습하고 add 로는 다시 학습하지 않는다.
+    적은 벡터로 만든 뒤 계속 추가해서 nlist 가 지금 벡터 수 기준 권장값의 1/4 이하가 되면 True
+    """
+    try:
+        nlist = faiss.extract_index_ivf(index).nlist
+    except RuntimeError:
+        return False
+    return nlist * 4 <= choose_nlist(num_vectors)
+
+
+def set_search_params(index: faiss.Index, nprobe: Optional[int] = None, ef_search: Optional[int] = None):
+    """검색 파라미터 설정. 두 값 모두 faiss.write_index 로 저장되므로 load_local 후에도 유지된다."""
+    if nprobe is not None:
+        try:
+            faiss.extract_index_ivf(index).nprobe = nprobe
+        except RuntimeError:
+            pass
+    if ef_search is not None and hasattr(index, "hnsw"):
+        index.hnsw.efSearch = ef_search
+
+
+def _search_param_candidates(index: faiss.Index) -> List[Dict[str, int]]:
+    if hasattr(index, "hnsw"):
+        return [{"ef_search": ef} for ef in (16, 32, 64, 128, 256, 512)]
+    try:
+        nlist = faiss.extract_index_ivf(index).nlist
+    except RuntimeError:
+        return []
+    candidates, nprobe = [], 1
+    while nprobe < nlist:
+        candidates.append({"nprobe": nprobe})
+        nprobe *= 2
+    candidates.append({"nprobe": nlist})
+    return candidates
+
+
+def recall_at_k(found: np.ndarray, ground_truth: np.ndarray) -> float:
+    k = ground_truth.shape[1]
+    hits = sum(len(set(f) & set(g)) for f, g in zip(found.tolist(), ground_truth.tolist()))
+    return hits / (len(ground_truth) * k)
+
+
+def _drop_self(ids: np.ndarray, self_ids: Optional[np.ndarray], k: int) -> np.ndarray:
+    """검색 결과에서 질문으로 사용한 벡터 자신을 빼고 k 개만 남긴다."""
+    if self_ids is None:
+        return ids[:, :k]
+    return np.array([[i for i in row if i != self_id][:k] for row, self_id in zip(ids.tolist(), self_ids.tolist())])
+
+
+def tune_search_params(
+        index: faiss.Index,
+        vectors: np.ndarray,
+        k: int = 4,
+        target_recall: float = 0.95,
+        sample_size: int = 200,
+        seed: int = 0,
+        queries: Optional[np.ndarray] = None,
+) -> Dict[str, float]:
+    """
+    질문 벡터로 전수 검색 대비 target_recall 을 만족하는 가장 작은 nprobe / efSearch 를 찾아 인덱스에 설정합니다.
+    queries 가 없으면 저장된 벡터 일부를 질문으로 쓰되, 질문 벡터 자신은 정답과 검색 결과에서 뺀다.
+    (자기 자신은 IVF / HNSW 가 거의 항상 찾기 때문에 recall 이 실제보다 높게 나와서 검색 폭을 너무 작게 고르게 된다)
+
+    Returns:
+        Dict[str, float]: 선택된 파라미터와 recall
+    """
+    candidates = _search_param_candidates(index)
+    if not candidates:
+        return {"recall": 1.0}
+
+    self_ids = None
+    if queries is None:
+        rng = np.random.default_rng(seed)
+        self_ids = rng.choice(len(vectors), min(sample_size, len(vectors)), replace=False)
+        queries = vectors[self_ids]
+    search_k = k if self_ids is None else k + 1
+    exact = faiss.IndexFlatL2(vectors.shape[1])
+    exact.add(vectors)
+    _, ground_truth = exact.search(queries, search_k)
+    ground_truth = _drop_self(ground_truth, self_ids, k)
+
+    selected = {}
+    for params in candidates:
+        set_search_params(index, **params)
+        _, found = index.search(queries, search_k)
+        recall = recall_at_k(_drop_self(found, self_ids, k), ground_truth)
+        if selected and recall - selected["recall"] < 0.005:
+            # PQ 처럼 양자화 오차 때문에 recall 이 더 오르지 않으면, 검색 폭만 늘리지 않고 멈춘다.
+            set_search_params(index, **{key: value for key, value in selected.items() if key != "recall"})
+            break
+        selected = {**params, "recall": recall}
+        if recall >= target_recall:
+            break
+    return selected
+
+
+def build_faiss_vectorstore(
+        documents: Sequence[Document],
+        embedding: Embeddings,
+        index_type: str = DEFAULT_INDEX_TYPE,
+        target_recall: Optional[float] = 0.95,
+        vectors: Optional[np.ndarray] = None,
+        **index_params,
+) -> FAISS:
+    """
+    FAISS.from_documents 대신 사용. 지정한 ANN 인덱스로 vectorstore 를 만듭니다.
+
+    Args:
+        documents (Sequence[Document]): 저장할 문서
+        embedding (Embeddings): 임베딩
+        index_type (str): flat / hnsw / ivf_flat / ivf_pq / auto
+        target_recall (Optional[float]): 검색 파라미터 자동 선택 기준. None 이면 튜닝하지 않음
+        vectors (Optional[np.ndarray]): documents 를 미리 임베딩한 벡터. 주어지면 다시 임베딩하지 않는다.
+        **index_params: create_index 에 넘길 파라미터
+
+    Returns:
+        FAISS: as_retriever() 등 기존 사용법 그대로 쓸 수 있는 vectorstore
+    """
+    texts = [doc.page_content for doc in documents]
+    if vectors is None:
+        vectors = embedding.embed_documents(texts)
+    vectors = np.asarray(vectors, dtype=np.float32)
+    index = create_index(vectors, index_type=index_type, **index_params)
+    vectorstore = FAISS(
+        embedding_function=embedding,
+        index=index,
+        docstore=InMemoryDocstore(),
+        index_to_docstore_id={},
+    )
+    vectorstore.add_embeddings(
+        text_embeddings=zip(texts, vectors),
+        metadatas=[doc.metadata for doc in documents],
+        ids=[doc.id or str(uuid.uuid4()) for doc in documents],
+    )
+    if target_recall is not None:
+        params = tune_search_params(index, vectors, target_recall=target_recall)
+        print(f"[faiss] {type(index).__name__} ntotal={index.ntotal} search params={params}")
+    return vectorstore
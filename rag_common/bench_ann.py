@@ -0,0 +1,93 @@
+"""
+FAISS 인덱스 종류별 recall@k / 검색 latency / 메모리 벤치마크
+
+실행:
+    python bench_ann.py                                   # 합성 데이터 (100k x 768)
+    python bench_ann.py --num-vectors 1000000 --dim 1536
+    python bench_ann.py --db ../naver_ranking_news/db     # 저장된 인덱스의 벡터 사용
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+import faiss
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from rag_common.ann_index import INDEX_TYPES, create_index, recall_at_k, tune_search_params
+from rag_common.mmap_store import store_files
+
+
+def synthetic_vectors(num_vectors: int, dim: int, num_clusters: int = 100, seed: int = 0) -> np.ndarray:
+    """임베딩처럼 군집이 있는 데이터를 만든다. (완전 랜덤 벡터는 ANN 에 지나치게 불리함)"""
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(num_clusters, dim)).astype(np.float32)
+    labels = rng.integers(0, num_clusters, size=num_vectors)
+    vectors = centers[labels] + 0.3 * rng.normal(size=(num_vectors, dim)).astype(np.float32)
+    faiss.normalize_L2(vectors)
+    return vectors
+
+
+def load_vectors(db_path: str, index_name: str) -> np.ndarray:
+    index = faiss.read_index(store_files(db_path, index_name)[0])
+    return index.reconstruct_n(0, index.ntotal)
+
+
+def bench(index_type: str, vectors: np.ndarray, queries: np.ndarray, ground_truth: np.ndarray,
+          k: int, target_recall: float):
+    start = time.perf_counter()
+    index = create_index(vectors, index_type=index_type)
+    index.add(vectors)
+    build_sec = time.perf_counter() - start
+    params = tune_search_params(index, vectors, k=k, target_recall=target_recall)
+
+    latencies = []
+    found = []
+    for query in queries:
+        start = time.perf_counter()
+        _, ids = index.search(query.reshape(1, -1), k)
+        latencies.append((time.perf_counter() - start) * 1000)
+        found.append(ids[0])
+    latencies.sort()
+    memory_mb = faiss.serialize_index(index).nbytes / 1024 / 1024
+    tuned = ", ".join(f"{key}={value}" for key, value in params.items() if key != "recall") or "-"
+    print(f"{index_type:<10}{recall_at_k(np.array(found), ground_truth):>10.3f}"
+          f"{statistics.median(latencies):>10.3f}{latencies[int(len(latencies) * 0.99) - 1]:>10.3f}"
+          f"{memory_mb:>11.1f}{build_sec:>9.1f}   {tuned}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--db", help="저장된 FAISS 인덱스 폴더 (없으면 합성 데이터)")
+    parser.add_argument("--index-name", default="faiss_index")
+    parser.add_argument("--num-vectors", type=int, default=100_000)
+    parser.add_argument("--dim", type=int, default=768)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--k", type=int, default=4)
+    parser.add_argument("--target-recall", type=float, default=0.95)
+    parser.add_argument("--types", default=",".join(INDEX_TYPES))
+    args = parser.parse_args()
+
+    if args.db:
+        vectors = load_vectors(args.db, args.index_name)
+    else:
+        vectors = synthetic_vectors(args.num_vectors, args.dim)
+    # 질문은 저장된 벡터 근처의 점으로 만든다.
+    rng = np.random.default_rng(1)
+    queries = vectors[rng.choice(len(vectors), min(args.queries, len(vectors)), replace=False)]
+    queries = queries + 0.05 * rng.normal(size=queries.shape).astype(np.float32)
+
+    exact = faiss.IndexFlatL2(vectors.shape[1])
+    exact.add(vectors)
+    _, ground_truth = exact.search(queries, args.k)
+
+    print(f"vectors={vectors.shape[0]} dim={vectors.shape[1]} queries={len(queries)} k={args.k}")
+    print(f"{'type':<10}{'recall':>10}{'p50 ms':>10}{'p99 ms':>10}{'memory MB':>11}{'build s':>9}   params")
+    for index_type in args.types.split(","):
+        bench(index_type, vectors, queries, ground_truth, args.k, args.target_recall)
+
+
+if __name__ == "__main__":
+    main()
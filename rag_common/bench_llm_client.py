@@ -0,0 +1,85 @@
+"""
+공용 LLM 클라이언트(llm_client) vs ChatOpenAI 직접 호출 비교
+
+가짜 OpenAI 서버(분당 요청 한도 + 일정 비율 500 오류)에 여러 thread 가 동시에 요청을 보낸다.
+- ChatOpenAI 직접 호출: openai 라이브러리 자체 재시도(max_retries)만 사용, 호출한 곳끼리 한도를 공유하지 않음
+- ManagedChatModel: 공용 token bucket + 동시 요청 수 제한 + Retry-After 를 따르는 backoff
+성공 / 실패 요청 수, 서버가 보낸 429 수, 전체 시간과 caller 별 사용량을 출력한다.
+
+실행:
+    python bench_llm_client.py
+    python bench_llm_client.py --requests 200 --server-rpm 300 --threads 32
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from langchain_openai import ChatOpenAI
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from rag_common.fake_openai_server import start_fake_server
+from rag_common.llm_client import LLMClient, ModelLimits, get_chat_model
+
+MODEL = "gpt-4o-mini"
+
+
+def run_threads(name: str, models, num_requests: int, threads: int, server):
+    server.RequestHandlerClass.stats.update(requests=0, ok=0, rate_limited=0, errors=0)
+
+    def call(i: int) -> bool:
+        try:
+            models[i % len(models)].invoke(f"요청 {i}: 오늘 뉴스 요약해줘")
+            return True
+        except Exception:
+            return False
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        results = list(executor.map(call, range(num_requests)))
+    elapsed = time.perf_counter() - started
+    stats = server.RequestHandlerClass.stats
+    print(f"{name:<28}ok={sum(results):<5}failed={results.count(False):<5}elapsed={elapsed:6.1f}s  "
+          f"server: requests={stats['requests']} 429={stats['rate_limited']} 500={stats['errors']}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=120)
+    parser.add_argument("--threads", type=int, default=16)
+    parser.add_argument("--server-rpm", type=float, default=600, help="가짜 서버의 분당 요청 한도")
+    parser.add_argument("--error-rate", type=float, default=0.05)
+    parser.add_argument("--latency-ms", type=float, default=100.0)
+    args = parser.parse_args()
+
+    server = start_fake_server(rpm=args.server_rpm, latency_ms=args.latency_ms, error_rate=args.error_rate)
+    base_url = f"http://127.0.0.1:{server.server_address[1]}/v1"
+    print(f"requests={args.requests} threads={args.threads} server_rpm={args.server_rpm} "
+          f"error_rate={args.error_rate} server={base_url}")
+
+    # 호출한 곳(caller) 3개가 각자 ChatOpenAI 를 만드는 기존 방식
+    direct = [ChatOpenAI(model=MODEL, base_url=base_url, api_key="fake", max_retries=2) for _ in range(3)]
+    run_threads("ChatOpenAI (max_retries=2)", direct, args.requests, args.threads, server)
+
+    client = LLMClient({MODEL: ModelLimits(rpm=args.server_rpm * 0.9, tpm=1_000_000, max_concurrency=8)},
+                       base_delay=0.2)
+    managed = [get_chat_model(MODEL, caller=caller, client=client, base_url=base_url, api_key="fake")
+               for caller in ("news_search", "news_summary", "cs_classifier")]
+    run_threads("ManagedChatModel", managed, args.requests, args.threads, server)
+
+    async def run_async():
+        return await managed[0].abatch([f"비동기 요청 {i}" for i in range(args.requests // 4)], return_exceptions=True)
+
+    started = time.perf_counter()
+    results = asyncio.run(run_async())
+    failed = sum(1 for result in results if isinstance(result, Exception))
+    print(f"{'ManagedChatModel abatch':<28}ok={len(results) - failed:<5}failed={failed:<5}"
+          f"elapsed={time.perf_counter() - started:6.1f}s")
+    print(client.report())
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+"""
+Ollama 임베딩 처리량 비교: 기존 OllamaEmbeddings(1건씩) vs BatchedOllamaEmbeddings
+
+실행:
+    python bench_ollama_embeddings.py                                   # 가짜 Ollama 서버 사용
+    python bench_ollama_embeddings.py --base-url http://localhost:11434 --model dolphin-llama3:8b
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+from langchain_community.embeddings import OllamaEmbeddings
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from rag_common.fake_ollama_server import fake_vector, start_fake_server
+from rag_common.ollama_embeddings import BatchedOllamaEmbeddings
+
+
+def run(name, embeddings, texts):
+    start = time.perf_counter()
+    vectors = embeddings.embed_documents(texts)
+    elapsed = time.perf_counter() - start
+    print(f"{name:<36}{len(texts) / elapsed:>10.1f} texts/s{elapsed:>10.2f}s")
+    return vectors
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--base-url", help="실제 Ollama 주소. 없으면 가짜 서버를 띄운다.")
+    parser.add_argument("--model", default="dolphin-llama3:8b")
+    parser.add_argument("--texts", type=int, default=500)
+    parser.add_argument("--batch-sizes", default="8,32,64")
+    parser.add_argument("--in-flight", default="1,4")
+    args = parser.parse_args()
+
+    server = None
+    base_url = args.base_url
+    if base_url is None:
+        server = start_fake_server()
+        base_url = f"http://127.0.0.1:{server.server_address[1]}"
+    texts = [f"대전관광공사 복무 규정 {i}조: 전화는 벨이 3번 울리기 전에 받는다." for i in range(args.texts)]
+
+    print(f"texts={len(texts)} server={base_url}")
+    run("OllamaEmbeddings (1건씩)", OllamaEmbeddings(model=args.model, base_url=base_url), texts)
+    for batch_size in map(int, args.batch_sizes.split(",")):
+        for in_flight in map(int, args.in_flight.split(",")):
+            embeddings = BatchedOllamaEmbeddings(args.model, base_url=base_url,
+                                                 batch_size=batch_size, max_in_flight=in_flight)
+            vectors = run(f"Batched (batch={batch_size}, in_flight={in_flight})", embeddings, texts)
+            if server is not None:
+                # 가짜 서버는 텍스트별로 정해진 벡터를 주므로, 순서가 유지됐는지 확인할 수 있다.
+                expected = np.array([fake_vector(text, len(vectors[0])) for text in texts])
+                assert np.allclose(np.array(vectors), expected), "임베딩 순서가 입력 순서와 다릅니다."
+
+    if server is not None:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,282 @@
+"""
+RAG 설정 벤치마크 (splitter / k / 인덱스 종류 별 검색 품질, context 토큰, ingest / 질문 latency)
+
+스크립트마다 chunk_size(500 / 1000 / 1500), retriever k(기본 4), 임베딩이 제각각이고
+품질 근거는 주석으로 붙여둔 질문/답변뿐이라, 질문 + 정답 구간(answer span) 세트로 오프라인 평가한다. (LLM 생성 없음)
+- recall@k      : top-k chunk 중 하나라도 정답 구간을 온전히 포함하는 질문 비율
+- ctx_recall    : ContextBuilder 로 조립한 {context} (토큰 예산 적용 후) 에 정답 구간이 남아있는 비율
+- mrr           : 정답 구간을 포함한 첫 chunk 순위의 역수 평균 (max k 까지)
+- ctx_tokens    : 질문당 {context} 평균 토큰 수
+- ingest        : 분할 + 문서 임베딩 + 인덱스 생성 시간
+- p50 / p95     : 질문 1건 검색 시간 (질문 임베딩 포함)
+정답 구간이 PDF text layer 에 없는 질문(스캔 PDF 등)은 어떤 설정으로도 찾을 수 없으므로 제외하고 알려준다.
+
+질문 세트 (JSONL, 기본값: pdf/qa.jsonl):
+    {"id": "daejeon-01", "source": "daejeon.pdf", "question": "전화는 몇 초 내로 받아야 해?", "answers": ["3번(10초) 이내"]}
+    answers 중 하나라도 chunk 안에 있으면 정답 (공백 / 줄바꿈 무시)
+
+실행:
+    python bench_rag.py                                              # BM25 로 splitter / k 비교
+    python bench_rag.py --embeddings ollama --model dolphin-llama3:8b  # + flat / hnsw / ivf_flat / hybrid
+    python bench_rag.py --embeddings openai --indexes flat,hybrid --ks 2,4,8 --out results.jsonl
+    python bench_rag.py --splitters recursive:800:80,korean:384:48 --budget 1000
+"""
+import argparse
+import glob
+import json
+import os
+import statistics
+import sys
+import time
+from dataclasses import asdict, dataclass
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from langchain_core.documents import Document
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from rag_common.ann_index import INDEX_TYPES, build_faiss_vectorstore
+from rag_common.bench_splitter import load_pages, normalize, percentile
+from rag_common.context_builder import DEFAULT_TOKEN_BUDGET, ContextBuilder
+from rag_common.hybrid_retriever import BM25Index, HybridRetriever
+from rag_common.korean_splitter import KoreanSentenceSplitter
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_QA_PATH = os.path.join(ROOT_DIR, "pdf", "qa.jsonl")
+# splitter 종류 -> 클래스. chunk_size / overlap 단위는 recursive 는 글자, korean 은 토큰
+SPLITTERS = {
+    "recursive": RecursiveCharacterTextSplitter,
+    "korean": KoreanSentenceSplitter,
+}
+# ollama_with_langchain(500/50), langchain_with_rag(1000/100), developer_news(1500/100), ingest_pdfs --splitter korean
+DEFAULT_SPLITTERS = "recursive:500:50,recursive:1000:100,recursive:1500:100,korean:256:32,korean:512:64"
+RETRIEVERS = ("bm25",) + INDEX_TYPES + ("hybrid",)
+
+
+@dataclass
+class QAItem:
+    id: str
+    source: str
+    question: str
+    answers: List[str]
+
+
+@dataclass
+class RunResult:
+    """설정 1개(splitter, index, k)의 결과"""
+    splitter: str
+    index: str
+    k: int
+    chunks: int
+    recall: float
+    ctx_recall: float
+    mrr: float
+    ctx_tokens: float
+    split_ms: float
+    embed_ms: float
+    index_ms: float
+    p50_ms: float
+    p95_ms: float
+
+    @property
+    def ingest_ms(self) -> float:
+        return self.split_ms + self.embed_ms + self.index_ms
+
+
+def load_qa(path: str) -> List[QAItem]:
+    items = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                record = json.loads(line)
+                items.append(QAItem(record.get("id", str(len(items))), record["source"], record["question"],
+                                    [normalize(answer) for answer in record["answers"]]))
+    return items
+
+
+def make_splitter(spec: str):
+    """"recursive:500:50" -> RecursiveCharacterTextSplitter(chunk_size=500, chunk_overlap=50)"""
+    kind, chunk_size, chunk_overlap = spec.split(":")
+    if kind not in SPLITTERS:
+        raise ValueError(f"지원하지 않는 splitter 입니다: {kind} (지원: {', '.join(SPLITTERS)})")
+    return SPLITTERS[kind](chunk_size=int(chunk_size), chunk_overlap=int(chunk_overlap))
+
+
+def load_embeddings(kind: str, model: Optional[str], cache: bool):
+    """
+    Returns:
+        (문서 임베딩, 질문 임베딩). 문서 임베딩만 캐시해서 설정을 바꿔가며 반복 실행할 때 재임베딩을 피하고,
+        질문 임베딩은 캐시하지 않아서 검색 latency 에 실제 질문 임베딩 시간이 들어가도록 한다.
+    """
+    if kind == "ollama":
+        from rag_common.ollama_embeddings import BatchedOllamaEmbeddings
+        embeddings = BatchedOllamaEmbeddings(model=model or "dolphin-llama3:8b")
+    else:
+        from langchain_openai import OpenAIEmbeddings
+        embeddings = OpenAIEmbeddings(model=model) if model else OpenAIEmbeddings()
+    if not cache:
+        return embeddings, embeddings
+    from rag_common.embedding_cache import CachedEmbeddings
+    return CachedEmbeddings(embeddings), embeddings
+
+
+def answer_rank(docs: Sequence[Document], item: QAItem) -> Optional[int]:
+    """정답 구간을 포함한 첫 chunk 순위 (1부터). 없으면 None"""
+    for rank, doc in enumerate(docs, start=1):
+        text = normalize(doc.page_content)
+        if any(answer in text for answer in item.answers):
+            return rank
+    return None
+
+
+def split_answerable(items: List[QAItem], pages: List[Document]) -> Tuple[List[QAItem], List[QAItem]]:
+    """정답 구간이 페이지 text 에 있는 질문 / 없는 질문 (chunk 경계와 무관하게 찾을 수 없는 질문)"""
+    page_texts = {}
+    for page in pages:
+        page_texts.setdefault(page.metadata["source"], []).append(normalize(page.page_content))
+    answerable, missing = [], []
+    for item in items:
+        texts = page_texts.get(item.source, [])
+        found = any(answer in text for text in texts for answer in item.answers)
+        (answerable if found else missing).append(item)
+    return answerable, missing
+
+
+def build_retriever(index: str, chunks: List[Document], vectors: Optional[np.ndarray], query_embeddings,
+                    fetch_k: int) -> Callable[[str], List[Document]]:
+    """질문 -> 상위 fetch_k 개 chunk 검색 함수"""
+    if index == "bm25":
+        bm25 = BM25Index()
+        bm25.add_documents(chunks)
+        return lambda question: [doc for doc, _ in bm25.search(question, k=fetch_k)[0]]
+    if vectors is None:
+        raise ValueError(f"{index} 인덱스는 임베딩이 필요합니다. (--embeddings ollama / openai)")
+    vectorstore = build_faiss_vectorstore(chunks, query_embeddings, index_type="flat" if index == "hybrid" else index,
+                                          vectors=vectors)
+    if index == "hybrid":
+        retriever = HybridRetriever.from_vectorstore(vectorstore, k=fetch_k, fetch_k=max(20, fetch_k))
+        return retriever.invoke
+    return lambda question: vectorstore.similarity_search(question, k=fetch_k)
+
+
+def evaluate(retrieve: Callable[[str], List[Document]], items: List[QAItem], ks: Sequence[int],
+             budget: int) -> Tuple[Dict[int, Dict[str, float]], List[float]]:
+    """
+    질문마다 max(ks) 개를 한 번 검색하고, 앞에서 k 개씩 잘라서 k 별 지표를 계산한다.
+    Returns:
+        (k -> {"recall", "ctx_recall", "mrr", "ctx_tokens"}, 질문별 검색 시간 ms)
+    """
+    fetch_k = max(ks)
+    builder = ContextBuilder(token_budget=budget)
+    latencies, results = [], []
+    for item in items:
+        started = time.perf_counter()
+        docs = retrieve(item.question)
+        latencies.append((time.perf_counter() - started) * 1000)
+        results.append(docs[:fetch_k])
+
+    metrics = {}
+    for k in ks:
+        hits = ctx_hits = tokens = 0
+        reciprocal = 0.0
+        for item, docs in zip(items, results):
+            rank = answer_rank(docs[:k], item)
+            hits += rank is not None
+            reciprocal += 1 / rank if rank else 0.0
+            context = normalize(builder.build(docs[:k]))
+            ctx_hits += any(answer in context for answer in item.answers)
+            tokens += builder.stats.last_context_tokens
+        metrics[k] = {"recall": hits / len(items), "ctx_recall": ctx_hits / len(items),
+                      "mrr": reciprocal / len(items), "ctx_tokens": tokens / len(items)}
+    return metrics, latencies
+
+
+def recommend(results: List[RunResult], tolerance: float) -> RunResult:
+    """ctx_recall 이 최고값 - tolerance 이상인 설정 중 context 토큰이 가장 적은 설정 (같으면 검색이 빠른 쪽)"""
+    best = max(result.ctx_recall for result in results)
+    candidates = [result for result in results if result.ctx_recall >= best - tolerance]
+    return min(candidates, key=lambda result: (round(result.ctx_tokens, -1), result.p50_ms, -result.ctx_recall))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--qa", default=DEFAULT_QA_PATH, help="질문 / 정답 구간 JSONL")
+    parser.add_argument("--pdf", action="append", help="PDF 파일 (기본값: pdf 폴더 전체)")
+    parser.add_argument("--splitters", default=DEFAULT_SPLITTERS, help="종류:chunk_size:chunk_overlap 목록")
+    parser.add_argument("--indexes", help=f"검색 방식 목록 ({', '.join(RETRIEVERS)}). "
+                                          "기본값: 임베딩이 없으면 bm25, 있으면 bm25,flat,hnsw,ivf_flat,hybrid")
+    parser.add_argument("--ks", default="1,2,4,6,8", help="retriever k 목록")
+    parser.add_argument("--budget", type=int, default=DEFAULT_TOKEN_BUDGET, help="ContextBuilder 토큰 예산")
+    parser.add_argument("--embeddings", choices=["ollama", "openai"], help="임베딩 (없으면 BM25 만 평가)")
+    parser.add_argument("--model", help="임베딩 모델")
+    parser.add_argument("--no-cache", action="store_true", help="문서 임베딩 캐시를 쓰지 않음 (실제 ingest 시간 측정)")
+    parser.add_argument("--tolerance", type=float, default=0.04, help="추천 시 허용할 ctx_recall 차이")
+    parser.add_argument("--out", help="결과 JSONL 저장 경로")
+    args = parser.parse_args()
+
+    items = load_qa(args.qa)
+    paths = args.pdf or sorted(glob.glob(os.path.join(ROOT_DIR, "pdf", "*.pdf")))
+    pages = load_pages(paths)
+    items, missing = split_answerable(items, pages)
+    for item in missing:
+        print(f"[skip] {item.id}: 정답 구간이 {item.source} text layer 에 없습니다. ({item.question})")
+    if not items:
+        print("평가할 질문이 없습니다.")
+        return
+
+    ks = sorted(int(k) for k in args.ks.split(","))
+    indexes = (args.indexes or ("bm25,flat,hnsw,ivf_flat,hybrid" if args.embeddings else "bm25")).split(",")
+    for index in indexes:
+        if index not in RETRIEVERS:
+            parser.error(f"지원하지 않는 검색 방식입니다: {index} (지원: {', '.join(RETRIEVERS)})")
+    doc_embeddings = query_embeddings = None
+    if args.embeddings:
+        doc_embeddings, query_embeddings = load_embeddings(args.embeddings, args.model, cache=not args.no_cache)
+
+    print(f"pdfs={len(paths)} pages={len(pages)} questions={len(items)} (skipped {len(missing)}) "
+          f"budget={args.budget} embeddings={args.embeddings or '-'} {args.model or ''}")
+    print(f"{'splitter':<20}{'index':<10}{'k':>3}{'chunks':>7}{'recall':>8}{'ctx_rec':>8}{'mrr':>6}"
+          f"{'ctx_tok':>8}{'ingest_ms':>10}{'p50_ms':>8}{'p95_ms':>8}")
+    results: List[RunResult] = []
+    for spec in args.splitters.split(","):
+        splitter = make_splitter(spec)
+        started = time.perf_counter()
+        chunks = splitter.split_documents(pages)
+        split_ms = (time.perf_counter() - started) * 1000
+
+        vectors, embed_ms = None, 0.0
+        if doc_embeddings is not None and any(index != "bm25" for index in indexes):
+            started = time.perf_counter()
+            vectors = np.asarray(doc_embeddings.embed_documents([chunk.page_content for chunk in chunks]),
+                                 dtype=np.float32)
+            embed_ms = (time.perf_counter() - started) * 1000
+
+        for index in indexes:
+            started = time.perf_counter()
+            retrieve = build_retriever(index, chunks, vectors, query_embeddings, max(ks))
+            index_ms = (time.perf_counter() - started) * 1000
+            metrics, latencies = evaluate(retrieve, items, ks, args.budget)
+            p50, p95 = statistics.median(latencies), percentile(latencies, 0.95)
+            for k in ks:
+                result = RunResult(spec, index, k, len(chunks), split_ms=split_ms,
+                                   embed_ms=embed_ms if index != "bm25" else 0.0, index_ms=index_ms,
+                                   p50_ms=p50, p95_ms=p95, **metrics[k])
+                results.append(result)
+                print(f"{spec:<20}{index:<10}{k:>3}{len(chunks):>7}{result.recall:>8.0%}{result.ctx_recall:>8.0%}"
+                      f"{result.mrr:>6.2f}{result.ctx_tokens:>8.0f}{result.ingest_ms:>10.0f}{p50:>8.1f}{p95:>8.1f}")
+
+    best = recommend(results, args.tolerance)
+    print(f"\n추천: splitter={best.splitter} index={best.index} k={best.k} "
+          f"(ctx_recall={best.ctx_recall:.0%}, ctx_tokens={best.ctx_tokens:.0f}, p50={best.p50_ms:.1f}ms)")
+    if hasattr(doc_embeddings, "stats"):
+        print(f"[embedding cache] {doc_embeddings.stats}")
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            for result in results:
+                f.write(json.dumps({**asdict(result), "ingest_ms": result.ingest_ms}, ensure_ascii=False) + "\n")
+        print(f"결과 저장: {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,163 @@
+"""
+text splitter 벤치마크 (기존 RecursiveCharacterTextSplitter 설정 vs KoreanSentenceSplitter)
+
+- 분할 속도 (페이지/초)
+- chunk 수, chunk 별 토큰 수 분포 (평균 / p10 / p50 / p90 / 변동계수)
+- 문장 중간에서 잘린 chunk 비율: chunk 가 문장부호(. ! ?)나 페이지 끝에서 끝나지 않는 비율
+- 검색 hit rate (검색은 기본적으로 BM25, --model 을 주면 Ollama 임베딩 + FAISS)
+  - qa: pdf/qa.jsonl 의 질문으로 검색했을 때 top-k chunk 안에 정답 구간이 온전히 들어있는 비율
+  - sent: 문장부호로 자른 문장의 가운데 부분으로 검색했을 때 top-k chunk 안에 원래 문장이 온전히 들어있는 비율
+질문과 문장 경계는 비교 대상 splitter(korean_splitter)의 문장 분리 규칙을 쓰지 않고 따로 만든다.
+
+실행:
+    python bench_splitter.py                       # ../pdf/*.pdf
+    python bench_splitter.py --pdf ../pdf/daejeon.pdf --model dolphin-llama3:8b
+"""
+import argparse
+import glob
+import os
+import random
+import re
+import statistics
+import sys
+import time
+from typing import Dict, List
+
+import pymupdf
+from langchain_core.documents import Document
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from rag_common.context_builder import TokenCounter
+from rag_common.hybrid_retriever import BM25Index
+from rag_common.korean_splitter import KoreanSentenceSplitter
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# 문장부호 기준의 단순한 문장 경계 (닫는 따옴표 / 괄호 포함)
+_PUNCTUATION_END = re.compile(r"[.!?。][\"'”’」』)\]]*$")
+_PUNCTUATION_SPLIT = re.compile(r"(?<=[.!?。])[\"'”’」』)\]]*\s+")
+
+
+def load_pages(paths: List[str]) -> List[Document]:
+    pages = []
+    for path in paths:
+        with pymupdf.open(path) as pdf:
+            for number, page in enumerate(pdf):
+                text = page.get_text()
+                if text.strip():
+                    pages.append(Document(page_content=text,
+                                          metadata={"source": os.path.basename(path), "page": number}))
+    return pages
+
+
+def make_queries(pages: List[Document], num_queries: int, seed: int = 0) -> List[Dict]:
+    """문장부호로 자른 문장 중 충분히 긴 문장을 골라서, 앞뒤 20% 를 뺀 가운데 부분을 질문으로 쓴다."""
+    sentences = [normalize(sentence) for page in pages
+                 for sentence in _PUNCTUATION_SPLIT.split(page.page_content)]
+    sentences = [sentence for sentence in sentences
+                 if 40 <= len(sentence) <= 300 and _PUNCTUATION_END.search(sentence)]
+    random.Random(seed).shuffle(sentences)
+    queries = []
+    for sentence in sentences[:num_queries]:
+        cut = len(sentence) // 5
+        queries.append({"query": sentence[cut:-cut], "answers": [sentence]})
+    return queries
+
+
+def make_qa_queries(qa_path: str, pages: List[Document]) -> List[Dict]:
+    """qa.jsonl 중 불러온 PDF 에 대한 질문 (정답 구간이 여러 개면 하나라도 들어있으면 hit)"""
+    if not os.path.exists(qa_path):
+        return []
+    from rag_common.bench_rag import load_qa
+    sources = {page.metadata["source"] for page in pages}
+    return [{"query": item.question, "answers": item.answers} for item in load_qa(qa_path) if item.source in sources]
+
+
+def percentile(values: List[int], q: float) -> int:
+    ordered = sorted(values)
+    return ordered[min(int(len(ordered) * q), len(ordered) - 1)]
+
+
+def normalize(text: str) -> str:
+    return " ".join(text.split())
+
+
+def hit_rate(chunks: List[Document], queries: List[Dict], k: int, embeddings=None) -> float:
+    if embeddings is not None:
+        from rag_common.ann_index import build_faiss_vectorstore
+        vectorstore = build_faiss_vectorstore(chunks, embeddings, index_type="flat", target_recall=None)
+        search = lambda query: vectorstore.similarity_search(query, k=k)
+    else:
+        bm25 = BM25Index()
+        bm25.add_documents(chunks)
+        search = lambda query: [doc for doc, _ in bm25.search(query, k=k)[0]]
+    hits = 0
+    for item in queries:
+        found = [normalize(doc.page_content) for doc in search(item["query"])]
+        if any(answer in text for answer in item["answers"] for text in found):
+            hits += 1
+    return hits / len(queries) if queries else 0.0
+
+
+def ends_sentence(chunk: Document, page_tails: Dict[tuple, str]) -> bool:
+    """chunk 가 문장부호로 끝나거나 페이지 마지막 부분이면 True"""
+    text = normalize(chunk.page_content)
+    if _PUNCTUATION_END.search(text):
+        return True
+    return page_tails.get((chunk.metadata.get("source"), chunk.metadata.get("page")), "").endswith(text)
+
+
+def bench(name: str, splitter, pages: List[Document], queries: List[Dict], qa_queries: List[Dict],
+          counter: TokenCounter, k: int, embeddings=None):
+    started = time.perf_counter()
+    chunks = splitter.split_documents(pages)
+    elapsed = time.perf_counter() - started
+
+    tokens = [counter.count(chunk.page_content) for chunk in chunks]
+    mean = statistics.mean(tokens)
+    cv = statistics.pstdev(tokens) / mean if mean else 0.0
+    page_tails = {(page.metadata["source"], page.metadata["page"]): normalize(page.page_content) for page in pages}
+    mid_sentence = sum(1 for chunk in chunks if not ends_sentence(chunk, page_tails)) / len(chunks)
+    qa_hits = f"{hit_rate(chunks, qa_queries, k, embeddings):>9.0%}" if qa_queries else f"{'-':>9}"
+    hits = hit_rate(chunks, queries, k, embeddings)
+    print(f"{name:<22}{len(pages) / elapsed:>10.0f}{len(chunks):>8}{mean:>8.0f}{percentile(tokens, 0.1):>6}"
+          f"{percentile(tokens, 0.5):>6}{percentile(tokens, 0.9):>6}{cv:>7.2f}{mid_sentence:>9.0%}{qa_hits}{hits:>9.0%}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--pdf", action="append", help="PDF 파일 (기본값: pdf 폴더 전체)")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--qa", default=os.path.join(ROOT_DIR, "pdf", "qa.jsonl"), help="질문 / 정답 구간 JSONL")
+    parser.add_argument("--k", type=int, default=4)
+    parser.add_argument("--model", help="Ollama 임베딩 모델 (없으면 BM25 로 검색)")
+    args = parser.parse_args()
+
+    paths = args.pdf or sorted(glob.glob(os.path.join(ROOT_DIR, "pdf", "*.pdf")))
+    pages = load_pages(paths)
+    queries = make_queries(pages, args.queries)
+    qa_queries = make_qa_queries(args.qa, pages)
+    counter = TokenCounter()
+    embeddings = None
+    if args.model:
+        from rag_common.embedding_cache import CachedEmbeddings
+        from rag_common.ollama_embeddings import BatchedOllamaEmbeddings
+        embeddings = CachedEmbeddings(BatchedOllamaEmbeddings(model=args.model))
+
+    splitters = {
+        "recursive 500/50": RecursiveCharacterTextSplitter(chunk_size=500, chunk_overlap=50),
+        "recursive 1000/100": RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=100),
+        "recursive 1500/100": RecursiveCharacterTextSplitter(chunk_size=1500, chunk_overlap=100),
+        "korean 256/32 tok": KoreanSentenceSplitter(chunk_size=256, chunk_overlap=32),
+        "korean 512/64 tok": KoreanSentenceSplitter(chunk_size=512, chunk_overlap=64),
+    }
+    print(f"pdfs={len(paths)} pages={len(pages)} qa={len(qa_queries)} sent={len(queries)} k={args.k} "
+          f"retrieval={'ollama ' + args.model if args.model else 'bm25'}")
+    print(f"{'splitter':<22}{'pages/s':>10}{'chunks':>8}{'mean':>8}{'p10':>6}{'p50':>6}{'p90':>6}{'cv':>7}"
+          f"{'mid-cut':>9}{'qa@k':>9}{'sent@k':>9}")
+    for name, splitter in splitters.items():
+        bench(name, splitter, pages, queries, qa_queries, counter, args.k, embeddings)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,231 @@
+"""
+검색 결과 -> 프롬프트 {context} 조립 단계
+
+retriever 결과(List[Document])를 그대로 {context} 에 넣으면 Document repr(metadata, id=...) 까지 문자열로 들어가고,
+chunk_overlap 으로 겹치는 부분과 중복 chunk 도 그대로 들어가서 프롬프트 토큰과 LLM 응답 시간이 늘어난다.
+- 같은 내용의 chunk / 다른 chunk 에 포함된 chunk 제거
+- 같은 문서에서 나온 chunk 끼리 겹치는 앞/뒤 부분(chunk_overlap) 제거
+- 점수(metadata["score"], 없으면 검색 순위) 순으로 정렬
+- 토큰 예산(token_budget)을 넘지 않도록 자르기
+- "[번호] 제목\n본문" 형태로 간단하게 출력
+
+사용법:
+    context_builder = ContextBuilder(token_budget=1500)
+    chain = {"context": retriever | context_builder, "question": RunnablePassthrough()} | prompt | llm
+    print(context_builder.stats)
+"""
+import os
+import re
+import threading
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Callable, List, Optional, Tuple
+
+from langchain_core.documents import Document
+
+DEFAULT_TOKEN_BUDGET = int(os.environ.get("CONTEXT_TOKEN_BUDGET", "1500"))
+DEFAULT_ENCODING = "cl100k_base"
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+@lru_cache(maxsize=None)
+def _load_encoding(encoding: str):
+    try:
+        import tiktoken
+        return tiktoken.get_encoding(encoding)
+    except Exception as e:
+        print(f"tiktoken 인코딩({encoding})을 사용할 수 없어서 근사치로 계산합니다: {type(e).__name__}")
+        return None
+
+
+class TokenCounter:
+    """
+    tiktoken 으로 토큰 수를 센다.
+    인코딩 파일을 받을 수 없는 환경(오프라인)에서는 글자 수 기반 근사치를 사용한다. (영문 4글자 = 1토큰, 한글 1글자 = 1토큰)
+    """
+
+    def __init__(self, encoding: str = DEFAULT_ENCODING):
+        self.encoding = _load_encoding(encoding)
+
+    def count(self, text: str) -> int:
+        if self.encoding is not None:
+            return len(self.encoding.encode(text, disallowed_special=()))
+        ascii_chars = len(text.encode("ascii", "ignore"))
+        return (ascii_chars + 3) // 4 + len(text) - ascii_chars
+
+    def truncate(self, text: str, max_tokens: int) -> str:
+        if max_tokens <= 0:
+            return ""
+        if self.encoding is not None:
+            tokens = self.encoding.encode(text, disallowed_special=())
+            return text if len(tokens) <= max_tokens else self.encoding.decode(tokens[:max_tokens])
+        # 근사치: 앞에서부터 토큰 수를 세면서 자른다.
+        used, ascii_run = 0, 0
+        for i, c in enumerate(text):
+            if c.isascii():
+                ascii_run += 1
+                if ascii_run == 4:
+                    used, ascii_run = used + 1, 0
+            else:
+                used += 1
+            if used + (ascii_run > 0) > max_tokens:
+                return text[:i]
+        return text
+
+
+@dataclass
+class ContextStats:
+    queries: int = 0
+    raw_tokens: int = 0  # retriever 결과를 그대로 문자열로 넣었을 때
+    context_tokens: int = 0  # 실제로 넣은 context
+    duplicates_removed: int = 0
+    overlap_chars_removed: int = 0
+    passages_dropped: int = 0  # 토큰 예산 초과로 빠진 chunk
+    last_raw_tokens: int = 0
+    last_context_tokens: int = 0
+
+    @property
+    def tokens_saved(self) -> int:
+        return self.raw_tokens - self.context_tokens
+
+    @property
+    def last_tokens_saved(self) -> int:
+        return self.last_raw_tokens - self.last_context_tokens
+
+    def __str__(self):
+        saved_ratio = self.tokens_saved / self.raw_tokens if self.raw_tokens else 0.0
+        return (f"queries={self.queries} tokens {self.raw_tokens} -> {self.context_tokens} "
+                f"(saved {self.tokens_saved}, {saved_ratio:.0%}) last query saved {self.last_tokens_saved} "
+                f"duplicates={self.duplicates_removed} overlap_chars={self.overlap_chars_removed} "
+                f"dropped={self.passages_dropped}")
+
+
+def _normalize(text: str) -> str:
+    return _WHITESPACE.sub(" ", text).strip()
+
+
+def strip_overlap(previous: str, current: str, min_overlap: int = 20, max_overlap: int = 400) -> Tuple[str, int]:
+    """
+    previous 의 끝부분과 current 의 앞부분이 겹치면(chunk_overlap) current 에서 겹치는 부분을 뗀다.
+    current 의 끝부분과 previous 의 앞부분이 겹치는 경우(뒤 chunk 가 먼저 검색된 경우)도 처리한다.
+    Returns:
+        Tuple[str, int]: (겹치는 부분을 뗀 current, 제거한 글자 수)
+    """
+    limit = min(len(previous), len(current), max_overlap)
+    for size in range(limit, min_overlap - 1, -1):
+        if previous[-size:] == current[:size]:
+            return current[size:].lstrip(), size
+        if current[-size:] == previous[:size]:
+            return current[:-size].rstrip(), size
+    return current, 0
+
+
+def _title(doc: Document) -> str:
+    metadata = doc.metadata
+    title = metadata.get("title") or metadata.get("source") or metadata.get("url") or ""
+    if "page" in metadata:
+        title = f"{title} p.{metadata['page'] + 1}" if title else f"p.{metadata['page'] + 1}"
+    return title
+
+
+class ContextBuilder:
+    """retriever 결과를 토큰 예산 안의 compact 한 context 문자열로 만든다. (LCEL 에서 retriever | context_builder 로 사용)"""
+
+    def __init__(
+            self,
+            token_budget: int = DEFAULT_TOKEN_BUDGET,
+            encoding: str = DEFAULT_ENCODING,
+            min_overlap: int = 20,
+            min_passage_tokens: int = 30,
+            formatter: Optional[Callable[[int, Document], str]] = None,
+    ):
+        """
+        Args:
+            token_budget (int): context 최대 토큰 수
+            encoding (str): tiktoken 인코딩 이름
+            min_overlap (int): 이 글자 수 이상 겹칠 때만 겹치는 부분으로 보고 제거
+            min_passage_tokens (int): 예산이 이보다 적게 남으면 마지막 chunk 를 잘라서 넣지 않고 버린다.
+            formatter (Callable[[int, Document], str]): (번호, 문서) -> 문자열. 기본은 "[번호] 제목\\n본문"
+        """
+        self.token_budget = token_budget
+        self.counter = TokenCounter(encoding)
+        self.min_overlap = min_overlap
+        self.min_passage_tokens = min_passage_tokens
+        self.formatter = formatter or self.default_format
+        self.stats = ContextStats()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def default_format(number: int, doc: Document) -> str:
+        title = _title(doc)
+        return f"[{number}] {title}\n{doc.page_content}" if title else f"[{number}]\n{doc.page_content}"
+
+    def select(self, documents: List[Document]) -> Tuple[List[Document], int, int]:
+        """
+        점수 순으로 정렬한 뒤 중복 chunk 와 겹치는 부분을 제거한다.
+        Returns:
+            Tuple[List[Document], int, int]: (남은 chunk, 제거한 중복 수, 제거한 겹침 글자 수)
+        """
+        ranked = sorted(enumerate(documents),
+                        key=lambda x: (-x[1].metadata.get("score", 0.0), x[0]) if "score" in x[1].metadata
+                        else (0.0, x[0]))
+        selected: List[Document] = []
+        normalized: List[str] = []
+        duplicates = overlap_chars = 0
+        for _, doc in ranked:
+            text = _normalize(doc.page_content)
+            if not text or any(text in kept for kept in normalized):
+                duplicates += 1
+                continue
+            source = doc.metadata.get("source")
+            for kept_doc, kept_text in zip(selected, normalized):
+                if kept_doc.metadata.get("source") == source:
+                    text, removed = strip_overlap(kept_text, text, self.min_overlap)
+                    overlap_chars += removed
+            if not text:
+                continue
+            # 뒤에 온 chunk 가 앞의 chunk 를 포함하면 앞의 chunk 자리에 대신 넣는다.
+            contained = [i for i, kept in enumerate(normalized) if kept in text]
+            for i in reversed(contained):
+                del selected[i], normalized[i]
+            duplicates += len(contained)
+            position = contained[0] if contained else len(selected)
+            selected.insert(position, Document(id=doc.id, page_content=text, metadata=doc.metadata))
+            normalized.insert(position, text)
+        return selected, duplicates, overlap_chars
+
+    def build(self, documents: List[Document]) -> str:
+        passages, duplicates, overlap_chars = self.select(documents)
+        parts, used, dropped = [], 0, 0
+        for doc in passages:
+            separator_tokens = 1 if parts else 0
+            text = self.formatter(len(parts) + 1, doc)
+            tokens = self.counter.count(text)
+            remaining = self.token_budget - used - separator_tokens
+            if tokens > remaining:
+                if remaining < self.min_passage_tokens:
+                    dropped += 1
+                    continue
+                text = self.counter.truncate(text, remaining)
+                tokens = self.counter.count(text)
+            parts.append(text)
+            used += tokens + separator_tokens
+        context = "\n\n".join(parts)
+
+        raw_tokens = self.counter.count(str(documents))
+        context_tokens = self.counter.count(context)
+        with self._lock:
+            stats = self.stats
+            stats.queries += 1
+            stats.raw_tokens += raw_tokens
+            stats.context_tokens += context_tokens
+            stats.duplicates_removed += duplicates
+            stats.overlap_chars_removed += overlap_chars
+            stats.passages_dropped += dropped
+            stats.last_raw_tokens = raw_tokens
+            stats.last_context_tokens = context_tokens
+        return context
+
+    def __call__(self, documents: List[Document]) -> str:
+        return self.build(documents)
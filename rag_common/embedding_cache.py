@@ -0,0 +1,230 @@
+"""
+임베딩 캐시
+
+동일한 텍스트를 매 실행마다 다시 임베딩하지 않도록, 텍스트의 content hash 를 key 로
+임베딩 벡터를 SQLite 에 저장한다.
+- 모델 이름 기준으로 namespace 를 분리 (모델이 다르면 벡터도 다르므로)
+- 벡터는 float32 / float16 blob 으로 저장
+- 배치 조회, 최대 엔트리 수 기반의 LRU eviction, hit-rate 통계 제공
+"""
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_CACHE_PATH = os.environ.get(
+    "EMBEDDING_CACHE_PATH", os.path.join(ROOT_DIR, ".cache", "embeddings.sqlite3")
+)
+SQLITE_MAX_VARIABLES = 500  # 오래된 SQLite 의 바인딩 변수 제한(999)보다 여유 있게
+
+
+def content_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def model_namespace(embeddings: Embeddings) -> str:
+    """
+    임베딩 객체로부터 namespace 를 만든다. (예: OpenAIEmbeddings:text-embedding-ada-002)
+    """
+    model = getattr(embeddings, "model", None) or getattr(embeddings, "model_name", None) or "default"
+    return f"{type(embeddings).__name__}:{model}"
+
+
+@dataclass
+class CacheStats:
+    """캐시 hit-rate 통계"""
+    hits: int = 0
+    misses: int = 0
+    evictions: int = 0
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def __str__(self):
+        return (f"hits={self.hits} misses={self.misses} "
+                f"hit_rate={self.hit_rate:.1%} evictions={self.evictions}")
+
+
+class EmbeddingCache:
+    """SQLite 기반 임베딩 저장소"""
+
+    def __init__(self, path: str = DEFAULT_CACHE_PATH, max_entries: int = 500_000, dtype: str = "float32"):
+        """
+        Args:
+            path (str): SQLite 파일 경로
+            max_entries (int): namespace 별 최대 엔트리 수. 초과 시 가장 오래 사용하지 않은 것부터 삭제
+            dtype (str): 저장 dtype (float32 / float16)
+        """
+        if dtype not in ("float32", "float16"):
+            raise ValueError(f"지원하지 않는 dtype 입니다: {dtype}")
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.path = path
+        self.max_entries = max_entries
+        self.dtype = dtype
+        self.stats = CacheStats()
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS embeddings (
+                namespace TEXT NOT NULL,
+                key TEXT NOT NULL,
+                dtype TEXT NOT NULL,
+                vector BLOB NOT NULL,
+                last_used REAL NOT NULL,
+                PRIMARY KEY (namespace, key)
+            ) WITHOUT ROWID
+        """)
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_embeddings_lru ON embeddings (namespace, last_used)"
+        )
+        self._conn.commit()
+
+    def get_many(self, namespace: str, keys: Sequence[str]) -> Dict[str, List[float]]:
+        """
+        key 목록을 한번에 조회한다. 조회된 항목은 last_used 를 갱신한다.
+
+        Returns:
+            Dict[str, List[float]]: 캐시에 존재하는 key 와 벡터
+        """
+        found = {}
+        unique_keys = list(dict.fromkeys(keys))
+        now = time.time()
+        with self._lock:
+            for i in range(0, len(unique_keys), SQLITE_MAX_VARIABLES):
+                batch = unique_keys[i:i + SQLITE_MAX_VARIABLES]
+                placeholders = ",".join("?" * len(batch))
+                rows = self._conn.execute(
+                    f"SELECT key, dtype, vector FROM embeddings WHERE namespace = ? AND key IN ({placeholders})",
+                    (namespace, *batch),
+                ).fetchall()
+                for key, dtype, blob in rows:
+                    found[key] = np.frombuffer(blob, dtype=dtype).astype(np.float32).tolist()
+                if rows:
+                    hit_keys = [row[0] for row in rows]
+                    self._conn.execute(
+                        f"UPDATE embeddings SET last_used = ? WHERE namespace = ? "
+                        f"AND key IN ({','.join('?' * len(hit_keys))})",
+                        (now, namespace, *hit_keys),
+                    )
+            self._conn.commit()
+        return found
+
+    def put_many(self, namespace: str, items: Dict[str, Sequence[float]]):
+        """벡터를 저장하고, 최대 엔트리 수를 넘으면 eviction 한다."""
+        if not items:
+            return
+        now = time.time()
+        rows = [
+            (namespace, key, self.dtype, np.asarray(vector, dtype=self.dtype).tobytes(), now)
+            for key, vector in items.items()
+        ]
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (namespace, key, dtype, vector, last_used) VALUES (?, ?, ?, ?, ?)",
+                rows,
+            )
+            self._evict(namespace)
+            self._conn.commit()
+
+    def _evict(self, namespace: str):
+        (count,) = self._conn.execute(
+            "SELECT COUNT(*) FROM embeddings WHERE namespace = ?", (namespace,)
+        ).fetchone()
+        overflow = count - self.max_entries
+        if overflow <= 0:
+            return
+        # 매번 1건씩 지우지 않도록 10% 여유를 두고 삭제
+        overflow += self.max_entries // 10
+        self._conn.execute(
+            """
+            DELETE FROM embeddings WHERE namespace = ? AND key IN (
+                SELECT key FROM embeddings WHERE namespace = ? ORDER BY last_used LIMIT ?
+            )
+            """,
+            (namespace, namespace, overflow),
+        )
+        self.stats.evictions += overflow
+
+    def count(self, namespace: Optional[str] = None) -> int:
+        with self._lock:
+            if namespace is None:
+                return self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+            return self._conn.execute(
+                "SELECT COUNT(*) FROM embeddings WHERE namespace = ?", (namespace,)
+            ).fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class CachedEmbeddings(Embeddings):
+    """
+    LangChain Embeddings 를 감싸서 임베딩 결과를 캐시하는 래퍼.
+
+    사용법:
+        embeddings = CachedEmbeddings(OpenAIEmbeddings())
+        vectorstore = FAISS.from_documents(docs, embeddings)
+    """
+
+    def __init__(
+            self,
+            underlying: Embeddings,
+            cache: Optional[EmbeddingCache] = None,
+            namespace: Optional[str] = None,
+    ):
+        """
+        Args:
+            underlying (Embeddings): 실제 임베딩을 수행하는 객체
+            cache (Optional[EmbeddingCache]): 저장소. 없으면 기본 경로의 저장소를 사용
+            namespace (Optional[str]): 캐시 namespace. 없으면 모델 이름으로 생성
+        """
+        self.underlying = underlying
+        self.cache = cache or EmbeddingCache()
+        self.namespace = namespace or model_namespace(underlying)
+
+    @property
+    def stats(self) -> CacheStats:
+        return self.cache.stats
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self._embed(texts, kind="doc")
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._embed([text], kind="query")[0]
+
+    def _embed(self, texts: List[str], kind: str) -> List[List[float]]:
+        # 일부 모델은 문서/질의 임베딩 방식이 달라서 key 를 분리한다.
+        keys = [f"{kind}:{content_hash(text)}" for text in texts]
+        cached = self.cache.get_many(self.namespace, keys)
+
+        # 배치 내부의 중복 텍스트도 한 번만 임베딩
+        missing = {}
+        for key, text in zip(keys, texts):
+            if key not in cached and key not in missing:
+                missing[key] = text
+        self.cache.stats.hits += len(texts) - len(missing)
+        self.cache.stats.misses += len(missing)
+
+        if missing:
+            missing_texts = list(missing.values())
+            if kind == "query":
+                vectors = [self.underlying.embed_query(text) for text in missing_texts]
+            else:
+                vectors = self.underlying.embed_documents(missing_texts)
+            computed = dict(zip(missing.keys(), vectors))
+            self.cache.put_many(self.namespace, computed)
+            cached.update(computed)
+
+        return [list(cached[key]) for key in keys]
@@ -0,0 +1,92 @@
+"""
+테스트 / 벤치마크용 가짜 Ollama 서버
+
+/api/embed (batch) 와 /api/embeddings (텍스트 1개) 를 흉내낸다.
+- 벡터는 텍스트 hash 로 만든 결정적 값이라, 순서가 섞였는지 검증할 수 있다.
+- 요청 1번당 고정 지연 + 텍스트 1개당 지연을 줘서 실제 서버의 비용 구조를 흉내낸다.
+
+실행:
+    python -m rag_common.fake_ollama_server --port 11435 --request-ms 20 --item-ms 2
+"""
+import argparse
+import hashlib
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import List
+
+import numpy as np
+
+
+def fake_vector(text: str, dim: int) -> List[float]:
+    seed = int.from_bytes(hashlib.sha256(text.encode("utf-8")).digest()[:8], "little")
+    vector = np.random.default_rng(seed).normal(size=dim)
+    return (vector / np.linalg.norm(vector)).tolist()
+
+
+def make_handler(dim: int, request_ms: float, item_ms: float):
+    class FakeOllamaHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+        stats = {"requests": 0, "items": 0}
+        _lock = threading.Lock()
+
+        def _reply(self, status: int, body: dict):
+            data = json.dumps(body).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_POST(self):
+            length = int(self.headers.get("Content-Length", 0))
+            payload = json.loads(self.rfile.read(length) or b"{}")
+            if self.path == "/api/embed":
+                texts = payload["input"] if isinstance(payload["input"], list) else [payload["input"]]
+            elif self.path == "/api/embeddings":
+                texts = [payload["prompt"]]
+            else:
+                self._reply(404, {"error": f"unknown path {self.path}"})
+                return
+
+            with self._lock:
+                self.stats["requests"] += 1
+                self.stats["items"] += len(texts)
+            time.sleep((request_ms + item_ms * len(texts)) / 1000)
+            vectors = [fake_vector(text, dim) for text in texts]
+            if self.path == "/api/embed":
+                self._reply(200, {"model": payload.get("model"), "embeddings": vectors})
+            else:
+                self._reply(200, {"embedding": vectors[0]})
+
+        def log_message(self, format, *args):
+            pass
+
+    return FakeOllamaHandler
+
+
+def start_fake_server(port: int = 0, dim: int = 64, request_ms: float = 20.0,
+                      item_ms: float = 2.0) -> ThreadingHTTPServer:
+    """
+    background thread 로 서버를 띄운다. port=0 이면 빈 포트를 사용한다.
+    server.server_address[1] 로 포트를, server.RequestHandlerClass.stats 로 요청 수를 확인할 수 있다.
+    종료: server.shutdown()
+    """
+    server = ThreadingHTTPServer(("127.0.0.1", port), make_handler(dim, request_ms, item_ms))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--port", type=int, default=11435)
+    parser.add_argument("--dim", type=int, default=64)
+    parser.add_argument("--request-ms", type=float, default=20.0)
+    parser.add_argument("--item-ms", type=float, default=2.0)
+    args = parser.parse_args()
+    server = ThreadingHTTPServer(("127.0.0.1", args.port),
+                                 make_handler(args.dim, args.request_ms, args.item_ms))
+    print(f"fake ollama server: http://127.0.0.1:{args.port}")
+    server.serve_forever()
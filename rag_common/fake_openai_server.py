@@ -0,0 +1,116 @@
+"""
+테스트 / 벤치마크용 가짜 OpenAI 호환 서버
+
+/v1/chat/completions (stream 제외) 를 흉내낸다.
+- 분당 요청 수 한도(--rpm)를 넘으면 429 + retry-after / retry-after-ms 헤더를 반환한다.
+- 일정 비율(--error-rate)로 500 을 반환한다.
+- 응답 지연(--latency-ms), 응답 내용(--reply) 지정. usage 는 글자 수로 계산한 근사치
+
+실행:
+    python -m rag_common.fake_openai_server --port 18080 --rpm 120 --latency-ms 200
+    ChatOpenAI(base_url="http://127.0.0.1:18080/v1", api_key="fake", model="gpt-4o-mini")
+"""
+import argparse
+import json
+import random
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional
+
+from rag_common.llm_client import TokenBucket
+
+
+def make_handler(rpm: Optional[float], latency_ms: float, error_rate: float, reply: str):
+    bucket = TokenBucket(rpm, capacity=max(rpm / 60, 1.0)) if rpm else None
+
+    class FakeOpenAIHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+        stats = {"requests": 0, "ok": 0, "rate_limited": 0, "errors": 0}
+        _lock = threading.Lock()
+
+        def _reply(self, status: int, body: dict, headers: Optional[dict] = None):
+            data = json.dumps(body, ensure_ascii=False).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            for key, value in (headers or {}).items():
+                self.send_header(key, value)
+            self.end_headers()
+            self.wfile.write(data)
+
+        def _count(self, key: str):
+            with self._lock:
+                self.stats["requests"] += 1
+                self.stats[key] += 1
+
+        def do_POST(self):
+            length = int(self.headers.get("Content-Length", 0))
+            payload = json.loads(self.rfile.read(length) or b"{}")
+            if self.path.rstrip("/") != "/v1/chat/completions":
+                self._reply(404, {"error": {"message": f"unknown path {self.path}"}})
+                return
+
+            if bucket is not None:
+                wait = bucket.reserve(1)
+                if wait > 0:
+                    bucket.refund(1)  # 거절한 요청은 한도에서 빼지 않는다.
+                    self._count("rate_limited")
+                    self._reply(429, {"error": {"message": "Rate limit reached", "type": "requests",
+                                                "code": "rate_limit_exceeded"}},
+                                {"retry-after": str(max(1, round(wait))), "retry-after-ms": str(int(wait * 1000))})
+                    return
+            if random.random() < error_rate:
+                self._count("errors")
+                self._reply(500, {"error": {"message": "fake server error", "type": "server_error"}})
+                return
+
+            time.sleep(latency_ms / 1000)
+            messages = payload.get("messages", [])
+            prompt_chars = sum(len(str(message.get("content", ""))) for message in messages)
+            content = reply or (f"echo: {str(messages[-1].get('content', ''))[:50]}" if messages else "")
+            prompt_tokens, completion_tokens = prompt_chars // 4 + 1, len(content) // 4 + 1
+            self._count("ok")
+            self._reply(200, {
+                "id": f"chatcmpl-{uuid.uuid4().hex[:12]}",
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": payload.get("model", "fake"),
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": content},
+                             "finish_reason": "stop"}],
+                "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+                          "total_tokens": prompt_tokens + completion_tokens},
+            })
+
+        def log_message(self, format, *args):
+            pass
+
+    return FakeOpenAIHandler
+
+
+def start_fake_server(port: int = 0, rpm: Optional[float] = None, latency_ms: float = 50.0,
+                      error_rate: float = 0.0, reply: str = "") -> ThreadingHTTPServer:
+    """
+    background thread 로 서버를 띄운다. port=0 이면 빈 포트를 사용한다.
+    base_url: f"http://127.0.0.1:{server.server_address[1]}/v1", 요청 통계: server.RequestHandlerClass.stats
+    종료: server.shutdown()
+    """
+    server = ThreadingHTTPServer(("127.0.0.1", port), make_handler(rpm, latency_ms, error_rate, reply))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--port", type=int, default=18080)
+    parser.add_argument("--rpm", type=float, help="분당 요청 수 한도 (없으면 제한 없음)")
+    parser.add_argument("--latency-ms", type=float, default=50.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--reply", default="", help="응답 내용 (없으면 마지막 메시지 echo)")
+    args = parser.parse_args()
+    server = ThreadingHTTPServer(("127.0.0.1", args.port),
+                                 make_handler(args.rpm, args.latency_ms, args.error_rate, args.reply))
+    print(f"fake openai server: http://127.0.0.1:{args.port}/v1")
+    server.serve_forever()
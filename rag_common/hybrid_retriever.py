@@ -0,0 +1,180 @@
+"""
+BM25 + 벡터 하이브리드 검색
+
+짧은 뉴스 제목에서 인물 이름을 찾는 질문("김재준 들어간 뉴스 찾아줘")은 dense 검색이 잘 못 찾는다.
+FAISS 옆에 한국어 문자 n-gram 기반의 BM25 역색인을 두고,
+- lexical 결과가 충분히 확실하면 질문 임베딩을 생략하고 바로 반환하고
+- 그렇지 않으면 dense 결과와 reciprocal-rank fusion(RRF)으로 합친다.
+"""
+import math
+import re
+import unicodedata
+from collections import Counter, defaultdict
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from langchain_community.vectorstores import FAISS
+from langchain_core.callbacks import CallbackManagerForRetrieverRun
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+from pydantic import ConfigDict, Field
+
+_TOKEN_PATTERN = re.compile(r"[가-힣]+|[a-z0-9]+")
+
+# 질문에만 붙는 요청 / 지시 표현. 검색 대상과 상관없이 아무 제목에나 매칭되고("들어간" 등) confidence 분모만 키우므로
+# 질문을 토큰으로 자르기 전에 단어 단위로 뺀다.
+QUERY_STOPWORDS = frozenset({
+    "뉴스", "뉴스를", "뉴스가", "기사", "기사를", "소식", "소식을", "내용", "내용을",
+    "들어간", "들어가는", "나온", "나오는", "관련", "관련된", "관한", "대한", "대해", "대해서",
+    "찾아줘", "찾아", "찾아봐", "알려줘", "알려", "보여줘", "말해줘", "요약해줘", "정리해줘",
+    "좀", "요즘", "최근", "최신", "오늘", "있는", "있어", "뭐야", "뭐가", "어떤", "무슨",
+})
+
+
+def korean_tokenize(text: str, n: int = 2, stopwords: frozenset = frozenset()) -> List[str]:
+    """
+    한국어는 조사/어미가 붙어서 띄어쓰기 단위로는 매칭이 잘 안되므로 문자 n-gram 으로 자른다.
+    영문/숫자는 단어 단위로 사용한다. stopwords 에 있는 단어는 자르기 전에 뺀다.
+
+    예) "김재준 선수" -> ["김재", "재준", "선수"]
+    """
+    text = unicodedata.normalize("NFKC", text).lower()
+    tokens = []
+    for word in _TOKEN_PATTERN.findall(text):
+        if word in stopwords:
+            continue
+        if word[0].isascii() or len(word) <= n:
+            tokens.append(word)
+        else:
+            tokens.extend(word[i:i + n] for i in range(len(word) - n + 1))
+    return tokens
+
+
+def _doc_key(doc: Document) -> str:
+    return doc.id or doc.page_content
+
+
+class BM25Index:
+    """메모리 기반 BM25 역색인"""
+
+    def __init__(self, k1: float = 1.2, b: float = 0.75, ngram: int = 2,
+                 stopwords: frozenset = QUERY_STOPWORDS):
+        self.k1 = k1
+        self.b = b
+        self.ngram = ngram
+        self.stopwords = stopwords  # 질문에서만 빼는 단어 (문서 색인에는 그대로 둔다)
+        self.documents: List[Document] = []
+        self.postings: Dict[str, List[Tuple[int, int]]] = defaultdict(list)  # term -> [(doc 번호, tf)]
+        self.doc_lengths: List[int] = []
+        self._total_length = 0
+
+    def __len__(self):
+        return len(self.documents)
+
+    def add_documents(self, documents: Iterable[Document]):
+        for doc in documents:
+            doc_idx = len(self.documents)
+            terms = korean_tokenize(doc.page_content, self.ngram)
+            for term, tf in Counter(terms).items():
+                self.postings[term].append((doc_idx, tf))
+            self.documents.append(doc)
+            self.doc_lengths.append(len(terms))
+            self._total_length += len(terms)
+
+    def idf(self, term: str) -> float:
+        df = len(self.postings.get(term, ()))
+        return math.log(1 + (len(self.documents) - df + 0.5) / (df + 0.5))
+
+    def search(self, query: str, k: int = 4) -> Tuple[List[Tuple[Document, float]], float]:
+        """
+        Returns:
+            Tuple[List[Tuple[Document, float]], float]: (문서, BM25 점수) 목록과 1등 문서의 confidence(0~1).
+            confidence 는 질문 term 들이 평균 길이 문서에 1번씩 등장했을 때의 점수 대비 1등 점수의 비율이다.
+            색인에 없는 term(처음 보는 인물 이름 등)도 분모에 포함해서, 그런 질문은 dense 검색으로 넘어가게 한다.
+            "찾아줘", "뉴스" 같은 요청 표현(stopwords)은 점수와 분모 모두에서 뺀다.
+            (질문이 요청 표현뿐이면 그대로 검색하되 confidence 는 0)
+        """
+        if not self.documents:
+            return [], 0.0
+        terms = set(korean_tokenize(query, self.ngram, self.stopwords))
+        only_stopwords = not terms
+        if only_stopwords:
+            terms = set(korean_tokenize(query, self.ngram))
+        avg_length = self._total_length / len(self.documents)
+        scores: Dict[int, float] = defaultdict(float)
+        max_score = 0.0
+        for term in terms:
+            idf = self.idf(term)
+            max_score += idf
+            postings = self.postings.get(term)
+            if not postings:
+                continue
+            for doc_idx, tf in postings:
+                norm = self.k1 * (1 - self.b + self.b * self.doc_lengths[doc_idx] / avg_length)
+                scores[doc_idx] += idf * tf * (self.k1 + 1) / (tf + norm)
+
+        ranked = sorted(scores.items(), key=lambda x: x[1], reverse=True)[:k]
+        confidence = min(ranked[0][1] / max_score, 1.0) if ranked and max_score and not only_stopwords else 0.0
+        return [(self.documents[doc_idx], score) for doc_idx, score in ranked], confidence
+
+    @classmethod
+    def from_vectorstore(cls, vectorstore: FAISS, **kwargs) -> "BM25Index":
+        """FAISS docstore 에 들어있는 문서로 역색인을 만든다."""
+        index = cls(**kwargs)
+        index.add_documents(
+            vectorstore.docstore.search(doc_id) for doc_id in vectorstore.index_to_docstore_id.values()
+        )
+        return index
+
+
+def reciprocal_rank_fusion(result_lists: List[List[Document]], k: int = 60) -> List[Document]:
+    """여러 검색 결과를 순위 기반으로 합친다. score = sum(1 / (k + rank))"""
+    scores: Dict[str, float] = defaultdict(float)
+    docs: Dict[str, Document] = {}
+    for results in result_lists:
+        for rank, doc in enumerate(results, start=1):
+            key = _doc_key(doc)
+            scores[key] += 1.0 / (k + rank)
+            docs.setdefault(key, doc)
+    return [docs[key] for key in sorted(scores, key=scores.get, reverse=True)]
+
+
+class HybridRetriever(BaseRetriever):
+    """
+    BM25 + FAISS 하이브리드 retriever.
+    기존 vectorstore.as_retriever() 자리에 그대로 사용할 수 있다.
+    """
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
+    vectorstore: FAISS
+    bm25: BM25Index
+    k: int = 4
+    fetch_k: int = 20  # 각 검색기에서 가져올 후보 수
+    rrf_k: int = 60
+    confidence_threshold: float = 0.5  # 이 이상이면 dense 검색(질문 임베딩)을 생략
+    stats: Dict[str, int] = Field(default_factory=lambda: {"lexical_only": 0, "fused": 0})
+
+    @classmethod
+    def from_vectorstore(cls, vectorstore: FAISS, bm25: Optional[BM25Index] = None, **kwargs) -> "HybridRetriever":
+        return cls(vectorstore=vectorstore, bm25=bm25 or BM25Index.from_vectorstore(vectorstore), **kwargs)
+
+    def add_documents(self, documents: List[Document]):
+        """FAISS 와 BM25 양쪽에 문서를 추가"""
+        self.vectorstore.add_documents(documents)
+        self.bm25.add_documents(documents)
+
+    def lexical_confident(self, query: str) -> bool:
+        """BM25 결과만으로 답할 질문인지 (True 면 검색할 때 질문 임베딩을 하지 않는다)"""
+        return self.bm25.search(query, k=1)[1] >= self.confidence_threshold
+
+    def _get_relevant_documents(
+            self, query: str, *, run_manager: CallbackManagerForRetrieverRun
+    ) -> List[Document]:
+        lexical, confidence = self.bm25.search(query, k=self.fetch_k)
+        lexical_docs = [doc for doc, _ in lexical]
+        if confidence >= self.confidence_threshold:
+            self.stats["lexical_only"] += 1
+            return lexical_docs[:self.k]
+
+        self.stats["fused"] += 1
+        dense_docs = self.vectorstore.similarity_search(query, k=self.fetch_k)
+        return reciprocal_rank_fusion([lexical_docs, dense_docs], k=self.rrf_k)[:self.k]
@@ -0,0 +1,321 @@
+"""
+인덱스 manifest
+
+저장된 인덱스가 어떤 임베딩 모델 / 차원 / splitter 설정 / 원본 문서로 만들어졌는지 기록한다.
+({folder}/{index_name}.manifest.json)
+인덱스를 열 때 현재 설정과 비교해서
+- 임베딩 모델 / 차원이 다르면: 모든 chunk 를 다시 임베딩 (chunk 텍스트는 docstore 에 있으므로 원본이 없어도 가능)
+- splitter 설정이 다르면: 원본이 주어진 문서만 다시 chunk 분할 후 임베딩
+- 원본 hash 가 다르면: 해당 문서의 chunk 만 삭제 후 다시 임베딩
+나머지 문서는 그대로 둔다. (임베딩 캐시를 쓰면 내용이 같은 chunk 는 임베딩 호출도 발생하지 않는다)
+
+manifest 다시 생성 (저장된 인덱스 기준):
+    python -m rag_common.index_manifest rebuild naver_ranking_news/db --model OpenAIEmbeddings:text-embedding-ada-002
+"""
+import argparse
+import hashlib
+import json
+import os
+import time
+import weakref
+from dataclasses import asdict, dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+from langchain_community.vectorstores import FAISS
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+from rag_common.ann_index import build_faiss_vectorstore
+from rag_common.embedding_cache import CachedEmbeddings, model_namespace
+from rag_common.mmap_store import delete_documents, exists, load_mmap_store, save_mmap_store
+
+MANIFEST_SUFFIX = ".manifest.json"
+
+# id(embeddings) -> (weakref, signature). 임베딩 객체(pydantic)는 hash 할 수 없어서 id 로 구분한다.
+_signatures: Dict[int, Tuple[weakref.ref, Dict]] = {}
+
+
+def manifest_path(folder_path: str, index_name: str) -> str:
+    return os.path.join(folder_path, f"{index_name}{MANIFEST_SUFFIX}")
+
+
+def embedding_signature(embeddings: Embeddings) -> Dict:
+    """임베딩 모델 이름과 차원. 차원은 질의 1건을 임베딩해서 확인하고, 같은 임베딩 객체는 결과를 재사용한다."""
+    key = id(embeddings)
+    cached = _signatures.get(key)
+    if cached is not None and cached[0]() is embeddings:
+        return dict(cached[1])
+    underlying = embeddings.underlying if isinstance(embeddings, CachedEmbeddings) else embeddings
+    signature = {
+        "model": model_namespace(underlying),
+        "dimension": len(embeddings.embed_query("dimension probe")),
+    }
+    _signatures[key] = (weakref.ref(embeddings, lambda _: _signatures.pop(key, None)), signature)
+    return dict(signature)
+
+
+def splitter_signature(splitter) -> Dict:
+    """chunk 결과에 영향을 주는 splitter 설정"""
+    if splitter is None:
+        return {}
+    signature = {"class": type(splitter).__name__}
+    for key in ("_chunk_size", "_chunk_overlap", "_separators", "_keep_separator", "_strip_whitespace", "_encoding"):
+        if hasattr(splitter, key):
+            signature[key.lstrip("_")] = getattr(splitter, key)
+    return signature
+
+
+def source_hash(documents: List[Document]) -> str:
+    digest = hashlib.sha256()
+    for doc in documents:
+        digest.update(doc.page_content.encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+def file_hash(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def chunk_id(source: str, index: int) -> str:
+    return hashlib.sha1(f"{source}#{index}".encode("utf-8")).hexdigest()
+
+
+@dataclass
+class IndexManifest:
+    """인덱스 생성 정보"""
+    embedding: Dict = field(default_factory=dict)
+    splitter: Dict = field(default_factory=dict)
+    sources: Dict[str, Dict] = field(default_factory=dict)  # source -> {"hash": ..., "chunk_ids": [...]}
+    document_hash: str = ""  # 인덱스 전체가 파일 1개(PDF 등)에서 나온 경우 그 파일의 hash
+    updated_at: float = 0.0
+
+    @classmethod
+    def load(cls, folder_path: str, index_name: str) -> Optional["IndexManifest"]:
+        path = manifest_path(folder_path, index_name)
+        if not os.path.exists(path):
+            return None
+        with open(path, encoding="utf-8") as f:
+            return cls(**json.load(f))
+
+    def save(self, folder_path: str, index_name: str):
+        self.updated_at = time.time()
+        path = manifest_path(folder_path, index_name)
+        with open(f"{path}.tmp", "w", encoding="utf-8") as f:
+            json.dump(asdict(self), f, ensure_ascii=False, indent=2)
+        os.replace(f"{path}.tmp", path)
+
+
+@dataclass
+class SyncPlan:
+    """manifest 비교 결과"""
+    reembed_all: bool = False  # 임베딩 모델 변경
+    rechunk_all: bool = False  # splitter 설정 변경
+    changed: List[str] = field(default_factory=list)
+    added: List[str] = field(default_factory=list)
+    removed: List[str] = field(default_factory=list)
+    unchanged: List[str] = field(default_factory=list)
+    reasons: List[str] = field(default_factory=list)
+
+    @property
+    def is_noop(self) -> bool:
+        return not (self.reembed_all or self.rechunk_all or self.changed or self.added or self.removed)
+
+    def __str__(self):
+        return (f"reembed_all={self.reembed_all} rechunk_all={self.rechunk_all} "
+                f"changed={len(self.changed)} added={len(self.added)} removed={len(self.removed)} "
+                f"unchanged={len(self.unchanged)} reasons={self.reasons}")
+
+
+def plan_sync(manifest: Optional[IndexManifest], embedding_sig: Dict, splitter_sig: Dict,
+              source_hashes: Dict[str, str], prune: bool = False) -> SyncPlan:
+    """
+    Args:
+        manifest (Optional[IndexManifest]): 저장된 manifest. 없으면 전체 생성
+        embedding_sig (Dict): 현재 임베딩 설정
+        splitter_sig (Dict): 현재 splitter 설정
+        source_hashes (Dict[str, str]): 현재 원본 문서 hash
+        prune (bool): source_hashes 에 없는 문서를 인덱스에서 삭제할지 여부
+    """
+    plan = SyncPlan()
+    if manifest is None:
+        plan.added = list(source_hashes)
+        plan.reasons.append("manifest 없음")
+        return plan
+
+    if manifest.embedding != embedding_sig:
+        plan.reembed_all = True
+        plan.reasons.append(f"임베딩 변경: {manifest.embedding} -> {embedding_sig}")
+    if splitter_sig and manifest.splitter != splitter_sig:
+        plan.rechunk_all = True
+        plan.reasons.append(f"splitter 변경: {manifest.splitter} -> {splitter_sig}")
+
+    for source, digest in source_hashes.items():
+        if source not in manifest.sources:
+            plan.added.append(source)
+        elif manifest.sources[source]["hash"] != digest:
+            plan.changed.append(source)
+        else:
+            plan.unchanged.append(source)
+    if prune:
+        plan.removed = [source for source in manifest.sources if source not in source_hashes]
+    return plan
+
+
+def _chunks_by_source(vectorstore: FAISS) -> Dict[str, List[Document]]:
+    """저장된 chunk 를 인덱스 순서대로 source(URL, 파일 경로 등)별로 묶는다."""
+    grouped = {}
+    for doc in vectorstore.get_by_ids(list(vectorstore.index_to_docstore_id.values())):
+        source = doc.metadata.get("source") or doc.metadata.get("url") or doc.id
+        grouped.setdefault(source, []).append(doc)
+    return grouped
+
+
+def _split(source: str, documents: List[Document], splitter) -> List[Document]:
+    chunks = splitter.split_documents(documents) if splitter is not None else list(documents)
+    for i, chunk in enumerate(chunks):
+        chunk.id = chunk_id(source, i)
+        chunk.metadata.setdefault("source", source)
+    return chunks
+
+
+def sync_store(
+        folder_path: str,
+        index_name: str,
+        embeddings: Embeddings,
+        sources: Dict[str, List[Document]],
+        splitter=None,
+        prune: bool = False,
+        writable: bool = False,
+) -> Tuple[Optional[FAISS], IndexManifest, SyncPlan]:
+    """
+    저장된 인덱스를 manifest 와 비교해서, 바뀐 부분만 다시 임베딩한 뒤 vectorstore 를 반환합니다.
+    변경이 없으면 인덱스를 mmap(읽기 전용)으로 엽니다.
+
+    Args:
+        folder_path (str): 인덱스 폴더
+        index_name (str): 인덱스 이름
+        embeddings (Embeddings): 현재 임베딩
+        sources (Dict[str, List[Document]]): source(URL, 파일 경로 등) -> 분할 전 원본 문서
+        splitter: 현재 text splitter. None 이면 원본 문서를 그대로 chunk 로 사용
+        prune (bool): sources 에 없는 문서를 인덱스에서 삭제할지 여부
+        writable (bool): 이후에 문서를 추가할 예정이면 True (mmap 이 아닌 수정 가능한 모드로 연다. load_mmap_store 참고)
+
+    Returns:
+        Tuple[Optional[FAISS], IndexManifest, SyncPlan]: vectorstore(인덱스도 원본도 없으면 None), manifest, 적용된 변경 내용
+    """
+    embedding_sig = embedding_signature(embeddings)
+    splitter_sig = splitter_signature(splitter)
+    if not exists(folder_path, index_name) and not sources:
+        return None, IndexManifest(embedding=embedding_sig, splitter=splitter_sig), SyncPlan()
+
+    old_store = None
+    manifest = IndexManifest.load(folder_path, index_name) if exists(folder_path, index_name) else None
+    if manifest is None and exists(folder_path, index_name):
+        # manifest 없이 만들어진 기존 인덱스: 어떤 모델로 만들었는지 모르므로 저장된 chunk 를 source 별로 묶어서 다시 임베딩
+        old_store = load_mmap_store(folder_path, embeddings, index_name, mmap=False)
+        manifest = IndexManifest(sources={source: {"hash": "", "chunk_ids": [doc.id for doc in chunks]}
+                                          for source, chunks in _chunks_by_source(old_store).items()})
+
+    plan = plan_sync(manifest, embedding_sig, splitter_sig,
+                     {source: source_hash(docs) for source, docs in sources.items()}, prune=prune)
+    if plan.is_noop:
+        return load_mmap_store(folder_path, embeddings, index_name, mmap=not writable), manifest, plan
+
+    manifest = manifest or IndexManifest()
+    if old_store is None and exists(folder_path, index_name):
+        old_store = load_mmap_store(folder_path, embeddings, index_name, mmap=False)
+
+    # HNSW 는 벡터 삭제(remove_ids)를 지원하지 않으므로 전체를 다시 만든다.
+    can_remove = old_store is not None and not hasattr(old_store.index, "hnsw")
+    if plan.reembed_all or plan.rechunk_all or not can_remove:
+        # 원본이 있는 문서는 다시 분할하고, 원본이 없는 문서는 docstore 에 있는 chunk 를 그대로 다시 임베딩한다.
+        # (임베딩 캐시를 쓰면 모델이 같은 경우 내용이 같은 chunk 는 임베딩 호출이 발생하지 않는다)
+        chunks, new_sources = [], {}
+        kept = [source for source in manifest.sources if source not in sources and source not in plan.removed]
+        for source in list(sources) + kept:
+            if source in sources:
+                source_chunks = _split(source, sources[source], splitter)
+                digest = source_hash(sources[source])
+            else:
+                source_chunks = old_store.get_by_ids(manifest.sources[source]["chunk_ids"]) if old_store else []
+                digest = manifest.sources[source]["hash"]
+            chunks += source_chunks
+            new_sources[source] = {"hash": digest, "chunk_ids": [doc.id for doc in source_chunks]}
+        if not chunks:
+            raise ValueError("인덱싱할 문서가 없습니다.")
+        vectorstore = build_faiss_vectorstore(chunks, embeddings)
+        manifest.sources = new_sources
+    else:
+        # 바뀐 문서의 chunk 만 교체
+        vectorstore = old_store
+        stale_ids = [chunk for source in plan.changed + plan.removed
+                     for chunk in manifest.sources[source]["chunk_ids"]]
+        if stale_ids:
+            delete_documents(vectorstore, stale_ids)
+        for source in plan.removed:
+            del manifest.sources[source]
+        for source in plan.changed + plan.added:
+            source_chunks = _split(source, sources[source], splitter)
+            if source_chunks:
+                vectorstore.add_documents(source_chunks)
+            manifest.sources[source] = {"hash": source_hash(sources[source]),
+                                        "chunk_ids": [doc.id for doc in source_chunks]}
+
+    manifest.embedding = embedding_sig
+    manifest.splitter = splitter_sig
+    save_mmap_store(vectorstore, folder_path, index_name)
+    manifest.save(folder_path, index_name)
+    if writable:
+        # 이후에 추가하는 문서가 메모리가 아닌 디스크 docstore 에 쓰이도록 저장한 버전을 수정용으로 다시 연다.
+        vectorstore = load_mmap_store(folder_path, embeddings, index_name, mmap=False)
+    return vectorstore, manifest, plan
+
+
+def rebuild_manifest(folder_path: str, index_name: str, model: str, splitter=None) -> IndexManifest:
+    """
+    저장된 인덱스에서 manifest 를 다시 만든다. (manifest 가 없거나 잘못된 경우)
+    차원은 인덱스에서, source / chunk id 는 docstore 에서 읽는다.
+    splitter 가 None 이면 chunk 가 원본 문서 그대로이므로 hash 를 계산할 수 있지만,
+    분할된 chunk 로는 원본을 복원할 수 없으므로 hash 를 비워둔다. (다음 sync 때 그 source 만 다시 임베딩)
+
+    Args:
+        model (str): 인덱스를 만든 임베딩 모델 (model_namespace 형식. 예: OpenAIEmbeddings:text-embedding-ada-002)
+        splitter: 인덱스를 만들 때 사용한 text splitter
+    """
+    vectorstore = load_mmap_store(folder_path, None, index_name)
+    manifest = IndexManifest(
+        embedding={"model": model, "dimension": vectorstore.index.d},
+        splitter=splitter_signature(splitter),
+        sources={source: {"hash": source_hash(chunks) if splitter is None else "",
+                          "chunk_ids": [doc.id for doc in chunks]}
+                 for source, chunks in _chunks_by_source(vectorstore).items()},
+    )
+    manifest.save(folder_path, index_name)
+    return manifest
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    rebuild = subparsers.add_parser("rebuild", help="저장된 인덱스에서 manifest 를 다시 생성")
+    rebuild.add_argument("folder_path")
+    rebuild.add_argument("index_name", nargs="?", default="faiss_index")
+    rebuild.add_argument("--model", required=True, help="임베딩 모델 (예: OpenAIEmbeddings:text-embedding-ada-002)")
+    rebuild.add_argument("--chunk-size", type=int, help="RecursiveCharacterTextSplitter 로 분할한 경우 chunk 크기")
+    rebuild.add_argument("--chunk-overlap", type=int, default=0)
+    args = parser.parse_args()
+
+    text_splitter = None
+    if args.chunk_size:
+        text_splitter = RecursiveCharacterTextSplitter(chunk_size=args.chunk_size, chunk_overlap=args.chunk_overlap)
+    rebuilt = rebuild_manifest(args.folder_path, args.index_name, args.model, text_splitter)
+    chunk_count = sum(len(entry["chunk_ids"]) for entry in rebuilt.sources.values())
+    empty = sum(1 for entry in rebuilt.sources.values() if not entry["hash"])
+    print(f"manifest 생성: source {len(rebuilt.sources)}개, chunk {chunk_count}개 (hash 없음 {empty}개) "
+          f"-> {manifest_path(args.folder_path, args.index_name)}")
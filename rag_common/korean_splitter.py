@@ -0,0 +1,96 @@
+"""
+한국어 문장 경계 + 토큰 예산 기반 text splitter
+
+RecursiveCharacterTextSplitter 는 글자 수 기준이라 한국어(1글자 ≈ 1토큰)와 영문(4글자 ≈ 1토큰)이 섞이면
+chunk 마다 토큰 수가 크게 달라지고, 문장 중간에서 잘리는 경우가 많다.
+여기서는
+- 문장 끝(. ! ? / "~다", "~요" 로 끝나는 줄 / 빈 줄 / 목록 기호로 시작하는 줄)에서 문장을 나누고
+- 문장별 토큰 수를 한 번만 세서 chunk_size(토큰) 안에 들어가는 만큼 문장을 이어 붙이고
+- 다음 chunk 앞에 chunk_overlap(토큰) 이하의 마지막 문장들을 겹쳐 넣는다.
+chunk_size 보다 긴 문장만 토큰 단위로 자른다.
+
+사용법:
+    splitter = KoreanSentenceSplitter(chunk_size=256, chunk_overlap=32)
+    chunks = splitter.split_documents(docs)
+"""
+import re
+from typing import List
+
+from langchain_text_splitters import TextSplitter
+
+from rag_common.context_builder import DEFAULT_ENCODING, TokenCounter
+
+_SENTENCE_BOUNDARY = re.compile(
+    r"(?<=[.!?。])[\"'”’)\]]*\s+"  # 문장 부호 뒤 공백
+    r"|(?<=[다요음함됨임])\s*\n"  # 마침표 없이 "~다" 등으로 끝나는 줄 (PDF 에서 흔함)
+    r"|\n\s*\n"  # 빈 줄
+    r"|\n(?=\s*(?:[-•·○●▪■□◦※*]|\d{1,2}[.)]|[가-하][.)]|제\s*\d+\s*[조항장]))"  # 목록 / 조항 시작
+)
+_LINE_BREAK = re.compile(r"\s*\n\s*")
+
+
+def split_sentences(text: str) -> List[str]:
+    """문장 단위로 나눈다. 문장 안의 줄바꿈(PDF 줄 넘김)은 공백으로 바꾼다."""
+    sentences = []
+    for sentence in _SENTENCE_BOUNDARY.split(text):
+        sentence = _LINE_BREAK.sub(" ", sentence).strip()
+        if sentence:
+            sentences.append(sentence)
+    return sentences
+
+
+class KoreanSentenceSplitter(TextSplitter):
+    """문장 경계를 지키면서 chunk_size(토큰) 에 맞춰 자르는 splitter"""
+
+    def __init__(self, chunk_size: int = 256, chunk_overlap: int = 32, encoding: str = DEFAULT_ENCODING, **kwargs):
+        """
+        Args:
+            chunk_size (int): chunk 최대 토큰 수
+            chunk_overlap (int): 앞 chunk 와 겹치는 최대 토큰 수 (문장 단위)
+            encoding (str): tiktoken 인코딩 이름
+        """
+        self._counter = TokenCounter(encoding)
+        self._encoding = encoding
+        super().__init__(chunk_size=chunk_size, chunk_overlap=chunk_overlap,
+                         length_function=self._counter.count, **kwargs)
+
+    def _long_sentence(self, sentence: str) -> List[str]:
+        """chunk_size 보다 긴 문장은 토큰 단위로 자른다."""
+        pieces = []
+        while sentence:
+            piece = self._counter.truncate(sentence, self._chunk_size)
+            if not piece:
+                piece = sentence[:1]
+            pieces.append(piece.strip())
+            sentence = sentence[len(piece):]
+        return [piece for piece in pieces if piece]
+
+    def split_text(self, text: str) -> List[str]:
+        units = []  # (문장, 토큰 수)
+        for sentence in split_sentences(text):
+            tokens = self._counter.count(sentence)
+            if tokens > self._chunk_size:
+                units += [(piece, self._counter.count(piece)) for piece in self._long_sentence(sentence)]
+            else:
+                units.append((sentence, tokens))
+
+        chunks = []
+        current, current_tokens = [], 0
+        for sentence, tokens in units:
+            # 문장 사이 공백 1토큰 포함
+            if current and current_tokens + tokens + 1 > self._chunk_size:
+                chunks.append(" ".join(s for s, _ in current))
+                # 마지막 문장들 중 chunk_overlap 이하만 다음 chunk 로 넘긴다.
+                overlap, overlap_tokens = [], 0
+                for prev, prev_tokens in reversed(current):
+                    if overlap_tokens + prev_tokens > self._chunk_overlap \
+                            or overlap_tokens + prev_tokens + tokens + 1 > self._chunk_size:
+                        break
+                    overlap.insert(0, (prev, prev_tokens))
+                    overlap_tokens += prev_tokens + 1
+                current, current_tokens = overlap, overlap_tokens
+            current.append((sentence, tokens))
+            current_tokens += tokens + (1 if len(current) > 1 else 0)
+        if current:
+            chunks.append(" ".join(s for s, _ in current))
+        return chunks
@@ -0,0 +1,528 @@
+"""
+공용 LLM 클라이언트 계층
+
+스크립트마다 ChatOpenAI 를 따로 만들면 rate limit 상태를 공유하지 못해서, 동시에 요청이 몰리면 429 로 요청 전체가 실패한다.
+같은 프로세스의 모든 LLM 호출이 하나의 LLMClient 를 거치도록 해서
+- 모델별 token bucket: 분당 요청 수(rpm) / 분당 토큰 수(tpm). 429 의 Retry-After 동안은 그 모델의 모든 호출이 대기
+- 모델별 동시 요청 수 제한 (max_concurrency)
+- 429 / 5xx / 연결 오류는 jitter 를 넣은 exponential backoff 로 재시도 (Retry-After 헤더가 있으면 그 시간을 따른다)
+- caller(호출한 곳) 별 요청 수 / 토큰 수 / latency / 재시도 / 대기 시간 집계
+- deadline(time.monotonic() 기준 시각)을 주면 그 안에 시작 / 재시도할 수 없는 호출은 DeadlineExceeded 로 바로 실패하고,
+  요청 timeout 도 남은 시간으로 맞춘다. (llm.invoke(prompt, deadline=...) 또는 llm.bind(deadline=...))
+를 처리한다. ManagedChatModel 은 BaseChatModel 이라 기존 chain (prompt | llm) 에 그대로 넣을 수 있다.
+
+사용법:
+    llm = get_chat_model("gpt-4o-mini", caller="news_summary", temperature=0.5, api_key=OPENAI_API_KEY)
+    chain = prompt | llm
+    print(default_client().report())
+
+모델별 한도 (환경변수 LLM_LIMITS, JSON. 없는 모델은 "default" 또는 기본값 사용):
+    LLM_LIMITS='{"gpt-4o-mini": {"rpm": 500, "tpm": 200000, "max_concurrency": 16}, "default": {"rpm": 60}}'
+"""
+import asyncio
+import json
+import os
+import random
+import statistics
+import threading
+import time
+from collections import defaultdict, deque
+from dataclasses import dataclass, field
+from email.utils import parsedate_to_datetime
+from typing import Any, AsyncIterator, Awaitable, Callable, Deque, Dict, Iterator, List, Optional, Sequence, Tuple
+
+import openai
+from langchain_core.callbacks import AsyncCallbackManagerForLLMRun, CallbackManagerForLLMRun
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import BaseMessage
+from langchain_core.runnables import Runnable
+from langchain_core.outputs import ChatGenerationChunk, ChatResult
+from pydantic import ConfigDict, Field
+
+from rag_common.context_builder import TokenCounter
+
+DEFAULT_COMPLETION_TOKENS = 512  # max_tokens 가 없을 때 응답 토큰 수 추정치
+RETRYABLE_ERRORS = (openai.RateLimitError, openai.APIConnectionError, openai.InternalServerError)
+
+
+class DeadlineExceeded(TimeoutError):
+    """deadline 안에 LLM 호출을 시작하거나 재시도할 수 없음"""
+
+
+@dataclass
+class ModelLimits:
+    rpm: float = 500  # 분당 요청 수
+    tpm: float = 200_000  # 분당 토큰 수 (프롬프트 + 응답)
+    max_concurrency: int = 16
+
+
+def load_limits(value: Optional[str] = None) -> Dict[str, ModelLimits]:
+    value = os.environ.get("LLM_LIMITS", "") if value is None else value
+    return {model: ModelLimits(**limits) for model, limits in json.loads(value).items()} if value else {}
+
+
+class TokenBucket:
+    """
+    분당 rate 만큼 채워지는 token bucket.
+    reserve() 는 바로 차감하고(잔량이 음수가 될 수 있음) 기다려야 하는 시간을 반환한다. 먼저 예약한 호출이 먼저 나간다.
+    """
+
+    def __init__(self, rate_per_minute: float, capacity: Optional[float] = None):
+        self.rate = rate_per_minute / 60
+        # 1분치를 한 번에 몰아서 보내지 않도록 기본 burst 는 10초치
+        self.capacity = capacity or max(rate_per_minute / 6, 1.0)
+        self.level = self.capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def reserve(self, amount: float) -> float:
+        with self._lock:
+            self._refill()
+            self.level -= amount
+            return max(0.0, -self.level / self.rate)
+
+    def refund(self, amount: float):
+        """예약한 양보다 실제 사용량이 적으면 돌려받는다. (음수면 추가 차감)"""
+        with self._lock:
+            self._refill()
+            self.level = min(self.capacity, self.level + amount)
+
+    def pause(self, seconds: float):
+        """seconds 동안 아무도 통과하지 못하게 한다. (429 Retry-After)"""
+        with self._lock:
+            self._refill()
+            self.level = min(self.level, -seconds * self.rate)
+
+
+class _Slots:
+    """thread / asyncio 양쪽에서 쓸 수 있는 동시 실행 수 제한"""
+
+    def __init__(self, size: int):
+        self.size = size
+        self.in_use = 0
+        self._condition = threading.Condition()
+
+    def try_acquire(self) -> bool:
+        with self._condition:
+            if self.in_use < self.size:
+                self.in_use += 1
+                return True
+            return False
+
+    def acquire(self, timeout: Optional[float] = None) -> bool:
+        """timeout(초) 안에 자리가 나지 않으면 False"""
+        with self._condition:
+            if not self._condition.wait_for(lambda: self.in_use < self.size, timeout):
+                return False
+            self.in_use += 1
+            return True
+
+    async def aacquire(self, timeout: Optional[float] = None) -> bool:
+        started = time.monotonic()
+        while not self.try_acquire():
+            if timeout is not None and time.monotonic() - started >= timeout:
+                return False
+            await asyncio.sleep(0.005)
+        return True
+
+    def release(self):
+        with self._condition:
+            self.in_use -= 1
+            self._condition.notify()
+
+
+@dataclass
+class _ModelState:
+    limits: ModelLimits
+    requests: TokenBucket
+    tokens: TokenBucket
+    slots: _Slots
+
+
+@dataclass
+class CallerUsage:
+    requests: int = 0
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    errors: int = 0
+    retries: int = 0
+    rate_limited: int = 0  # 429 응답 수
+    wait_seconds: float = 0.0  # rate limit / 동시 요청 수 제한으로 기다린 시간
+    latency_seconds: float = 0.0
+    latencies: Deque[float] = field(default_factory=lambda: deque(maxlen=1000))
+
+    def line(self) -> str:
+        latencies = sorted(self.latencies)
+        p50 = statistics.median(latencies) if latencies else 0.0
+        p95 = latencies[int(len(latencies) * 0.95)] if latencies else 0.0
+        return (f"requests={self.requests} tokens={self.prompt_tokens}+{self.completion_tokens} "
+                f"p50={p50 * 1000:.0f}ms p95={p95 * 1000:.0f}ms wait={self.wait_seconds:.1f}s "
+                f"retries={self.retries} 429={self.rate_limited} errors={self.errors}")
+
+
+def retry_after_seconds(error: Exception) -> Optional[float]:
+    """응답 헤더의 retry-after-ms / retry-after(초 또는 HTTP 날짜)"""
+    headers = getattr(getattr(error, "response", None), "headers", None)
+    if not headers:
+        return None
+    try:
+        if headers.get("retry-after-ms"):
+            return float(headers["retry-after-ms"]) / 1000
+        value = headers.get("retry-after")
+        if value is None:
+            return None
+        try:
+            return float(value)
+        except ValueError:
+            return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def _usage(result: ChatResult) -> Tuple[Optional[int], Optional[int]]:
+    token_usage = (result.llm_output or {}).get("token_usage") or {}
+    if token_usage:
+        return token_usage.get("prompt_tokens"), token_usage.get("completion_tokens")
+    metadata = getattr(result.generations[0].message, "usage_metadata", None) if result.generations else None
+    if metadata:
+        return metadata.get("input_tokens"), metadata.get("output_tokens")
+    return None, None
+
+
+class LLMClient:
+    """모델별 admission control + 재시도 + caller 별 사용량 집계"""
+
+    def __init__(self, limits: Optional[Dict[str, ModelLimits]] = None, max_retries: int = 5,
+                 base_delay: float = 0.5, max_delay: float = 30.0):
+        """
+        Args:
+            limits (Optional[Dict[str, ModelLimits]]): 모델 이름 -> 한도. "default" 키는 목록에 없는 모델에 사용
+            max_retries (int): 429 / 5xx / 연결 오류 재시도 횟수
+            base_delay (float): 첫 재시도 대기 시간(초). 재시도마다 2배, jitter 로 50 ~ 100% 사이 값을 사용
+            max_delay (float): 재시도 대기 시간 상한 (Retry-After 가 더 길면 Retry-After 를 따름)
+        """
+        self.limits = load_limits() if limits is None else dict(limits)
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self._models: Dict[str, _ModelState] = {}
+        self._usage: Dict[Tuple[str, str], CallerUsage] = defaultdict(CallerUsage)
+        self._lock = threading.Lock()
+        self.counter = TokenCounter()
+
+    def set_limits(self, model: str, limits: ModelLimits):
+        with self._lock:
+            self.limits[model] = limits
+            self._models.pop(model, None)
+
+    def _state(self, model: str) -> _ModelState:
+        with self._lock:
+            state = self._models.get(model)
+            if state is None:
+                limits = self.limits.get(model) or self.limits.get("default") or ModelLimits()
+                state = _ModelState(limits, TokenBucket(limits.rpm), TokenBucket(limits.tpm),
+                                    _Slots(limits.max_concurrency))
+                self._models[model] = state
+            return state
+
+    def estimate_tokens(self, messages: List[BaseMessage], max_tokens: Optional[int]) -> int:
+        prompt = sum(self.counter.count(message.content if isinstance(message.content, str)
+                                        else json.dumps(message.content, ensure_ascii=False)) + 4
+                     for message in messages)
+        return prompt + (max_tokens or DEFAULT_COMPLETION_TOKENS)
+
+    def _backoff(self, attempt: int, retry_after: Optional[float]) -> float:
+        delay = min(self.max_delay, self.base_delay * 2 ** attempt) * random.uniform(0.5, 1.0)
+        if retry_after is not None:
+            delay = max(delay, retry_after * random.uniform(1.0, 1.1))
+        return delay
+
+    def _admit_delay(self, state: _ModelState, tokens: int) -> float:
+        return max(state.requests.reserve(1), state.tokens.reserve(tokens))
+
+    @staticmethod
+    def _refund_admission(state: _ModelState, tokens: int):
+        """호출하지 않고 포기한 요청의 rpm / tpm 예약을 되돌린다."""
+        state.requests.refund(1)
+        state.tokens.refund(tokens)
+
+    @classmethod
+    def _check_admission(cls, state: _ModelState, tokens: int, delay: float, deadline: Optional[float]):
+        """대기 후 호출을 시작하면 deadline 을 넘는 경우 예약을 되돌리고 실패"""
+        if deadline is not None and time.monotonic() + delay >= deadline:
+            cls._refund_admission(state, tokens)
+            raise DeadlineExceeded(f"rate limit 대기({delay:.1f}s) 후에는 deadline 을 넘습니다.")
+
+    @staticmethod
+    def _slot_timeout(deadline: Optional[float]) -> Optional[float]:
+        return None if deadline is None else max(deadline - time.monotonic(), 0.0)
+
+    def _caller_usage(self, caller: str, model: str) -> CallerUsage:
+        with self._lock:
+            return self._usage[(caller, model)]
+
+    def _add_wait(self, usage: CallerUsage, seconds: float):
+        with self._lock:
+            usage.wait_seconds += seconds
+
+    def _on_success(self, state: _ModelState, usage: CallerUsage, result: ChatResult, tokens: int, latency: float):
+        prompt_tokens, completion_tokens = _usage(result)
+        with self._lock:
+            usage.requests += 1
+            usage.latency_seconds += latency
+            usage.latencies.append(latency)
+            usage.prompt_tokens += prompt_tokens or 0
+            usage.completion_tokens += completion_tokens or 0
+        if prompt_tokens is not None:
+            state.tokens.refund(tokens - prompt_tokens - (completion_tokens or 0))
+
+    def _on_error(self, state: _ModelState, usage: CallerUsage, error: Exception, tokens: int, attempt: int,
+                  deadline: Optional[float] = None) -> Optional[float]:
+        """재시도할 경우 대기 시간, 아니면 None (재시도 대기 후 deadline 을 넘으면 재시도하지 않음)"""
+        # 실패한 시도의 토큰 예약은 돌려준다. (재시도는 다시 예약하므로 돌려주지 않으면 한도가 시도 수만큼 줄어듦)
+        state.tokens.refund(tokens)
+        retryable = isinstance(error, RETRYABLE_ERRORS) and attempt < self.max_retries
+        retry_after = retry_after_seconds(error)
+        if retryable and isinstance(error, openai.RateLimitError):
+            # 다른 caller 도 같은 한도를 쓰므로, 이 모델로 가는 모든 호출을 멈춘다.
+            state.requests.pause(retry_after if retry_after is not None else self._backoff(attempt, None))
+        delay = self._backoff(attempt, retry_after) if retryable else None
+        if delay is not None and deadline is not None and time.monotonic() + delay >= deadline:
+            delay = None
+        with self._lock:
+            if isinstance(error, openai.RateLimitError):
+                usage.rate_limited += 1
+            if delay is not None:
+                usage.retries += 1
+            else:
+                usage.errors += 1
+        return delay
+
+    def _admit(self, state: _ModelState, usage: CallerUsage, tokens: int, deadline: Optional[float]):
+        """rate limit 예약 후 대기하고 동시 실행 자리를 잡는다. (호출 후 state.slots.release() 필요)"""
+        started = time.perf_counter()
+        delay = self._admit_delay(state, tokens)
+        self._check_admission(state, tokens, delay, deadline)
+        time.sleep(delay)
+        if not state.slots.acquire(self._slot_timeout(deadline)):
+            self._refund_admission(state, tokens)
+            raise DeadlineExceeded("동시 요청 수 제한 대기 중 deadline 을 넘었습니다.")
+        self._add_wait(usage, time.perf_counter() - started)
+
+    async def _aadmit(self, state: _ModelState, usage: CallerUsage, tokens: int, deadline: Optional[float]):
+        started = time.perf_counter()
+        delay = self._admit_delay(state, tokens)
+        self._check_admission(state, tokens, delay, deadline)
+        await asyncio.sleep(delay)
+        if not await state.slots.aacquire(self._slot_timeout(deadline)):
+            self._refund_admission(state, tokens)
+            raise DeadlineExceeded("동시 요청 수 제한 대기 중 deadline 을 넘었습니다.")
+        self._add_wait(usage, time.perf_counter() - started)
+
+    def call(self, model: str, caller: str, tokens: int, fn: Callable[[], ChatResult],
+             deadline: Optional[float] = None) -> ChatResult:
+        state, usage = self._state(model), self._caller_usage(caller, model)
+        for attempt in range(self.max_retries + 1):
+            self._admit(state, usage, tokens, deadline)
+            try:
+                started = time.perf_counter()
+                result = fn()
+                self._on_success(state, usage, result, tokens, time.perf_counter() - started)
+                return result
+            except Exception as e:
+                delay = self._on_error(state, usage, e, tokens, attempt, deadline)
+                if delay is None:
+                    raise
+            finally:
+                state.slots.release()
+            time.sleep(delay)
+
+    async def acall(self, model: str, caller: str, tokens: int, fn: Callable[[], Awaitable[ChatResult]],
+                    deadline: Optional[float] = None) -> ChatResult:
+        state, usage = self._state(model), self._caller_usage(caller, model)
+        for attempt in range(self.max_retries + 1):
+            await self._aadmit(state, usage, tokens, deadline)
+            try:
+                started = time.perf_counter()
+                result = await fn()
+                self._on_success(state, usage, result, tokens, time.perf_counter() - started)
+                return result
+            except Exception as e:
+                delay = self._on_error(state, usage, e, tokens, attempt, deadline)
+                if delay is None:
+                    raise
+            finally:
+                state.slots.release()
+            await asyncio.sleep(delay)
+
+    def stream(self, model: str, caller: str, tokens: int, fn: Callable[[], Iterator[ChatGenerationChunk]],
+               deadline: Optional[float] = None) -> Iterator[ChatGenerationChunk]:
+        """
+        call() 과 같지만 chunk 를 받는 대로 내보낸다.
+        첫 chunk 를 내보내기 전의 오류만 재시도한다. (이미 내보낸 chunk 는 되돌릴 수 없음)
+        """
+        state, usage = self._state(model), self._caller_usage(caller, model)
+        for attempt in range(self.max_retries + 1):
+            self._admit(state, usage, tokens, deadline)
+            merged: Optional[ChatGenerationChunk] = None
+            try:
+                started = time.perf_counter()
+                for chunk in fn():
+                    merged = chunk if merged is None else merged + chunk
+                    yield chunk
+                if merged is not None:
+                    self._on_success(state, usage, ChatResult(generations=[merged]), tokens,
+                                     time.perf_counter() - started)
+                return
+            except Exception as e:
+                delay = self._on_error(state, usage, e, tokens, attempt if merged is None else self.max_retries,
+                                       deadline)
+                if delay is None:
+                    raise
+            finally:
+                state.slots.release()
+            time.sleep(delay)
+
+    async def astream(self, model: str, caller: str, tokens: int,
+                      fn: Callable[[], AsyncIterator[ChatGenerationChunk]],
+                      deadline: Optional[float] = None) -> AsyncIterator[ChatGenerationChunk]:
+        state, usage = self._state(model), self._caller_usage(caller, model)
+        for attempt in range(self.max_retries + 1):
+            await self._aadmit(state, usage, tokens, deadline)
+            merged: Optional[ChatGenerationChunk] = None
+            try:
+                started = time.perf_counter()
+                async for chunk in fn():
+                    merged = chunk if merged is None else merged + chunk
+                    yield chunk
+                if merged is not None:
+                    self._on_success(state, usage, ChatResult(generations=[merged]), tokens,
+                                     time.perf_counter() - started)
+                return
+            except Exception as e:
+                delay = self._on_error(state, usage, e, tokens, attempt if merged is None else self.max_retries,
+                                       deadline)
+                if delay is None:
+                    raise
+            finally:
+                state.slots.release()
+            await asyncio.sleep(delay)
+
+    def usage(self) -> Dict[Tuple[str, str], CallerUsage]:
+        with self._lock:
+            return dict(self._usage)
+
+    def report(self) -> str:
+        lines = [f"{caller:<20} {model:<24}{usage.line()}"
+                 for (caller, model), usage in sorted(self.usage().items())]
+        return "\n".join(lines) if lines else "LLM 호출 없음"
+
+
+class ManagedChatModel(BaseChatModel):
+    """
+    LLMClient 를 거쳐서 호출하는 chat model wrapper (invoke / batch / stream 과 각각의 async 버전)
+    bind_tools / with_structured_output 은 inner 모델 형식으로 tool 을 변환한 뒤, 호출은 계속 이 wrapper 를 거친다.
+    """
+
+    inner: BaseChatModel
+    caller: str = "default"
+    client: Any = Field(default=None, exclude=True)
+
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
+    @property
+    def _llm_type(self) -> str:
+        return f"managed-{self.inner._llm_type}"
+
+    @property
+    def _identifying_params(self) -> Dict[str, Any]:
+        return {**self.inner._identifying_params, "caller": self.caller}
+
+    @property
+    def model_name(self) -> str:
+        return getattr(self.inner, "model_name", None) or getattr(self.inner, "model", None) or "default"
+
+    def _client(self) -> LLMClient:
+        return self.client or default_client()
+
+    def _tokens(self, messages: List[BaseMessage], kwargs: Dict) -> int:
+        max_tokens = kwargs.get("max_tokens") or getattr(self.inner, "max_tokens", None)
+        return self._client().estimate_tokens(messages, max_tokens)
+
+    @staticmethod
+    def _request_kwargs(kwargs: Dict, deadline: Optional[float]) -> Dict:
+        """deadline 이 있으면 요청 timeout 을 남은 시간으로 맞춘다. (재시도마다 다시 계산)"""
+        if deadline is None:
+            return kwargs
+        return {**kwargs, "timeout": max(deadline - time.monotonic(), 0.001)}
+
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                  run_manager: Optional[CallbackManagerForLLMRun] = None, **kwargs: Any) -> ChatResult:
+        deadline = kwargs.pop("deadline", None)
+        return self._client().call(
+            self.model_name, self.caller, self._tokens(messages, kwargs),
+            lambda: self.inner._generate(messages, stop=stop, **self._request_kwargs(kwargs, deadline)),
+            deadline=deadline)
+
+    async def _agenerate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                         run_manager: Optional[AsyncCallbackManagerForLLMRun] = None, **kwargs: Any) -> ChatResult:
+        deadline = kwargs.pop("deadline", None)
+        return await self._client().acall(
+            self.model_name, self.caller, self._tokens(messages, kwargs),
+            lambda: self.inner._agenerate(messages, stop=stop, **self._request_kwargs(kwargs, deadline)),
+            deadline=deadline)
+
+    def _stream(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                run_manager: Optional[CallbackManagerForLLMRun] = None, **kwargs: Any) -> Iterator[ChatGenerationChunk]:
+        deadline = kwargs.pop("deadline", None)
+        yield from self._client().stream(
+            self.model_name, self.caller, self._tokens(messages, kwargs),
+            lambda: self.inner._stream(messages, stop=stop, **self._request_kwargs(kwargs, deadline)),
+            deadline=deadline)
+
+    async def _astream(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                       run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+                       **kwargs: Any) -> AsyncIterator[ChatGenerationChunk]:
+        deadline = kwargs.pop("deadline", None)
+        async for chunk in self._client().astream(
+                self.model_name, self.caller, self._tokens(messages, kwargs),
+                lambda: self.inner._astream(messages, stop=stop, **self._request_kwargs(kwargs, deadline)),
+                deadline=deadline):
+            yield chunk
+
+    def bind_tools(self, tools: Sequence[Any], **kwargs: Any) -> Runnable:
+        """inner 모델의 bind_tools 로 tool 정의를 변환하고, 그 인자를 이 wrapper 에 bind 한다."""
+        return self.bind(**self.inner.bind_tools(tools, **kwargs).kwargs)
+
+
+_default_client: Optional[LLMClient] = None
+_default_lock = threading.Lock()
+
+
+def default_client() -> LLMClient:
+    """프로세스 전체에서 공유하는 LLMClient"""
+    global _default_client
+    with _default_lock:
+        if _default_client is None:
+            _default_client = LLMClient()
+        return _default_client
+
+
+def get_chat_model(model: str, caller: str, client: Optional[LLMClient] = None, **kwargs: Any) -> ManagedChatModel:
+    """
+    ChatOpenAI 를 공용 클라이언트로 감싸서 반환한다.
+    재시도는 LLMClient 가 하므로 ChatOpenAI 자체 재시도(max_retries)는 끈다.
+    Args:
+        model (str): OpenAI 모델 이름
+        caller (str): 사용량 집계용 이름 (예: "news_summary")
+        kwargs: ChatOpenAI 에 그대로 전달 (temperature, api_key, base_url, max_tokens ...)
+    """
+    from langchain_openai import ChatOpenAI
+
+    kwargs.setdefault("max_retries", 0)
+    return ManagedChatModel(inner=ChatOpenAI(model=model, **kwargs), caller=caller, client=client)
@@ -0,0 +1,397 @@
+"""
+memory-mapped FAISS 인덱스 + SQLite docstore
+
+FAISS.load_local 은 .faiss 파일 전체를 메모리로 읽고, .pkl docstore 전체를 unpickle 한다.
+(pickle 이라 allow_dangerous_deserialization=True 도 필요)
+여기서는
+- 벡터 인덱스는 faiss.read_index 의 mmap 옵션으로 열어서, 필요한 페이지만 OS page cache 로 올리고
+  여러 worker 프로세스가 같은 page cache 를 공유하게 하고
+- 문서/메타데이터는 SQLite 에 저장해두고, 검색 결과로 나온 ID 의 문서만 그때그때 읽는다.
+그래서 코퍼스가 커져도 시작 시간이 거의 일정하다.
+
+파일 구성
+- {folder}/{index_name}.versions/{version}/index.faiss     : faiss.write_index 결과 (LangChain save_local 과 동일한 포맷)
+- {folder}/{index_name}.versions/{version}/docs.sqlite3    : 문서 / 인덱스 위치 -> 문서 ID 매핑
+- {folder}/{index_name}.current                            : 현재 버전 이름
+저장할 때마다 새 버전 폴더에 두 파일을 모두 쓴 뒤 .current 를 한 번에 교체하므로,
+읽는 쪽은 항상 같은 버전의 인덱스 / docstore 쌍을 연다. (.current 가 없으면 이전 포맷 {index_name}.faiss / .docs.sqlite3)
+docstore 에는 인덱스보다 문서가 더 있을 수 있다. (추가 중인 문서. 인덱스 위치 < ntotal 인 문서만 검색된다)
+
+수정용으로 열면(load_mmap_store(mmap=False) / create_mmap_store) 새 버전 폴더의 docstore 파일에 문서를 바로 쓰고,
+save_mmap_store 는 인덱스 파일만 쓴 뒤 그 버전을 .current 로 교체한다. (저장할 때마다 docstore 전체를 다시 쓰지 않음)
+
+기존 pickle 인덱스 변환 (1회):
+    python -m rag_common.mmap_store migrate ./db faiss_index
+"""
+import argparse
+import json
+import os
+import shutil
+import sqlite3
+import threading
+import time
+from collections.abc import MutableMapping
+from typing import Dict, Iterator, List, Optional, Union
+
+import faiss
+from langchain_community.docstore.base import AddableMixin, Docstore
+from langchain_community.vectorstores import FAISS
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+
+DOCSTORE_SUFFIX = ".docs.sqlite3"
+VERSIONS_SUFFIX = ".versions"
+CURRENT_SUFFIX = ".current"
+STALE_VERSION_SECONDS = 24 * 3600  # 수정용으로 열었다가 저장하지 않은 버전 폴더를 지우는 기준
+# faiss 1.11 부터 IndexFlat 계열도 zero-copy mmap 을 지원한다. 그 이전 버전은 IVF inverted list 만 mmap 된다.
+MMAP_FLAGS = getattr(faiss, "IO_FLAG_MMAP_IFC", 0) | faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS documents (
+    doc_id TEXT PRIMARY KEY,
+    page_content TEXT NOT NULL,
+    metadata TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS positions (
+    position INTEGER PRIMARY KEY,
+    doc_id TEXT NOT NULL
+);
+"""
+
+
+def _connect(path: str, read_only: bool) -> sqlite3.Connection:
+    if read_only:
+        conn = sqlite3.connect(f"file:{os.path.abspath(path)}?mode=ro", uri=True, check_same_thread=False)
+    else:
+        conn = sqlite3.connect(path, check_same_thread=False)
+        conn.executescript(_SCHEMA)
+    return conn
+
+
+class SQLiteDocstore(Docstore, AddableMixin):
+    """문서 ID 로 필요한 문서만 읽어오는 SQLite docstore"""
+
+    def __init__(self, conn: sqlite3.Connection, lock: Optional[threading.Lock] = None, path: Optional[str] = None):
+        self._conn = conn
+        self._lock = lock or threading.Lock()
+        self.path = path  # 수정용으로 연 버전 폴더의 docstore 파일 (save_mmap_store 에서 사용)
+
+    def search(self, search: str) -> Union[str, Document]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT page_content, metadata FROM documents WHERE doc_id = ?", (search,)
+            ).fetchone()
+        if row is None:
+            return f"ID {search} not found."
+        return Document(id=search, page_content=row[0], metadata=json.loads(row[1]))
+
+    def add(self, texts: Dict[str, Document]) -> None:
+        rows = [(doc_id, doc.page_content, json.dumps(doc.metadata, ensure_ascii=False, default=str))
+                for doc_id, doc in texts.items()]
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO documents (doc_id, page_content, metadata) VALUES (?, ?, ?)", rows
+            )
+            self._conn.commit()
+
+    def delete(self, ids: List) -> None:
+        with self._lock:
+            self._conn.executemany("DELETE FROM documents WHERE doc_id = ?", [(doc_id,) for doc_id in ids])
+            self._conn.commit()
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM documents").fetchone()[0]
+
+
+class SQLiteIndexToDocstoreId(MutableMapping):
+    """
+    FAISS 의 index_to_docstore_id(dict) 대신 사용하는 lazy mapping.
+    검색 결과로 나온 위치만 조회하므로 전체 매핑을 메모리에 올리지 않는다.
+    """
+
+    def __init__(self, conn: sqlite3.Connection, lock: Optional[threading.Lock] = None):
+        self._conn = conn
+        self._lock = lock or threading.Lock()
+
+    def __getitem__(self, position: int) -> str:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT doc_id FROM positions WHERE position = ?", (int(position),)
+            ).fetchone()
+        if row is None:
+            raise KeyError(position)
+        return row[0]
+
+    def __setitem__(self, position: int, doc_id: str):
+        self.update({position: doc_id})
+
+    def __delitem__(self, position: int):
+        with self._lock:
+            self._conn.execute("DELETE FROM positions WHERE position = ?", (int(position),))
+            self._conn.commit()
+
+    def __iter__(self) -> Iterator[int]:
+        return iter(self.keys())
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM positions").fetchone()[0]
+
+    def update(self, other=(), **kwargs):
+        items = dict(other, **kwargs)
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO positions (position, doc_id) VALUES (?, ?)",
+                [(int(position), doc_id) for position, doc_id in items.items()],
+            )
+            self._conn.commit()
+
+    def replace(self, mapping: Dict[int, str]):
+        """전체 매핑을 한 번에 교체한다. (삭제 후 위치 번호를 다시 매길 때)"""
+        with self._lock:
+            self._conn.execute("DELETE FROM positions")
+            self._conn.executemany(
+                "INSERT INTO positions (position, doc_id) VALUES (?, ?)",
+                [(int(position), doc_id) for position, doc_id in mapping.items()],
+            )
+            self._conn.commit()
+
+    # 전체 조회가 필요한 경우(FAISS.delete 등)는 쿼리 1번으로 처리
+    def keys(self) -> List[int]:
+        with self._lock:
+            return [row[0] for row in self._conn.execute("SELECT position FROM positions ORDER BY position")]
+
+    def values(self) -> List[str]:
+        return [doc_id for _, doc_id in self.items()]
+
+    def items(self) -> List[tuple]:
+        with self._lock:
+            return list(self._conn.execute("SELECT position, doc_id FROM positions ORDER BY position"))
+
+
+def _legacy_files(folder_path: str, index_name: str):
+    return (os.path.join(folder_path, f"{index_name}.faiss"),
+            os.path.join(folder_path, f"{index_name}{DOCSTORE_SUFFIX}"))
+
+
+def current_version(folder_path: str, index_name: str) -> Optional[str]:
+    """현재 버전 이름. 이전 포맷이거나 저장된 적이 없으면 None"""
+    try:
+        with open(os.path.join(folder_path, f"{index_name}{CURRENT_SUFFIX}"), encoding="utf-8") as f:
+            return f.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+
+def version_files(folder_path: str, index_name: str, version: str):
+    """버전 폴더 안의 (인덱스 파일 경로, docstore 파일 경로)"""
+    version_dir = os.path.join(folder_path, f"{index_name}{VERSIONS_SUFFIX}", version)
+    return os.path.join(version_dir, "index.faiss"), os.path.join(version_dir, "docs.sqlite3")
+
+
+def store_files(folder_path: str, index_name: str):
+    """현재 버전의 (인덱스 파일 경로, docstore 파일 경로)"""
+    version = current_version(folder_path, index_name)
+    if version is None:
+        return _legacy_files(folder_path, index_name)
+    return version_files(folder_path, index_name, version)
+
+
+def exists(folder_path: str, index_name: str = "index") -> bool:
+    return all(os.path.exists(path) for path in store_files(folder_path, index_name))
+
+
+def new_version(folder_path: str, index_name: str) -> str:
+    """빈 버전 폴더를 만든다. publish_version 전에는 읽는 쪽에 보이지 않는다."""
+    versions_dir = os.path.join(folder_path, f"{index_name}{VERSIONS_SUFFIX}")
+    if os.path.isdir(versions_dir):
+        # 수정용으로 열었다가 저장하지 않고 끝난 버전 폴더 정리
+        current = current_version(folder_path, index_name)
+        for name in os.listdir(versions_dir):
+            path = os.path.join(versions_dir, name)
+            if name != current and time.time() - os.path.getmtime(path) > STALE_VERSION_SECONDS:
+                shutil.rmtree(path, ignore_errors=True)
+    version = f"{time.time_ns():x}"
+    os.makedirs(os.path.dirname(version_files(folder_path, index_name, version)[0]), exist_ok=True)
+    return version
+
+
+def publish_version(folder_path: str, index_name: str, version: str):
+    """.current 를 version 으로 교체하고, 오래된 버전과 이전 포맷 파일을 정리한다."""
+    previous = current_version(folder_path, index_name)
+    pointer = os.path.join(folder_path, f"{index_name}{CURRENT_SUFFIX}")
+    with open(f"{pointer}.tmp", "w", encoding="utf-8") as f:
+        f.write(version)
+    os.replace(f"{pointer}.tmp", pointer)
+
+    # 현재 버전과 직전 버전(교체 직전에 .current 를 읽은 프로세스가 열 수 있음)만 남긴다.
+    # 이미 열려있는 파일은 삭제해도 그 프로세스에서는 계속 읽을 수 있다.
+    versions_dir = os.path.join(folder_path, f"{index_name}{VERSIONS_SUFFIX}")
+    for name in os.listdir(versions_dir):
+        if name not in (version, previous):
+            shutil.rmtree(os.path.join(versions_dir, name), ignore_errors=True)
+    for path in _legacy_files(folder_path, index_name):
+        if os.path.exists(path):
+            os.remove(path)
+
+
+def save_mmap_store(vectorstore: FAISS, folder_path: str, index_name: str = "index"):
+    """
+    FAISS vectorstore 를 mmap 용 포맷으로 저장합니다.
+    새 버전 폴더에 인덱스와 docstore 를 모두 쓴 뒤 .current 를 교체하므로,
+    이전 파일을 열고 있는 프로세스와 저장 도중에 여는 프로세스 모두 같은 버전의 파일 쌍을 봅니다.
+    """
+    version = _writable_version(vectorstore, folder_path, index_name)
+    if version is not None:
+        # 문서는 이미 이 버전의 docstore 에 들어있으므로 인덱스만 쓴다.
+        # docstore 가 인덱스보다 먼저 쓰이므로, 이미 교체된 버전이라도 읽는 쪽은 항상 맞는 쌍을 본다.
+        index_path = version_files(folder_path, index_name, version)[0]
+        faiss.write_index(vectorstore.index, f"{index_path}.tmp")
+        os.replace(f"{index_path}.tmp", index_path)
+        if current_version(folder_path, index_name) != version:
+            publish_version(folder_path, index_name, version)
+        return
+
+    version = new_version(folder_path, index_name)
+    index_path, docstore_path = version_files(folder_path, index_name, version)
+
+    faiss.write_index(vectorstore.index, index_path)
+    if isinstance(vectorstore.docstore, SQLiteDocstore) and \
+            isinstance(vectorstore.index_to_docstore_id, SQLiteIndexToDocstoreId):
+        # SQLite 끼리는 backup API 로 통째로 복사
+        target = sqlite3.connect(docstore_path)
+        with vectorstore.docstore._lock:
+            vectorstore.docstore._conn.backup(target)
+        target.close()
+    else:
+        conn = _connect(docstore_path, read_only=False)
+        docstore = SQLiteDocstore(conn)
+        mapping = SQLiteIndexToDocstoreId(conn)
+        items = sorted(vectorstore.index_to_docstore_id.items())
+        mapping.update(dict(items))
+        documents = {}
+        for _, doc_id in items:
+            doc = vectorstore.docstore.search(doc_id)
+            if isinstance(doc, Document):
+                documents[doc_id] = doc
+            if len(documents) >= 1000:
+                docstore.add(documents)
+                documents = {}
+        docstore.add(documents)
+        conn.close()
+    publish_version(folder_path, index_name, version)
+
+
+def delete_documents(vectorstore: FAISS, ids: List[str]):
+    """
+    문서를 삭제한다. FAISS.delete 는 index_to_docstore_id 를 dict 로 바꾸므로,
+    SQLite 매핑이면 다시 매긴 위치 번호를 디스크에 쓰고 SQLite 매핑을 계속 사용한다.
+    """
+    mapping = vectorstore.index_to_docstore_id
+    vectorstore.delete(ids)
+    if isinstance(mapping, SQLiteIndexToDocstoreId):
+        mapping.replace(vectorstore.index_to_docstore_id)
+        vectorstore.index_to_docstore_id = mapping
+
+
+def _writable_version(vectorstore: FAISS, folder_path: str, index_name: str) -> Optional[str]:
+    """vectorstore 가 folder_path / index_name 의 버전 폴더에서 수정용으로 열린 경우 그 버전"""
+    docstore = vectorstore.docstore
+    if not (isinstance(docstore, SQLiteDocstore) and docstore.path
+            and isinstance(vectorstore.index_to_docstore_id, SQLiteIndexToDocstoreId)):
+        return None
+    version = os.path.basename(os.path.dirname(docstore.path))
+    if os.path.abspath(version_files(folder_path, index_name, version)[1]) != os.path.abspath(docstore.path):
+        return None
+    return version
+
+
+def _open_writable(folder_path: str, index_name: str, version: str, embeddings: Embeddings, index: faiss.Index,
+                   **kwargs) -> FAISS:
+    docstore_path = version_files(folder_path, index_name, version)[1]
+    conn = _connect(docstore_path, read_only=False)
+    # 저장 전에 중단된 경우 인덱스에 없는 위치가 남아있을 수 있다. (남겨두면 다음 위치 번호가 어긋난다)
+    conn.execute("DELETE FROM positions WHERE position >= ?", (index.ntotal,))
+    conn.execute("DELETE FROM documents WHERE doc_id NOT IN (SELECT doc_id FROM positions)")
+    conn.commit()
+    check_store(index, conn)
+    lock = threading.Lock()
+    return FAISS(embeddings, index, SQLiteDocstore(conn, lock, docstore_path), SQLiteIndexToDocstoreId(conn, lock),
+                 **kwargs)
+
+
+def create_mmap_store(folder_path: str, embeddings: Embeddings, index: faiss.Index, index_name: str = "index",
+                      **kwargs) -> FAISS:
+    """빈 인덱스로 수정용 vectorstore 를 만든다. 추가한 문서는 디스크에 바로 쓰고, save_mmap_store 로 공개한다."""
+    return _open_writable(folder_path, index_name, new_version(folder_path, index_name), embeddings, index, **kwargs)
+
+
+def check_store(index: faiss.Index, conn: sqlite3.Connection):
+    """인덱스의 모든 위치(0 ~ ntotal-1)에 docstore 문서 ID 가 있는지 확인한다."""
+    (mapped,) = conn.execute("SELECT COUNT(*) FROM positions WHERE position < ?", (index.ntotal,)).fetchone()
+    if mapped != index.ntotal:
+        raise ValueError(f"인덱스와 docstore 가 맞지 않습니다: ntotal={index.ntotal}, 문서 ID 매핑={mapped}")
+
+
+def load_mmap_store(
+        folder_path: str,
+        embeddings: Embeddings,
+        index_name: str = "index",
+        mmap: bool = True,
+        **kwargs,
+) -> FAISS:
+    """
+    mmap 포맷으로 저장된 인덱스를 엽니다. pickle 을 사용하지 않습니다.
+
+    Args:
+        folder_path (str): 저장 폴더
+        embeddings (Embeddings): 질문 임베딩에 사용할 객체
+        index_name (str): 인덱스 이름
+        mmap (bool): True 면 읽기 전용(mmap)으로 열고,
+            False 면 docstore 를 새 버전 폴더로 복사하고 인덱스를 메모리로 읽어서 문서 추가가 가능하게 연다.
+            추가한 문서는 복사한 docstore 에 바로 쓰고, save_mmap_store 로 인덱스를 저장하면 공개된다.
+        **kwargs: FAISS 생성자에 넘길 추가 인자
+
+    Returns:
+        FAISS: as_retriever() 등 기존 사용법 그대로 쓸 수 있는 vectorstore
+    """
+    # .current 를 한 번만 읽어서 같은 버전의 인덱스 / docstore 를 연다.
+    index_path, docstore_path = store_files(folder_path, index_name)
+    if not mmap:
+        # 수정용으로 열 때는 원본 파일을 건드리지 않도록 새 버전 폴더에 docstore 를 복사한다.
+        index = faiss.read_index(index_path)
+        version = new_version(folder_path, index_name)
+        disk = _connect(docstore_path, read_only=True)
+        target = sqlite3.connect(version_files(folder_path, index_name, version)[1])
+        disk.backup(target)
+        target.close()
+        disk.close()
+        return _open_writable(folder_path, index_name, version, embeddings, index, **kwargs)
+
+    index = faiss.read_index(index_path, MMAP_FLAGS)
+    conn = _connect(docstore_path, read_only=True)
+    check_store(index, conn)
+    lock = threading.Lock()
+    return FAISS(embeddings, index, SQLiteDocstore(conn, lock), SQLiteIndexToDocstoreId(conn, lock), **kwargs)
+
+
+def migrate_pickle_store(folder_path: str, index_name: str = "index"):
+    """
+    기존 LangChain save_local(pickle) 인덱스를 mmap 포맷으로 변환합니다.
+    직접 만든 인덱스 파일에 대해서만 1회 실행해야 합니다. (pickle 로드)
+    """
+    legacy = FAISS.load_local(folder_path=folder_path, embeddings=None, index_name=index_name,
+                              allow_dangerous_deserialization=True)
+    save_mmap_store(legacy, folder_path, index_name)
+    print(f"변환 완료: {len(legacy.index_to_docstore_id)}건 -> {store_files(folder_path, index_name)[1]}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    migrate = subparsers.add_parser("migrate", help="pickle 인덱스를 mmap 포맷으로 변환")
+    migrate.add_argument("folder_path")
+    migrate.add_argument("index_name", nargs="?", default="index")
+    args = parser.parse_args()
+    migrate_pickle_store(args.folder_path, args.index_name)
@@ -0,0 +1,94 @@
+"""
+batch / 병렬 요청을 지원하는 Ollama 임베딩 클라이언트
+
+langchain_community 의 OllamaEmbeddings 는 /api/embeddings 로 chunk 1개씩 요청을 보낸다.
+여기서는 /api/embed 의 batch 입력(input: [...])을 사용하고, 여러 batch 를 동시에 요청한다.
+결과 순서는 입력 순서와 항상 같다.
+
+주의: /api/embed 는 L2 정규화된 벡터를 반환하므로, /api/embeddings 로 만든 기존 인덱스와 섞어 쓰지 않는다.
+(임베딩 캐시 namespace 도 클래스 이름으로 분리된다)
+"""
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional
+
+import requests
+from langchain_core.embeddings import Embeddings
+from requests.adapters import HTTPAdapter
+
+DEFAULT_BASE_URL = os.environ.get("OLLAMA_HOST", "http://localhost:11434")
+
+
+class BatchedOllamaEmbeddings(Embeddings):
+    """Ollama /api/embed batch 임베딩"""
+
+    def __init__(
+            self,
+            model: str,
+            base_url: str = DEFAULT_BASE_URL,
+            batch_size: int = 32,
+            max_in_flight: int = 4,
+            timeout: float = 120.0,
+            max_retries: int = 2,
+            keep_alive: Optional[str] = "10m",
+    ):
+        """
+        Args:
+            model (str): Ollama 모델 이름
+            base_url (str): Ollama 서버 주소 (기본값: OLLAMA_HOST 환경변수)
+            batch_size (int): 요청 1번에 보낼 텍스트 수
+            max_in_flight (int): 동시에 보낼 요청 수 (Ollama 의 OLLAMA_NUM_PARALLEL 과 맞추는 것을 권장)
+            timeout (float): 요청 timeout (초)
+            max_retries (int): 연결 오류 / 5xx 응답 시 재시도 횟수
+            keep_alive (Optional[str]): 모델을 메모리에 유지할 시간
+        """
+        if not base_url.startswith("http"):
+            base_url = f"http://{base_url}"
+        self.model = model
+        self.base_url = base_url.rstrip("/")
+        self.batch_size = batch_size
+        self.max_in_flight = max_in_flight
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.keep_alive = keep_alive
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_maxsize=max_in_flight)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def _embed_batch(self, texts: List[str]) -> List[List[float]]:
+        payload = {"model": self.model, "input": texts, "truncate": True}
+        if self.keep_alive is not None:
+            payload["keep_alive"] = self.keep_alive
+        for attempt in range(self.max_retries + 1):
+            try:
+                response = self.session.post(f"{self.base_url}/api/embed", json=payload, timeout=self.timeout)
+                if response.status_code < 500:
+                    response.raise_for_status()
+                    embeddings = response.json()["embeddings"]
+                    if len(embeddings) != len(texts):
+                        raise ValueError(f"요청한 텍스트 수({len(texts)})와 임베딩 수({len(embeddings)})가 다릅니다.")
+                    return embeddings
+                error = requests.HTTPError(f"{response.status_code} {response.text[:200]}", response=response)
+            except requests.ConnectionError as e:
+                error = e
+            if attempt < self.max_retries:
+                time.sleep(0.5 * 2 ** attempt)
+        raise error
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        if not texts:
+            return []
+        batches = [texts[i:i + self.batch_size] for i in range(0, len(texts), self.batch_size)]
+        if len(batches) == 1 or self.max_in_flight <= 1:
+            results = [self._embed_batch(batch) for batch in batches]
+        else:
+            # executor.map 은 입력 순서대로 결과를 돌려주므로 순서가 유지된다.
+            with ThreadPoolExecutor(max_workers=min(self.max_in_flight, len(batches))) as executor:
+                results = list(executor.map(self._embed_batch, batches))
+        return [vector for batch in results for vector in batch]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._embed_batch([text])[0]
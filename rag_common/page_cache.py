@@ -0,0 +1,248 @@
+"""
+PDF 페이지 단위 파싱 결과 캐시
+
+같은 PDF(또는 한 페이지만 바뀐 PDF)를 다시 변환할 때 OCR / marker 변환을 처음부터 다시 하지 않도록,
+페이지별 결과(텍스트 / markdown, 추출한 이미지)를 디스크에 저장한다.
+- key: (페이지 hash, 파서 이름, 파서 버전). 문서 hash 와 페이지 번호는 어디서 나온 결과인지 기록용으로 같이 저장한다.
+  문서 hash 를 key 에 넣지 않으므로, 문서의 다른 페이지가 바뀌어도 바뀌지 않은 페이지는 그대로 재사용된다.
+- 페이지 hash: 페이지 content stream + 페이지가 (재귀적으로) 참조하는 모든 객체 (Form XObject / 이미지 / 폰트 /
+  annotation appearance stream 등) + 페이지 크기 / 회전. 객체 번호는 hash 에서 빼므로 다른 문서의 같은 페이지도 같은 값
+  stream 은 압축을 푼 내용으로 hash 하므로 다시 압축해서 저장한 문서(garbage / deflate)도 같은 값
+- 텍스트와 메타데이터는 SQLite, 이미지는 {cache_dir}/images/ 아래 파일로 저장
+- 전체 크기(max_bytes)를 넘으면 가장 오래 사용하지 않은 페이지부터 삭제 (LRU)
+
+사용법:
+    cache = PageCache()
+    hashes = page_hashes("catalog.pdf")
+    cached = cache.get(hashes[3], parser="marker", version="1.6.2")
+    if cached is None:
+        cache.put(hashes[3], "marker", "1.6.2", text=markdown, images={"_page_3_Picture_1.jpeg": image_bytes})
+"""
+import hashlib
+import io
+import json
+import os
+import re
+import shutil
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Union
+
+import pymupdf
+
+from rag_common.embedding_cache import ROOT_DIR, CacheStats
+
+DEFAULT_CACHE_DIR = os.environ.get("PAGE_CACHE_DIR", os.path.join(ROOT_DIR, ".cache", "page_cache"))
+DEFAULT_MAX_BYTES = int(os.environ.get("PAGE_CACHE_MAX_BYTES", str(2 * 1024 ** 3)))
+
+
+_REFERENCE_PATTERN = re.compile(r"(\d+) 0 R")
+# 페이지 트리 / 다른 페이지로 올라가는 참조는 따라가지 않는다. (페이지 내용과 무관하고, 문서 전체를 읽게 된다)
+_PARENT_PATTERN = re.compile(r"/(Parent|P) \d+ 0 R")
+# stream 압축 방식 / 압축된 길이는 다시 저장할 때(garbage / deflate 등) 바뀌므로 빼고, stream 은 압축을 푼 내용으로 hash 한다.
+_STREAM_ENCODING_PATTERN = re.compile(
+    r"/Length\s*\d+(\s+\d+\s+R)?"
+    r"|/Filter\s*(/[^\s/\[\]<>()]+|\[[^\]]*\])"
+    r"|/DecodeParms\s*(<<[^>]*>>|\[[^\]]*\]|\d+\s+\d+\s+R|null)"
+)
+
+
+def _object_digest(document: "pymupdf.Document", xref: int, object_digests: Dict[int, bytes], stack: set) -> bytes:
+    """
+    xref 객체의 digest. 객체 번호 대신 참조하는 객체의 digest 를 넣으므로,
+    내용이 같은 객체는 번호가 달라도(다른 문서, garbage 로 중복 제거 / 번호 재배치) 같은 값이다.
+    """
+    if xref in object_digests:
+        return object_digests[xref]
+    if xref in stack:
+        return b"@cycle;"  # 순환 참조
+    if document.xref_get_key(xref, "Type") == ("name", "/Page"):
+        return b"@page;"  # link annotation 등이 가리키는 다른 페이지
+    stack.add(xref)
+    digest = hashlib.sha256()
+    source = document.xref_object(xref, compressed=True)
+    is_stream = document.xref_is_stream(xref)
+    if is_stream:
+        source = _STREAM_ENCODING_PATTERN.sub("", source)
+    _hash_value(document, "stream" if is_stream else "dict", source, digest, object_digests, stack)
+    if is_stream:
+        digest.update(hashlib.sha256(document.xref_stream(xref) or b"").digest())
+    stack.discard(xref)
+    object_digests[xref] = digest.digest()
+    return object_digests[xref]
+
+
+def _hash_value(document: "pymupdf.Document", kind: str, value: str, digest, object_digests: Dict[int, bytes],
+                stack: set):
+    """xref_get_key 결과 (kind, value) 를 digest 에 넣는다."""
+    if kind == "xref":
+        digest.update(_object_digest(document, int(value.split()[0]), object_digests, stack))
+        return
+    value = _PARENT_PATTERN.sub("", value)
+    digest.update(f"{kind}:{_REFERENCE_PATTERN.sub('R', value)};".encode("utf-8"))
+    for reference in _REFERENCE_PATTERN.findall(value):
+        digest.update(_object_digest(document, int(reference), object_digests, stack))
+
+
+def page_hash(page: "pymupdf.Page", object_digests: Optional[Dict[int, bytes]] = None) -> str:
+    """
+    페이지 내용이 같으면 같은 값. (다른 문서에 들어있는 같은 페이지도 같은 값)
+    Args:
+        object_digests: 같은 문서의 여러 페이지를 hash 할 때 공유하면 폰트 / 이미지 등 공통 객체를 한 번만 읽는다.
+    """
+    digest = hashlib.sha256()
+    digest.update(f"{tuple(page.rect)}:{page.rotation};".encode("utf-8"))
+    digest.update(page.read_contents())
+    document = page.parent
+    object_digests = {} if object_digests is None else object_digests
+    stack = {page.xref}
+    # 페이지 객체 자체는 key 순서가 문서마다 다를 수 있어서, 내용에 영향을 주는 항목만 따라간다.
+    # Resources 가 없으면 상위 페이지 트리에서 상속받은 Resources 를 사용한다.
+    node = page.xref
+    resources = document.xref_get_key(node, "Resources")
+    while resources[0] == "null":
+        kind, value = document.xref_get_key(node, "Parent")
+        if kind != "xref":
+            break
+        node = int(value.split()[0])
+        resources = document.xref_get_key(node, "Resources")
+    for kind, value in (resources, document.xref_get_key(page.xref, "Annots")):
+        _hash_value(document, kind, value, digest, object_digests, stack)
+    return digest.hexdigest()
+
+
+def page_hashes(pdf_path: str) -> List[str]:
+    with pymupdf.open(pdf_path) as pdf:
+        object_digests: Dict[int, bytes] = {}
+        return [page_hash(page, object_digests) for page in pdf]
+
+
+@dataclass
+class CachedPage:
+    text: str
+    images: Dict[str, str] = field(default_factory=dict)  # 이미지 이름 -> 캐시 파일 경로
+    metadata: Dict = field(default_factory=dict)
+
+
+class PageCache:
+    """SQLite + 파일 기반 페이지 파싱 결과 캐시"""
+
+    def __init__(self, cache_dir: str = DEFAULT_CACHE_DIR, max_bytes: int = DEFAULT_MAX_BYTES):
+        """
+        Args:
+            cache_dir (str): 캐시 폴더
+            max_bytes (int): 텍스트 + 이미지 전체 최대 크기. 초과 시 가장 오래 사용하지 않은 페이지부터 삭제
+        """
+        os.makedirs(os.path.join(cache_dir, "images"), exist_ok=True)
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.stats = CacheStats()
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(os.path.join(cache_dir, "pages.sqlite3"), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS pages (
+                page_hash TEXT NOT NULL,
+                parser TEXT NOT NULL,
+                version TEXT NOT NULL,
+                doc_hash TEXT NOT NULL,
+                page_number INTEGER NOT NULL,
+                text TEXT NOT NULL,
+                metadata TEXT NOT NULL,
+                images TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                last_used REAL NOT NULL,
+                PRIMARY KEY (page_hash, parser, version)
+            ) WITHOUT ROWID
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_pages_lru ON pages (last_used)")
+        self._conn.commit()
+
+    def _image_dir(self, page_hash: str, parser: str, version: str) -> str:
+        key = hashlib.sha1(f"{page_hash}:{parser}:{version}".encode("utf-8")).hexdigest()
+        return os.path.join(self.cache_dir, "images", key[:2], key)
+
+    def get(self, page_hash: str, parser: str, version: str) -> Optional[CachedPage]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT text, metadata, images FROM pages WHERE page_hash = ? AND parser = ? AND version = ?",
+                (page_hash, parser, version),
+            ).fetchone()
+            if row is None:
+                self.stats.misses += 1
+                return None
+            self._conn.execute(
+                "UPDATE pages SET last_used = ? WHERE page_hash = ? AND parser = ? AND version = ?",
+                (time.time(), page_hash, parser, version),
+            )
+            self._conn.commit()
+            self.stats.hits += 1
+        text, metadata, image_names = row
+        image_dir = self._image_dir(page_hash, parser, version)
+        return CachedPage(text=text, metadata=json.loads(metadata),
+                          images={name: os.path.join(image_dir, name) for name in json.loads(image_names)})
+
+    def put(self, page_hash: str, parser: str, version: str, text: str,
+            images: Optional[Dict[str, Union[bytes, "PIL.Image.Image"]]] = None, metadata: Optional[Dict] = None,
+            doc_hash: str = "", page_number: int = -1):
+        """
+        페이지 결과를 저장한다.
+        Args:
+            images: 이미지 이름 -> bytes 또는 PIL 이미지 (이름의 확장자로 형식 결정)
+        """
+        image_dir = self._image_dir(page_hash, parser, version)
+        size = len(text.encode("utf-8"))
+        if images:
+            os.makedirs(image_dir, exist_ok=True)
+            for name, image in images.items():
+                path = os.path.join(image_dir, name)
+                if isinstance(image, bytes):
+                    data = image
+                else:
+                    buffer = io.BytesIO()
+                    image.save(buffer, format=image.format or _image_format(name))
+                    data = buffer.getvalue()
+                with open(path, "wb") as f:
+                    f.write(data)
+                size += len(data)
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO pages (page_hash, parser, version, doc_hash, page_number, text, metadata, "
+                "images, size, last_used) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (page_hash, parser, version, doc_hash, page_number, text,
+                 json.dumps(metadata or {}, ensure_ascii=False), json.dumps(list(images or {})), size, time.time()),
+            )
+            self._evict()
+            self._conn.commit()
+
+    def _evict(self):
+        (total,) = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM pages").fetchone()
+        if total <= self.max_bytes:
+            return
+        # 매번 조금씩 지우지 않도록 최대 크기의 90% 까지 줄인다.
+        target = self.max_bytes * 0.9
+        rows = self._conn.execute("SELECT page_hash, parser, version, size FROM pages ORDER BY last_used").fetchall()
+        for page_hash, parser, version, size in rows:
+            if total <= target:
+                break
+            self._conn.execute("DELETE FROM pages WHERE page_hash = ? AND parser = ? AND version = ?",
+                               (page_hash, parser, version))
+            shutil.rmtree(self._image_dir(page_hash, parser, version), ignore_errors=True)
+            total -= size
+            self.stats.evictions += 1
+
+    def total_bytes(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM pages").fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+def _image_format(name: str) -> str:
+    extension = os.path.splitext(name)[1].lower().lstrip(".")
+    return {"jpg": "JPEG", "jpeg": "JPEG", "png": "PNG", "webp": "WEBP"}.get(extension, "PNG")
@@ -0,0 +1,203 @@
+"""
+스트리밍 파이프라인
+
+generator 단계들을 bounded queue 로 연결해서 thread 로 실행한다.
+- 각 단계의 queue 크기가 제한되어 있어서, 뒷단계가 느리면 앞단계가 자동으로 대기한다. (backpressure)
+- 처리 중인 데이터는 queue 크기만큼만 메모리에 있으므로 전체 문서 수와 상관없이 메모리가 일정하다.
+- 단계별 처리량(items/s)과 busy 시간을 집계한다.
+
+단계 종류
+- item 모드   : fn(item) -> 0개 이상의 결과를 yield. workers 개수만큼 병렬 실행 (네트워크 요청 등)
+- stream 모드 : fn(iterator) -> 결과를 yield. 1개 thread 로 실행 (batch 묶기, 순서가 중요한 저장 등)
+"""
+import queue
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Callable, Iterable, Iterator, List, Optional
+
+_DONE = object()
+
+
+@dataclass
+class Stage:
+    """파이프라인 단계"""
+    name: str
+    fn: Callable
+    workers: int = 1
+    stream: bool = False
+    queue_size: int = 64  # 이 단계로 들어오는 queue 크기
+
+    def __post_init__(self):
+        if self.stream and self.workers != 1:
+            raise ValueError(f"stream 모드 단계는 worker 1개만 사용할 수 있습니다: {self.name}")
+
+
+@dataclass
+class StageStats:
+    name: str
+    items_in: int = 0
+    items_out: int = 0
+    busy_seconds: float = 0.0
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+    def add(self, items_in: int = 0, items_out: int = 0, busy_seconds: float = 0.0):
+        with self._lock:
+            self.items_in += items_in
+            self.items_out += items_out
+            self.busy_seconds += busy_seconds
+
+    def line(self, elapsed: float) -> str:
+        rate = self.items_in / elapsed if elapsed else 0.0
+        return (f"{self.name:<12} in={self.items_in:<8} out={self.items_out:<8} "
+                f"{rate:8.1f} items/s  busy={self.busy_seconds:7.1f}s")
+
+
+class StreamPipeline:
+    """bounded queue 로 연결된 thread 파이프라인"""
+
+    def __init__(self, source: Iterable, stages: List[Stage], report_every: Optional[float] = 10.0):
+        """
+        Args:
+            source (Iterable): 첫 단계에 들어갈 입력 (generator 권장)
+            stages (List[Stage]): 순서대로 실행할 단계
+            report_every (Optional[float]): 진행 상황 출력 주기(초). None 이면 출력하지 않음
+        """
+        self.source = source
+        self.stages = stages
+        self.report_every = report_every
+        self.stats = [StageStats(stage.name) for stage in stages]
+        self.errors: List[BaseException] = []
+        self._stop = threading.Event()
+        self._started_at = 0.0
+
+    # ---------- queue helpers ----------
+
+    def _put(self, q: queue.Queue, item) -> bool:
+        while not self._stop.is_set():
+            try:
+                q.put(item, timeout=0.5)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _iter_queue(self, q: queue.Queue) -> Iterator:
+        while not self._stop.is_set():
+            try:
+                item = q.get(timeout=0.5)
+            except queue.Empty:
+                continue
+            if item is _DONE:
+                return
+            yield item
+
+    def _fail(self, error: BaseException):
+        self.errors.append(error)
+        self._stop.set()
+
+    # ---------- workers ----------
+
+    def _feed(self, out_q: queue.Queue):
+        try:
+            for item in self.source:
+                if not self._put(out_q, item):
+                    return
+        except BaseException as e:
+            self._fail(e)
+        finally:
+            self._put(out_q, _DONE)
+
+    def _run_item_worker(self, index: int, in_q: queue.Queue, out_q: Optional[queue.Queue], finished: List[int],
+                         lock: threading.Lock):
+        stage, stats = self.stages[index], self.stats[index]
+        try:
+            for item in self._iter_queue(in_q):
+                start = time.perf_counter()
+                outputs = 0
+                for output in stage.fn(item) or ():
+                    outputs += 1
+                    if out_q is not None and not self._put(out_q, output):
+                        return
+                stats.add(items_in=1, items_out=outputs, busy_seconds=time.perf_counter() - start)
+        except BaseException as e:
+            self._fail(e)
+        finally:
+            # 다른 worker 도 끝낼 수 있도록 종료 신호를 다시 넣어두고, 마지막 worker 가 다음 단계에 종료를 알린다.
+            self._put(in_q, _DONE)
+            with lock:
+                finished[0] += 1
+                is_last = finished[0] == stage.workers
+            if is_last and out_q is not None:
+                self._put(out_q, _DONE)
+
+    def _run_stream_worker(self, index: int, in_q: queue.Queue, out_q: Optional[queue.Queue]):
+        stage, stats = self.stages[index], self.stats[index]
+
+        def counted_input():
+            # 입력을 기다린 시간은 busy 에서 빼기 위해 음수로 더한다.
+            items = self._iter_queue(in_q)
+            while True:
+                start = time.perf_counter()
+                item = next(items, _DONE)
+                stats.add(busy_seconds=-(time.perf_counter() - start))
+                if item is _DONE:
+                    return
+                stats.add(items_in=1)
+                yield item
+
+        try:
+            outputs = stage.fn(counted_input()) or ()
+            while True:
+                start = time.perf_counter()
+                try:
+                    output = next(outputs)
+                except StopIteration:
+                    break
+                finally:
+                    stats.add(busy_seconds=time.perf_counter() - start)
+                stats.add(items_out=1)
+                if out_q is not None and not self._put(out_q, output):
+                    return
+        except BaseException as e:
+            self._fail(e)
+        finally:
+            if out_q is not None:
+                self._put(out_q, _DONE)
+
+    # ---------- run ----------
+
+    def report(self) -> str:
+        elapsed = time.perf_counter() - self._started_at
+        return "\n".join(stats.line(elapsed) for stats in self.stats)
+
+    def run(self):
+        """모든 입력을 처리할 때까지 실행한다. 단계에서 예외가 발생하면 중단하고 다시 raise 한다."""
+        self._started_at = time.perf_counter()
+        queues = [queue.Queue(maxsize=stage.queue_size) for stage in self.stages]
+        threads = [threading.Thread(target=self._feed, args=(queues[0],), name="source", daemon=True)]
+        for index, stage in enumerate(self.stages):
+            out_q = queues[index + 1] if index + 1 < len(queues) else None
+            if stage.stream:
+                threads.append(threading.Thread(target=self._run_stream_worker, args=(index, queues[index], out_q),
+                                                name=stage.name, daemon=True))
+                continue
+            finished, lock = [0], threading.Lock()
+            for worker in range(stage.workers):
+                threads.append(threading.Thread(target=self._run_item_worker,
+                                                args=(index, queues[index], out_q, finished, lock),
+                                                name=f"{stage.name}-{worker}", daemon=True))
+        for thread in threads:
+            thread.start()
+
+        last_report = time.perf_counter()
+        while any(thread.is_alive() for thread in threads):
+            threads[-1].join(timeout=0.5)
+            if self.report_every and time.perf_counter() - last_report >= self.report_every:
+                print(self.report())
+                last_report = time.perf_counter()
+        for thread in threads:
+            thread.join()
+
+        if self.errors:
+            raise self.errors[0]
@@ -0,0 +1,493 @@
+"""
+여러 corpus 를 한 프로세스에 올려두고 질문을 받는 RAG 엔진 (계속 떠 있는 프로세스)
+
+langchain_with_rag.py / ollama_with_langchain.py / developer_news/news_rag_test.py / naver_ranking_news/main.py 는
+실행할 때마다 임베딩 / LLM 클라이언트 생성, 인덱스 로드(또는 생성) 후 질문 1개에 답하고 종료한다.
+여기서는 시작할 때 corpus 별 인덱스와 체인을 한 번만 만들어두고 로컬 HTTP API 로 질문을 받는다.
+- corpus: 이름 -> 원본(PDF 파일 또는 ingest 스크립트가 저장한 mmap 인덱스 폴더), 임베딩, LLM, splitter, prompt
+- 같은 임베딩 모델은 corpus 끼리 객체 1개(+ 임베딩 캐시 1개)를 공유하고, LLM 은 공용 llm_client 로 호출한다.
+- 원본 / 인덱스 파일이 바뀌면(수정시각 / 크기) background 에서 새 인덱스를 만든 뒤 교체한다. (hot reload)
+  교체 전까지는 이전 인덱스로 계속 답하고, 실패하면 이전 인덱스를 유지한다.
+- corpus 별 semantic cache 는 파일 버전이 바뀌면 무효화된다.
+
+API (127.0.0.1:RAG_ENGINE_PORT, JSON):
+    POST /query   {"corpus": "regulations", "question": "전화는 몇 초 내로 받아야 해?"}
+                  -> {"answer", "cached", "retrieval_ms", "generation_ms", "total_ms", "sources"}
+    POST /reload  {"corpus": "regulations"}   # 파일 변경 여부와 상관없이 다시 로드
+    GET  /status
+
+실행:
+    python rag_engine.py serve                                   # 기본 corpus (regulations / developer_news / naver_ranking)
+    python rag_engine.py serve --config corpora.json --corpus regulations
+    python rag_engine.py ask regulations "전화는 몇 초 내로 받아야 해?"
+    python rag_engine.py status
+
+--config 파일 형식 (CorpusConfig 목록, 상대 경로는 저장소 루트 기준, ${환경변수} 사용 가능):
+    [{"name": "regulations", "kind": "pdf", "paths": ["pdf/daejeon.pdf"], "embedding": "openai",
+      "llm": "openai:${OPENAI_MODEL}", "splitter": "recursive:1000:100", "prompt": "...{context}...{question}..."}]
+"""
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional
+
+import requests
+from langchain_community.document_loaders import PyMuPDFLoader
+from langchain_core.output_parsers import StrOutputParser
+from langchain_core.prompts import PromptTemplate
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from rag_common.bench_rag import make_splitter
+from rag_common.context_builder import ContextBuilder
+from rag_common.embedding_cache import ROOT_DIR, CachedEmbeddings, EmbeddingCache
+from rag_common.hybrid_retriever import HybridRetriever
+from rag_common.index_manifest import IndexManifest, embedding_signature, sync_store
+from rag_common.llm_client import default_client, get_chat_model
+from rag_common.mmap_store import exists, load_mmap_store, store_files
+from rag_common.semantic_cache import SemanticCache, chain_fingerprint, file_store_version, same_keywords
+
+DEFAULT_PORT = int(os.environ.get("RAG_ENGINE_PORT", "8766"))
+# PDF corpus 인덱스 저장 위치 (ollama_with_langchain 의 PDF_INDEX_DIR 과 임베딩이 다를 수 있으므로 분리)
+ENGINE_INDEX_DIR = os.environ.get("RAG_ENGINE_INDEX_DIR", os.path.join(ROOT_DIR, ".cache", "rag_engine"))
+OLLAMA_KEEP_ALIVE = "30m"
+
+REGULATIONS_PROMPT = """You are a assistant at the Daejeon Tourism Organization that provides information about company regulations.
+Your role is to find and answer the user’s questions based on the context.
+
+If you cannot find the answer in the documents, you must clearly respond that you do not know.
+
+All responses must be in Korean.
+
+#Context:
+{context}
+
+#Question:
+{question}
+
+#Answer:"""
+
+DEVELOPER_NEWS_PROMPT = """You must act as an assistant who understands the latest development trends and technologies.
+You will receive written content and answer user questions about it in detail.
+All responses must be provided in Korean only.
+
+#Context:
+{context}
+
+#Question:
+{question}
+
+#Answer:"""
+
+NAVER_RANKING_PROMPT = """너는 최신 인기 뉴스를 알려주는 뉴스 요약 챗봇이야.
+
+사용자가 입력한 질문과 관련된 뉴스를 벡터 임베딩을 통해 찾아서 가장 관련도 높은 뉴스 제목과 링크를 제공해줘.
+
+가능하면 사용자에게 친절하게 설명하고, 클릭할 수 있는 링크도 알려줘.
+
+뉴스 제목만 요약하면 충분하다고 판단되면 제목만 출력해도 좋아.
+
+뉴스의 전문은 너도 모르니, 링크만 안내하고 사실인 것처럼 단정적으로 말하지 마.
+
+#Context:
+{context}
+
+#Question:
+{question}
+
+#Answer:"""
+
+
+@dataclass
+class CorpusConfig:
+    """
+    corpus 설정
+    - kind="pdf"   : paths 의 PDF 를 페이지 단위로 분할 / 임베딩해서 ENGINE_INDEX_DIR 에 저장 (바뀐 페이지만 다시 임베딩)
+    - kind="store" : paths[0] 폴더의 mmap 인덱스(index_name)를 읽기 전용으로 연다. (developer_news/ingest.py 등이 생성)
+                     manifest 의 임베딩이 embedding 설정과 다르면 로드하지 않는다.
+    embedding: "openai" / "openai:<모델>" / "ollama:<모델>", llm: "openai:<모델>" / "ollama:<모델>"
+    cache_threshold: semantic cache threshold (None 이면 SEMANTIC_CACHE_THRESHOLDS / 기본값)
+    cache_keywords: True 면 검색어(인물 이름 등)가 같은 질문만 캐시된 답변을 재사용 (semantic_cache.same_keywords)
+    """
+    name: str
+    kind: str
+    paths: List[str]
+    prompt: str
+    embedding: str = "openai"
+    llm: str = "openai:${OPENAI_MODEL}"
+    splitter: str = "recursive:1000:100"
+    index_name: str = "faiss_index"
+    retriever: str = "vector"  # vector / hybrid
+    k: int = 4
+    api_key_env: Optional[str] = None  # OpenAI API 키 환경변수 이름 (없으면 OPENAI_API_KEY)
+    cache_threshold: Optional[float] = None
+    cache_keywords: bool = False
+
+    def resolved_paths(self) -> List[str]:
+        return [os.path.join(ROOT_DIR, os.path.expandvars(path)) for path in self.paths]
+
+    def watch_files(self) -> List[str]:
+        """hot reload 기준 파일"""
+        if self.kind == "pdf":
+            return self.resolved_paths()
+        # docstore 는 문서 추가 중에도 바뀌므로(인덱스에 반영되기 전) 인덱스 파일만 본다.
+        return [store_files(self.resolved_paths()[0], self.index_name)[0]]
+
+
+DEFAULT_CORPORA = [
+    CorpusConfig("regulations", "pdf", ["pdf/daejeon.pdf"], REGULATIONS_PROMPT, splitter="recursive:1000:100"),
+    CorpusConfig("developer_news", "store", ["developer_news/db"], DEVELOPER_NEWS_PROMPT,
+                 embedding="ollama:dolphin-llama3:8b"),
+    CorpusConfig("naver_ranking", "store", ["naver_ranking_news/db"], NAVER_RANKING_PROMPT,
+                 llm="openai:${OPEN_AI_MODEL}", retriever="hybrid", api_key_env="OPEN_AI_API_KEY",
+                 cache_keywords=True),
+]
+
+
+def load_configs(path: Optional[str]) -> List[CorpusConfig]:
+    if not path:
+        return list(DEFAULT_CORPORA)
+    with open(path, encoding="utf-8") as f:
+        return [CorpusConfig(**item) for item in json.load(f)]
+
+
+class ModelPool:
+    """
+    임베딩 / LLM 객체를 spec 별로 1개씩만 만들어서 corpus 끼리 공유한다.
+    임베딩은 모두 같은 EmbeddingCache(SQLite 연결 1개)를 사용한다.
+    """
+
+    def __init__(self):
+        self.cache = EmbeddingCache()
+        self._embeddings: Dict[str, CachedEmbeddings] = {}
+        self._ollama_llms: Dict[str, object] = {}
+        self._lock = threading.Lock()
+
+    def embeddings(self, spec: str) -> CachedEmbeddings:
+        with self._lock:
+            if spec not in self._embeddings:
+                provider, _, model = spec.partition(":")
+                if provider == "ollama":
+                    from rag_common.ollama_embeddings import BatchedOllamaEmbeddings
+                    underlying = BatchedOllamaEmbeddings(model=model, keep_alive=OLLAMA_KEEP_ALIVE)
+                elif provider == "openai":
+                    from langchain_openai import OpenAIEmbeddings
+                    underlying = OpenAIEmbeddings(model=model) if model else OpenAIEmbeddings()
+                else:
+                    raise ValueError(f"지원하지 않는 임베딩입니다: {spec}")
+                self._embeddings[spec] = CachedEmbeddings(underlying, cache=self.cache)
+            return self._embeddings[spec]
+
+    def llm(self, spec: str, caller: str, api_key_env: Optional[str] = None):
+        provider, _, model = os.path.expandvars(spec).partition(":")
+        if provider == "openai":
+            # OpenAI 는 공용 llm_client 가 모델별 rate limit / 재시도 / caller 별 사용량을 관리한다.
+            api_key = os.environ.get(api_key_env) if api_key_env else None
+            return get_chat_model(model, caller=caller, **({"api_key": api_key} if api_key else {}))
+        if provider == "ollama":
+            with self._lock:
+                if model not in self._ollama_llms:
+                    from langchain_community.llms import Ollama
+                    llm = Ollama(model=model, keep_alive=OLLAMA_KEEP_ALIVE)
+                    threading.Thread(target=self._warm_up_ollama, args=(llm,), daemon=True).start()
+                    self._ollama_llms[model] = llm
+                return self._ollama_llms[model]
+        raise ValueError(f"지원하지 않는 LLM 입니다: {spec}")
+
+    @staticmethod
+    def _warm_up_ollama(llm):
+        """빈 prompt 로 요청해서 모델을 메모리에 미리 올린다. (ollama_with_langchain.PDFQASystem.warm_up 과 동일)"""
+        try:
+            requests.post(f"{llm.base_url}/api/generate",
+                          json={"model": llm.model, "keep_alive": OLLAMA_KEEP_ALIVE}, timeout=300)
+        except requests.RequestException as e:
+            print(f"[engine] 모델 warm-up 실패: {str(e)}")
+
+
+@dataclass
+class LoadedCorpus:
+    """로드가 끝난 corpus (hot reload 시 통째로 교체)"""
+    config: CorpusConfig
+    vectorstore: object
+    retriever: object
+    generate: object  # {"context", "question"} -> 답변
+    context_builder: ContextBuilder
+    answer_cache: SemanticCache
+    version: str
+    chunks: int
+    load_ms: float
+    loaded_at: float = field(default_factory=time.time)
+
+
+@dataclass
+class CorpusStatus:
+    queries: int = 0
+    cache_hits: int = 0
+    reloads: int = 0
+    last_error: str = ""
+    retrieval_ms: float = 0.0
+    generation_ms: float = 0.0
+
+
+class RagEngine:
+    """corpus 이름 -> 로드된 인덱스 / 체인"""
+
+    def __init__(self, configs: List[CorpusConfig], reload_interval: float = 5.0):
+        self.configs = {config.name: config for config in configs}
+        self.reload_interval = reload_interval
+        self.pool = ModelPool()
+        self.corpora: Dict[str, LoadedCorpus] = {}
+        self.status_by_name = {name: CorpusStatus() for name in self.configs}
+        self._reload_locks = {name: threading.Lock() for name in self.configs}
+        self._attempted: Dict[str, str] = {}  # corpus -> 마지막으로 로드를 시도한 파일 버전
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+
+    def start(self):
+        """모든 corpus 를 동시에 로드하고 파일 감시를 시작한다. 로드에 실패한 corpus 는 status 에 오류를 남긴다."""
+        with ThreadPoolExecutor(max_workers=len(self.configs) or 1) as executor:
+            list(executor.map(lambda name: self.reload(name, force=True), self.configs))
+        threading.Thread(target=self._watch, daemon=True).start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _load(self, config: CorpusConfig, version: str) -> LoadedCorpus:
+        started = time.perf_counter()
+        embeddings = self.pool.embeddings(config.embedding)
+        if config.kind == "pdf":
+            sources = {}
+            for path in config.resolved_paths():
+                for i, page in enumerate(PyMuPDFLoader(path).load()):
+                    sources[f"{os.path.basename(path)}#page={page.metadata.get('page', i)}"] = [page]
+            os.makedirs(ENGINE_INDEX_DIR, exist_ok=True)
+            vectorstore, _, plan = sync_store(ENGINE_INDEX_DIR, config.name, embeddings, sources,
+                                              splitter=make_splitter(config.splitter), prune=True)
+            if not plan.is_noop:
+                print(f"[engine] {config.name} 인덱스 갱신: {plan}")
+        elif config.kind == "store":
+            folder = config.resolved_paths()[0]
+            if not exists(folder, config.index_name):
+                raise FileNotFoundError(f"인덱스가 없습니다: {folder}/{config.index_name} (ingest 스크립트를 먼저 실행)")
+            # 다른 임베딩(모델 / endpoint / 차원)으로 만든 인덱스에 질문 벡터를 섞으면 검색 결과가 틀리므로 열지 않는다.
+            # (읽기 전용이라 여기서 다시 임베딩하지 않고, 인덱스를 만든 스크립트에서 sync_store 로 다시 임베딩)
+            manifest = IndexManifest.load(folder, config.index_name)
+            if manifest is None:
+                print(f"[engine] {config.name}: manifest 가 없어서 인덱스의 임베딩 모델을 확인하지 못했습니다.")
+            elif manifest.embedding != embedding_signature(embeddings):
+                raise ValueError(f"인덱스 임베딩 {manifest.embedding} 과 설정된 임베딩 "
+                                 f"{embedding_signature(embeddings)} 이 다릅니다. "
+                                 f"embedding 설정을 맞추거나 인덱스를 만든 스크립트로 다시 임베딩하세요.")
+            vectorstore = load_mmap_store(folder, embeddings, config.index_name)
+        else:
+            raise ValueError(f"지원하지 않는 corpus 종류입니다: {config.kind}")
+
+        if config.retriever == "hybrid":
+            retriever = HybridRetriever.from_vectorstore(vectorstore, k=config.k)
+        else:
+            retriever = vectorstore.as_retriever(search_kwargs={"k": config.k})
+        llm = self.pool.llm(config.llm, caller=f"rag_engine:{config.name}", api_key_env=config.api_key_env)
+        prompt = PromptTemplate.from_template(config.prompt)
+        return LoadedCorpus(
+            config=config,
+            vectorstore=vectorstore,
+            retriever=retriever,
+            generate=prompt | llm | StrOutputParser(),
+            context_builder=ContextBuilder(),
+            answer_cache=SemanticCache(embeddings, namespace=f"rag_engine:{config.name}", store_version=version,
+                                       fingerprint=chain_fingerprint(prompt, llm), threshold=config.cache_threshold,
+                                       guard=same_keywords if config.cache_keywords else None),
+            version=version,
+            chunks=vectorstore.index.ntotal,
+            load_ms=(time.perf_counter() - started) * 1000,
+        )
+
+    def reload(self, name: str, force: bool = False) -> bool:
+        """
+        파일 버전이 바뀌었으면(force 면 항상) 새로 로드해서 교체한다. 로드 중에도 기존 corpus 로 질문을 처리한다.
+        Returns: 교체 여부
+        """
+        config = self.configs[name]
+        with self._reload_locks[name]:
+            version = file_store_version(*config.watch_files())
+            # 로드에 실패한 버전은 파일이 다시 바뀔 때까지 재시도하지 않는다.
+            if not force and self._attempted.get(name) == version:
+                return False
+            self._attempted[name] = version
+            try:
+                loaded = self._load(config, version)
+            except Exception as e:
+                self.status_by_name[name].last_error = f"{type(e).__name__}: {str(e)}"
+                print(f"[engine] {name} 로드 실패 (이전 인덱스 유지): {self.status_by_name[name].last_error}")
+                return False
+            with self._lock:
+                self.corpora[name] = loaded
+                self.status_by_name[name].reloads += 1
+                self.status_by_name[name].last_error = ""
+            print(f"[engine] {name} 로드 완료: {loaded.chunks}개의 청크 ({loaded.load_ms:.0f}ms)")
+            return True
+
+    def _watch(self):
+        while not self._stop.wait(self.reload_interval):
+            for name in self.configs:
+                self.reload(name)
+
+    def query(self, name: str, question: str) -> Dict:
+        if name not in self.configs:
+            raise KeyError(f"없는 corpus 입니다: {name} (corpus: {', '.join(self.configs)})")
+        corpus = self.corpora.get(name)
+        if corpus is None:
+            raise RuntimeError(f"{name} 이 로드되지 않았습니다: {self.status_by_name[name].last_error}")
+
+        started = time.perf_counter()
+        answer, vector = corpus.answer_cache.lookup(question)
+        cached = answer is not None
+        retrieval_ms = generation_ms = 0.0
+        sources = []
+        if not cached:
+            docs = corpus.retriever.invoke(question)
+            context = corpus.context_builder(docs)
+            retrieval_ms = (time.perf_counter() - started) * 1000
+            answer = corpus.generate.invoke({"context": context, "question": question})
+            generation_ms = (time.perf_counter() - started) * 1000 - retrieval_ms
+            corpus.answer_cache.update(question, answer, vector)
+            sources = list(dict.fromkeys(doc.metadata.get("url") or doc.metadata.get("source") for doc in docs))
+        total_ms = (time.perf_counter() - started) * 1000
+
+        with self._lock:
+            status = self.status_by_name[name]
+            status.queries += 1
+            status.cache_hits += cached
+            status.retrieval_ms += retrieval_ms
+            status.generation_ms += generation_ms
+        return {"corpus": name, "answer": answer, "cached": cached, "retrieval_ms": round(retrieval_ms, 1),
+                "generation_ms": round(generation_ms, 1), "total_ms": round(total_ms, 1), "sources": sources,
+                "version": corpus.version[:12]}
+
+    def status(self) -> Dict:
+        result = {}
+        for name, config in self.configs.items():
+            corpus = self.corpora.get(name)
+            status = self.status_by_name[name]
+            misses = status.queries - status.cache_hits
+            result[name] = {
+                "kind": config.kind, "embedding": config.embedding, "llm": os.path.expandvars(config.llm),
+                "loaded": corpus is not None,
+                "chunks": corpus.chunks if corpus else 0,
+                "version": corpus.version[:12] if corpus else "",
+                "loaded_at": corpus.loaded_at if corpus else 0.0,
+                "load_ms": round(corpus.load_ms, 1) if corpus else 0.0,
+                "context": str(corpus.context_builder.stats) if corpus else "",
+                **asdict(status),
+                "avg_retrieval_ms": round(status.retrieval_ms / misses, 1) if misses else 0.0,
+                "avg_generation_ms": round(status.generation_ms / misses, 1) if misses else 0.0,
+            }
+        result["_embedding_cache"] = str(self.pool.cache.stats)
+        result["_llm"] = default_client().report()
+        return result
+
+
+def serve_http(engine: RagEngine, port: int) -> ThreadingHTTPServer:
+    """로컬 HTTP API (모듈 docstring 참고)"""
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def _reply(self, status: int, body: Dict):
+            data = json.dumps(body, ensure_ascii=False).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json; charset=utf-8")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_GET(self):
+            if self.path.rstrip("/") == "/status":
+                self._reply(200, engine.status())
+            else:
+                self._reply(404, {"error": f"unknown path {self.path}"})
+
+        def do_POST(self):
+            try:
+                payload = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+                if self.path.rstrip("/") == "/query":
+                    self._reply(200, engine.query(payload["corpus"], payload["question"]))
+                elif self.path.rstrip("/") == "/reload":
+                    self._reply(200, {"reloaded": engine.reload(payload["corpus"], force=True)})
+                else:
+                    self._reply(404, {"error": f"unknown path {self.path}"})
+            except (KeyError, json.JSONDecodeError) as e:
+                self._reply(400, {"error": f"잘못된 요청: {str(e)}"})
+            except Exception as e:
+                self._reply(500, {"error": f"{type(e).__name__}: {str(e)}"})
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", port), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def send_request(path: str, payload: Optional[Dict] = None, port: int = DEFAULT_PORT, timeout: float = 300) -> Dict:
+    url = f"http://127.0.0.1:{port}{path}"
+    response = requests.post(url, json=payload, timeout=timeout) if payload is not None \
+        else requests.get(url, timeout=timeout)
+    return response.json()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    serve = subparsers.add_parser("serve")
+    serve.add_argument("--config", help="corpus 설정 JSON (없으면 기본 corpus)")
+    serve.add_argument("--corpus", action="append", help="로드할 corpus 이름 (기본값: 전체)")
+    serve.add_argument("--port", type=int, default=DEFAULT_PORT)
+    serve.add_argument("--reload-interval", type=float, default=5.0, help="파일 변경 확인 주기 (초)")
+    ask = subparsers.add_parser("ask")
+    ask.add_argument("corpus")
+    ask.add_argument("question")
+    ask.add_argument("--port", type=int, default=DEFAULT_PORT)
+    reload = subparsers.add_parser("reload")
+    reload.add_argument("corpus")
+    reload.add_argument("--port", type=int, default=DEFAULT_PORT)
+    status = subparsers.add_parser("status")
+    status.add_argument("--port", type=int, default=DEFAULT_PORT)
+    args = parser.parse_args()
+
+    if args.command == "ask":
+        response = send_request("/query", {"corpus": args.corpus, "question": args.question}, args.port)
+        print(response.get("answer") or response)
+        print({key: value for key, value in response.items() if key != "answer"})
+        return
+    if args.command == "reload":
+        print(send_request("/reload", {"corpus": args.corpus}, args.port))
+        return
+    if args.command == "status":
+        print(json.dumps(send_request("/status", port=args.port), ensure_ascii=False, indent=2))
+        return
+
+    from dotenv import load_dotenv
+    load_dotenv()
+    configs = [config for config in load_configs(args.config) if not args.corpus or config.name in args.corpus]
+    engine = RagEngine(configs, reload_interval=args.reload_interval)
+    engine.start()
+    server = serve_http(engine, args.port)
+    print(f"[engine] 127.0.0.1:{args.port} 에서 요청 대기 중 (corpus: {', '.join(engine.configs)})")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        engine.stop()
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,274 @@
+"""
+RAG 체인 앞단의 semantic answer cache
+
+"전화는 몇 초 내로 받아야 해?" 처럼 거의 같은 질문이 표현만 바뀌어서 계속 들어오는 경우,
+질문 임베딩의 cosine 유사도가 threshold 이상인 이전 질문이 있으면 검색 + LLM 생성 없이 저장된 답변을 반환한다.
+- 캐시는 SQLite 에 저장하고, 검색은 메모리에 올린 작은 행렬(numpy)로 처리
+- 벡터 저장소 버전(store_version), 임베딩 모델 / 차원, 프롬프트 / LLM 설정(fingerprint)이 바뀌면 해당 namespace 의 캐시를 비움
+- TTL 과 최대 엔트리 수(LRU) 제한
+- 같은 문장의 질문은 임베딩 없이 찾는다. (검색도 임베딩 없이 하는 질문은 유사 질문 조회를 생략할 수 있음)
+- threshold 는 namespace 별로 지정 (환경변수 SEMANTIC_CACHE_THRESHOLDS, JSON)
+  SEMANTIC_CACHE_THRESHOLDS='{"naver_ranking_news": 0.97}'
+- 인물 이름만 다른 질문처럼 유사도는 높지만 답이 다른 경우를 막는 guard (예: same_keywords)
+
+사용법:
+    cache = SemanticCache(embeddings, namespace="daejeon", store_version=file_store_version(PDF_FILE_PATH),
+                          fingerprint=chain_fingerprint(prompt, llm))
+    chain = with_semantic_cache(chain, cache)
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Callable, Dict, Optional, Tuple
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+from langchain_core.language_models import BaseLanguageModel
+from langchain_core.prompts import BasePromptTemplate
+from langchain_core.runnables import Runnable, RunnableConfig, RunnableLambda
+
+from rag_common.embedding_cache import ROOT_DIR
+from rag_common.hybrid_retriever import QUERY_STOPWORDS, korean_tokenize
+from rag_common.index_manifest import embedding_signature
+
+DEFAULT_CACHE_PATH = os.environ.get(
+    "SEMANTIC_CACHE_PATH", os.path.join(ROOT_DIR, ".cache", "semantic_cache.sqlite3")
+)
+DEFAULT_THRESHOLD = 0.92
+MAX_CANDIDATES = 5  # threshold 를 넘은 후보 중 guard 로 확인할 최대 개수
+
+
+def load_thresholds(value: Optional[str] = None) -> Dict[str, float]:
+    """namespace -> threshold (환경변수 SEMANTIC_CACHE_THRESHOLDS)"""
+    value = os.environ.get("SEMANTIC_CACHE_THRESHOLDS", "") if value is None else value
+    return {namespace: float(threshold) for namespace, threshold in json.loads(value).items()} if value else {}
+
+
+def same_keywords(question: str, cached_question: str) -> bool:
+    """
+    요청 표현("뉴스", "찾아줘" 등)을 뺀 검색어가 같은지.
+    "A 뉴스 찾아줘" / "B 뉴스 찾아줘" 처럼 이름만 다른 질문은 임베딩 유사도가 높아도 다른 질문으로 본다.
+    """
+    return set(korean_tokenize(question, stopwords=QUERY_STOPWORDS)) == \
+        set(korean_tokenize(cached_question, stopwords=QUERY_STOPWORDS))
+
+
+def file_store_version(*paths: str) -> str:
+    """파일들의 경로 / 수정시각 / 크기로 저장소 버전을 만든다. (인덱스 파일, 원본 PDF 등)"""
+    digest = hashlib.sha1()
+    for path in paths:
+        if os.path.exists(path):
+            stat = os.stat(path)
+            digest.update(f"{os.path.abspath(path)}:{stat.st_mtime_ns}:{stat.st_size};".encode("utf-8"))
+    return digest.hexdigest()
+
+
+def chain_fingerprint(*parts) -> str:
+    """
+    답변에 영향을 주는 프롬프트 / LLM 설정의 지문.
+    프롬프트 문구나 모델 / temperature 가 바뀌면 이전 답변을 재사용하지 않도록 SemanticCache(fingerprint=...) 에 넘긴다.
+    """
+    digest = hashlib.sha1()
+    for part in parts:
+        if isinstance(part, BasePromptTemplate):
+            text = part.pretty_repr()
+        elif isinstance(part, BaseLanguageModel):
+            text = f"{type(part).__name__}:{json.dumps(part._identifying_params, sort_keys=True, default=str)}"
+        else:
+            text = str(part)
+        digest.update(text.encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+class SemanticCache:
+    """질문 임베딩 유사도 기반 답변 캐시"""
+
+    def __init__(
+            self,
+            embeddings: Embeddings,
+            namespace: str,
+            store_version: str = "",
+            fingerprint: str = "",
+            threshold: Optional[float] = None,
+            ttl_seconds: float = 24 * 60 * 60,
+            max_entries: int = 1000,
+            path: str = DEFAULT_CACHE_PATH,
+            guard: Optional[Callable[[str, str], bool]] = None,
+    ):
+        """
+        Args:
+            embeddings (Embeddings): 질문 임베딩에 사용할 객체
+            namespace (str): 체인 구분용 이름 (체인마다 답변이 다르므로 분리)
+            store_version (str): 벡터 저장소 버전. 저장된 버전과 다르면 캐시를 비운다.
+            fingerprint (str): 프롬프트 / LLM 설정 지문 (chain_fingerprint). 바뀌면 캐시를 비운다.
+            threshold (Optional[float]): 캐시 hit 로 볼 cosine 유사도.
+                None 이면 SEMANTIC_CACHE_THRESHOLDS 의 namespace 값, 없으면 DEFAULT_THRESHOLD
+            ttl_seconds (float): 답변 유효 시간
+            max_entries (int): 최대 엔트리 수. 초과 시 가장 오래 사용하지 않은 것부터 삭제
+            path (str): SQLite 파일 경로
+            guard (Optional[Callable[[str, str], bool]]): (질문, 캐시된 질문) -> 같은 답을 써도 되는지.
+                유사도가 threshold 이상이어도 False 면 hit 로 보지 않는다. (예: same_keywords)
+        """
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.embeddings = embeddings
+        self.namespace = namespace
+        # 임베딩 모델 / 차원이 바뀌면 저장된 벡터와 비교할 수 없고, 프롬프트 / LLM 이 바뀌면 답변이 달라지므로
+        # 저장소 버전과 함께 묶어서 하나라도 바뀌면 이전 답변을 모두 무효로 한다.
+        signature = json.dumps(embedding_signature(embeddings), sort_keys=True)
+        self.store_version = hashlib.sha1(f"{store_version}\0{signature}\0{fingerprint}".encode("utf-8")).hexdigest()
+        self.threshold = threshold if threshold is not None else load_thresholds().get(namespace, DEFAULT_THRESHOLD)
+        self.guard = guard
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.stats = {"hits": 0, "misses": 0}
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS answers (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                namespace TEXT NOT NULL,
+                store_version TEXT NOT NULL,
+                question TEXT NOT NULL,
+                vector BLOB NOT NULL,
+                answer TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                last_used REAL NOT NULL
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_answers_namespace ON answers (namespace, last_used)")
+        # 저장소 버전 / 임베딩 / 프롬프트가 바뀌었으면 이전 답변은 모두 무효
+        self._conn.execute(
+            "DELETE FROM answers WHERE namespace = ? AND store_version != ?", (namespace, self.store_version)
+        )
+        self._conn.commit()
+        self._load()
+
+    def _load(self):
+        # 임베딩 없이 저장한 답변(vector 가 빈 값)은 같은 문장의 질문으로만 찾는다. (lookup_exact)
+        rows = self._conn.execute(
+            "SELECT id, vector, created_at FROM answers WHERE namespace = ? AND length(vector) > 0 ORDER BY id",
+            (self.namespace,),
+        ).fetchall()
+        self._ids = np.array([row[0] for row in rows], dtype=np.int64)
+        self._created_at = np.array([row[2] for row in rows], dtype=np.float64)
+        self._matrix = (np.stack([np.frombuffer(row[1], dtype=np.float32) for row in rows])
+                        if rows else None)
+
+    def _embed(self, question: str) -> np.ndarray:
+        vector = np.asarray(self.embeddings.embed_query(question), dtype=np.float32)
+        return vector / (np.linalg.norm(vector) or 1.0)
+
+    def lookup(self, question: str) -> Tuple[Optional[str], np.ndarray]:
+        """
+        Returns:
+            Tuple[Optional[str], np.ndarray]: (캐시된 답변 또는 None, 질문 벡터)
+        """
+        vector = self._embed(question)
+        now = time.time()
+        with self._lock:
+            if self._matrix is None:
+                self.stats["misses"] += 1
+                return None, vector
+            similarities = self._matrix @ vector
+            similarities[self._created_at + self.ttl_seconds < now] = -1.0  # TTL 만료
+            for best in np.argsort(-similarities)[:MAX_CANDIDATES]:
+                if similarities[best] < self.threshold:
+                    break
+                answer_id = int(self._ids[best])
+                cached_question, answer = self._conn.execute(
+                    "SELECT question, answer FROM answers WHERE id = ?", (answer_id,)
+                ).fetchone()
+                if self.guard is not None and not self.guard(question, cached_question):
+                    continue
+                self._conn.execute("UPDATE answers SET last_used = ? WHERE id = ?", (now, answer_id))
+                self._conn.commit()
+                self.stats["hits"] += 1
+                return answer, vector
+            self.stats["misses"] += 1
+            return None, vector
+
+    def lookup_exact(self, question: str) -> Optional[str]:
+        """질문 문장이 같은 답변을 임베딩 없이 찾는다. (없으면 None, miss 집계는 하지 않음)"""
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT id, answer FROM answers WHERE namespace = ? AND question = ? AND created_at >= ? "
+                "ORDER BY id DESC LIMIT 1",
+                (self.namespace, question.strip(), now - self.ttl_seconds),
+            ).fetchone()
+            if row is None:
+                return None
+            self._conn.execute("UPDATE answers SET last_used = ? WHERE id = ?", (now, row[0]))
+            self._conn.commit()
+            self.stats["hits"] += 1
+            return row[1]
+
+    def update(self, question: str, answer: str, vector: Optional[np.ndarray] = None, embed: bool = True):
+        """
+        Args:
+            vector (Optional[np.ndarray]): lookup() 에서 받은 질문 벡터. 없으면 새로 임베딩한다.
+            embed (bool): False 면 임베딩하지 않고 저장한다. (같은 문장의 질문으로만 재사용)
+        """
+        if vector is None:
+            vector = self._embed(question) if embed else np.zeros(0, dtype=np.float32)
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "DELETE FROM answers WHERE namespace = ? AND created_at < ?",
+                (self.namespace, now - self.ttl_seconds),
+            )
+            self._conn.execute(
+                "INSERT INTO answers (namespace, store_version, question, vector, answer, created_at, last_used) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (self.namespace, self.store_version, question.strip(), vector.astype(np.float32).tobytes(), answer,
+                 now, now),
+            )
+            self._conn.execute(
+                """
+                DELETE FROM answers WHERE id IN (
+                    SELECT id FROM answers WHERE namespace = ? ORDER BY last_used DESC LIMIT -1 OFFSET ?
+                )
+                """,
+                (self.namespace, self.max_entries),
+            )
+            self._conn.commit()
+            self._load()
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM answers WHERE namespace = ?", (self.namespace,))
+            self._conn.commit()
+            self._load()
+
+
+def with_semantic_cache(chain: Runnable, cache: SemanticCache,
+                        skip_embedding: Optional[Callable[[str], bool]] = None) -> Runnable:
+    """
+    질문(str)을 입력으로 받는 LCEL 체인 앞에 semantic cache 를 붙인다.
+    hit 이면 체인을 실행하지 않고 저장된 답변을 반환한다.
+    같은 문장의 질문은 임베딩 없이 먼저 찾고, skip_embedding(question) 이 True 인 질문
+    (예: HybridRetriever.lexical_confident - 검색도 질문 임베딩 없이 하는 경우)은 유사 질문 조회를 생략한다.
+    """
+
+    def _invoke(question: str, config: RunnableConfig) -> str:
+        answer = cache.lookup_exact(question)
+        if answer is not None:
+            return answer
+        if skip_embedding is not None and skip_embedding(question):
+            cache.stats["misses"] += 1
+            answer = chain.invoke(question, config)
+            cache.update(question, answer, embed=False)
+            return answer
+
+        answer, vector = cache.lookup(question)
+        if answer is not None:
+            return answer
+        answer = chain.invoke(question, config)
+        cache.update(question, answer, vector)
+        return answer
+
+    return RunnableLambda(_invoke, name="SemanticCache")
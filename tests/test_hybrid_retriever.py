@@ -0,0 +1,72 @@
+import json
+import os
+import sqlite3
+
+from langchain_core.documents import Document
+
+from rag_common.hybrid_retriever import BM25Index
+
+NAVER_DOCS = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                          "naver_ranking_news", "db", "faiss_index.docs.sqlite3")
+
+TITLES = [
+    "김재준 감독, 시즌 첫 승 소감 밝혀",
+    "대통령 경제 정책 발표, 증시 반응은",
+    "감독 교체 이후 팀 분위기 달라져",
+    "경제 성장률 전망치 하향 조정",
+    "대통령 해외 순방 일정 공개",
+]
+
+
+def make_index() -> BM25Index:
+    index = BM25Index()
+    index.add_documents(Document(page_content=title) for title in TITLES)
+    return index
+
+
+def test_known_name_is_confident():
+    results, confidence = make_index().search("김재준 감독 뉴스", k=1)
+    assert results[0][0].page_content == TITLES[0]
+    assert confidence >= 0.5
+
+
+def test_unknown_terms_lower_confidence():
+    index = make_index()
+    for query in ("홍길동 감독 뉴스 찾아줘", "박보검 대통령 관련", "이순신 경제"):
+        _, confidence = index.search(query)
+        assert confidence < 0.5, query
+
+
+def test_all_unknown_terms():
+    results, confidence = make_index().search("홍길동")
+    assert results == []
+    assert confidence == 0.0
+
+
+def naver_index() -> BM25Index:
+    """naver_ranking_news 에 들어있는 실제 뉴스 제목 인덱스"""
+    with sqlite3.connect(NAVER_DOCS) as conn:
+        rows = conn.execute("SELECT page_content, metadata FROM documents").fetchall()
+    index = BM25Index()
+    index.add_documents(Document(page_content=content, metadata=json.loads(metadata)) for content, metadata in rows)
+    return index
+
+
+def test_request_template_is_confident_on_real_titles():
+    index = naver_index()
+    for name in ("이재명", "김문수", "한덕수"):
+        for query in (f"{name} 들어간 뉴스 찾아줘", f"{name} 관련 뉴스 알려줘"):
+            results, confidence = index.search(query, k=3)
+            assert confidence >= 0.5, query
+            assert all(name in doc.metadata["title"] for doc, _ in results), query
+
+
+def test_request_template_with_unknown_name_is_not_confident():
+    results, confidence = naver_index().search("김재준 들어간 뉴스 찾아줘", k=3)
+    assert confidence < 0.5
+    assert not any("들어간" in doc.metadata["title"] for doc, _ in results)
+
+
+def test_only_request_words():
+    _, confidence = make_index().search("뉴스 찾아줘")
+    assert confidence == 0.0
@@ -0,0 +1,21 @@
+from langchain_core.embeddings import DeterministicFakeEmbedding
+
+from rag_common.index_manifest import embedding_signature
+
+
+class CountingEmbeddings(DeterministicFakeEmbedding):
+    calls: int = 0
+
+    def embed_query(self, text):
+        self.calls += 1
+        return super().embed_query(text)
+
+
+def test_embedding_signature_is_cached_per_object():
+    embeddings = CountingEmbeddings(size=8)
+    signature = embedding_signature(embeddings)
+    assert signature == {"model": "CountingEmbeddings:default", "dimension": 8}
+    signature["dimension"] = 0  # 반환값을 바꿔도 캐시는 그대로
+    assert embedding_signature(embeddings)["dimension"] == 8
+    assert embeddings.calls == 1
+    assert embedding_signature(CountingEmbeddings(size=16))["dimension"] == 16
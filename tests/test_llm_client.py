@@ -0,0 +1,88 @@
+import asyncio
+import time
+
+import httpx
+import openai
+import pytest
+from langchain_core.language_models import GenericFakeChatModel
+from langchain_core.messages import AIMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+from langchain_core.utils.function_calling import convert_to_openai_tool
+from pydantic import BaseModel
+
+from rag_common.llm_client import DeadlineExceeded, LLMClient, ManagedChatModel, ModelLimits
+
+
+class ToolFakeChatModel(GenericFakeChatModel):
+    """tool 정의를 OpenAI 형식으로 bind 하고, 받은 kwargs 를 기록하는 fake"""
+
+    seen_kwargs: list = []
+
+    def bind_tools(self, tools, tool_choice=None, **kwargs):
+        return self.bind(tools=[convert_to_openai_tool(tool) for tool in tools], tool_choice=tool_choice, **kwargs)
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        self.seen_kwargs.append(kwargs)
+        return super()._generate(messages, stop=stop, run_manager=run_manager, **kwargs)
+
+
+class Answer(BaseModel):
+    text: str
+
+
+def make_client() -> LLMClient:
+    return LLMClient(limits={"default": ModelLimits(rpm=6000, tpm=600_000)}, base_delay=0.0)
+
+
+def test_stream_yields_chunks():
+    client = make_client()
+    llm = ManagedChatModel(inner=GenericFakeChatModel(messages=iter(["하나 둘 셋"])), caller="test", client=client)
+    chunks = [chunk.content for chunk in llm.stream("질문")]
+    assert len(chunks) > 1
+    assert "".join(chunks) == "하나 둘 셋"
+    assert client.usage()[("test", "default")].requests == 1
+
+
+def test_astream_yields_chunks():
+    llm = ManagedChatModel(inner=GenericFakeChatModel(messages=iter(["하나 둘 셋"])), client=make_client())
+
+    async def collect():
+        return [chunk.content async for chunk in llm.astream("질문")]
+
+    assert len(asyncio.run(collect())) > 1
+
+
+def test_with_structured_output():
+    message = AIMessage(content="", tool_calls=[{"name": "Answer", "args": {"text": "답변"}, "id": "call_1"}])
+    inner = ToolFakeChatModel(messages=iter([message]))
+    llm = ManagedChatModel(inner=inner, caller="test", client=make_client())
+    assert llm.with_structured_output(Answer).invoke("질문") == Answer(text="답변")
+    assert inner.seen_kwargs[-1]["tools"][0]["function"]["name"] == "Answer"
+
+
+def test_failed_attempt_refunds_tokens():
+    client = make_client()
+    attempts = []
+
+    def fn():
+        attempts.append(1)
+        if len(attempts) == 1:
+            raise openai.APIConnectionError(request=httpx.Request("POST", "http://localhost"))
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content="ok"))])
+
+    client.call("default", "test", 50_000, fn)
+    bucket = client._state("default").tokens
+    assert len(attempts) == 2
+    # 성공한 시도 1번만 예약이 남아 있어야 한다.
+    assert bucket.level >= bucket.capacity - 50_000
+
+
+def test_slot_timeout_refunds_reservation():
+    client = LLMClient(limits={"default": ModelLimits(rpm=6000, tpm=600_000, max_concurrency=1)})
+    state = client._state("default")
+    assert state.slots.try_acquire()  # 다른 호출이 자리를 차지하고 있는 상태
+    requests_level, tokens_level = state.requests.level, state.tokens.level
+    with pytest.raises(DeadlineExceeded):
+        client.call("default", "test", 50_000, lambda: None, deadline=time.monotonic() + 0.05)
+    assert state.requests.level >= requests_level
+    assert state.tokens.level >= tokens_level
@@ -0,0 +1,30 @@
+import os
+import sys
+
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "langchain"))
+from question_classifier import QuestionTypeClassifier  # noqa: E402
+
+REWARD, OTHER = "리워드 지급 이슈", "그 외 문의"
+
+
+# langchain_test.py 예시 문의
+@pytest.mark.parametrize("text, expected", [
+    ("안녕하세요. 캐시슬라이드 설치했는데 리워드가 지급되지 않았어요. 확인해주세요.", REWARD),
+    ("캐시슬라이드 설치했는데 리워드 안줬어요. 주세요.", REWARD),
+    ("캐시슬라이드 매체에 광고를 진행하고 싶어요. 어떻게 해야 할까요?", OTHER),
+    ("오퍼월 광고에 참여했는데 리워드 지급을 못받았어요.", REWARD),
+    ("무신사 광고 참여. 리워드 지급 바람", REWARD),
+])
+def test_rules_on_examples(text, expected):
+    assert QuestionTypeClassifier.match_rules(text) == expected
+
+
+@pytest.mark.parametrize("text", [
+    "캐시슬라이드 설치했는데 광고가 안 나와요",
+    "포인트 적립 내역 확인 방법 알려주세요",
+    "적립 방안 안내 부탁드립니다",
+])
+def test_rules_do_not_match(text):
+    assert QuestionTypeClassifier.match_rules(text) is None
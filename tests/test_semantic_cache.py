@@ -0,0 +1,78 @@
+from langchain_core.embeddings import DeterministicFakeEmbedding, Embeddings
+from langchain_core.language_models import FakeListChatModel
+from langchain_core.prompts import PromptTemplate
+from langchain_core.runnables import RunnableLambda
+
+from rag_common.semantic_cache import SemanticCache, chain_fingerprint, same_keywords, with_semantic_cache
+
+PROMPT = PromptTemplate.from_template("Answer: {question}")
+LLM = FakeListChatModel(responses=["answer"])
+
+
+def make_cache(tmp_path, embeddings, fingerprint=chain_fingerprint(PROMPT, LLM)) -> SemanticCache:
+    return SemanticCache(embeddings, namespace="test", store_version="v1",
+                         fingerprint=fingerprint, path=str(tmp_path / "cache.sqlite3"))
+
+
+def test_hit_with_same_settings(tmp_path):
+    embeddings = DeterministicFakeEmbedding(size=8)
+    make_cache(tmp_path, embeddings).update("질문", "답변")
+    assert make_cache(tmp_path, embeddings).lookup("질문")[0] == "답변"
+
+
+def test_embedding_dimension_change_clears_cache(tmp_path):
+    make_cache(tmp_path, DeterministicFakeEmbedding(size=8)).update("질문", "답변")
+    answer, _ = make_cache(tmp_path, DeterministicFakeEmbedding(size=16)).lookup("질문")
+    assert answer is None
+
+
+def test_prompt_change_clears_cache(tmp_path):
+    embeddings = DeterministicFakeEmbedding(size=8)
+    make_cache(tmp_path, embeddings).update("질문", "답변")
+    changed = chain_fingerprint(PromptTemplate.from_template("Summarize: {question}"), LLM)
+    assert make_cache(tmp_path, embeddings, fingerprint=changed).lookup("질문")[0] is None
+
+
+class CountingEmbeddings(DeterministicFakeEmbedding):
+    calls: int = 0
+
+    def embed_query(self, text):
+        self.calls += 1
+        return super().embed_query(text)
+
+
+def test_skip_embedding_uses_exact_question_only(tmp_path):
+    embeddings = CountingEmbeddings(size=8)
+    cache = make_cache(tmp_path, embeddings)
+    chain = RunnableLambda(lambda question: f"{question} 답변")
+    cached = with_semantic_cache(chain, cache, skip_embedding=lambda question: True)
+    probe_calls = embeddings.calls  # embedding_signature 의 차원 확인
+    assert cached.invoke("이재명 들어간 뉴스 찾아줘") == "이재명 들어간 뉴스 찾아줘 답변"
+    assert cached.invoke("이재명 들어간 뉴스 찾아줘") == "이재명 들어간 뉴스 찾아줘 답변"
+    assert embeddings.calls == probe_calls
+    assert cache.stats == {"hits": 1, "misses": 1}
+
+
+class TemplateEmbeddings(Embeddings):
+    """질문 틀만 보고 이름은 무시하는 임베딩 (이름만 다른 질문의 유사도가 1.0)"""
+
+    def embed_documents(self, texts):
+        return [self.embed_query(text) for text in texts]
+
+    def embed_query(self, text):
+        return [1.0, 0.0, 0.0] if "뉴스" in text else [0.0, 1.0, 0.0]
+
+
+def test_name_only_variant_misses_with_keyword_guard(tmp_path):
+    cache = SemanticCache(TemplateEmbeddings(), namespace="news", guard=same_keywords,
+                          path=str(tmp_path / "cache.sqlite3"))
+    cache.update("이재명 들어간 뉴스 찾아줘", "이재명 뉴스")
+    assert cache.lookup("김문수 들어간 뉴스 찾아줘")[0] is None
+    assert cache.lookup("이재명 관련 뉴스 알려줘")[0] == "이재명 뉴스"
+
+
+def test_threshold_per_namespace(tmp_path, monkeypatch):
+    monkeypatch.setenv("SEMANTIC_CACHE_THRESHOLDS", '{"news": 0.99}')
+    embeddings = DeterministicFakeEmbedding(size=8)
+    assert SemanticCache(embeddings, namespace="news", path=str(tmp_path / "cache.sqlite3")).threshold == 0.99
+    assert SemanticCache(embeddings, namespace="other", path=str(tmp_path / "cache.sqlite3")).threshold == 0.92